@@ -0,0 +1,37 @@
+# benchmarks/bench_cidr.py
+# Búsqueda del prefijo más largo en core.cidr.PrefixTable con muchos prefijos
+# (intervalos aplanados + directorio) frente a recorrer el RadixTrie.
+# Uso: python -m benchmarks.bench_cidr [num_prefijos]
+import ipaddress
+import random
+import sys
+import time
+
+from benchmarks.common import timeit
+from core.cidr import PrefixTable
+from core.packet import AF_INET
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    rng = random.Random(1)
+    prefixes = [(str(ipaddress.IPv4Network((rng.getrandbits(32), rng.randint(8, 30)), strict=False)),
+                 f"site{i % 500}") for i in range(n)]
+
+    start = time.perf_counter()
+    table = PrefixTable(prefixes)
+    build = time.perf_counter() - start
+    start = time.perf_counter()
+    table.lookup(AF_INET, 0)        # aplanado (una vez)
+    flatten = time.perf_counter() - start
+    print(f"{len(table):,} prefijos: trie {build:.2f} s, aplanado {flatten:.2f} s")
+
+    addrs = [rng.getrandbits(32) for _ in range(200_000)]
+    trie = table.tries[AF_INET]
+    lookup = table.lookup
+    slow = timeit(lambda: [trie.longest_match(a) for a in addrs])
+    fast = timeit(lambda: [lookup(AF_INET, a) for a in addrs])
+    print(f"RadixTrie.longest_match  {slow / len(addrs) * 1e9:>8.0f} ns/búsqueda")
+    print(f"PrefixTable.lookup       {fast / len(addrs) * 1e9:>8.0f} ns/búsqueda   x{slow / fast:.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+# benchmarks/bench_export.py
+# Exportaciones en streaming frente a construir la lista completa en memoria.
+# Uso: python -m benchmarks.bench_export [num_paquetes]
+import csv
+import json
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks.common import make_frames
+from core.dispatcher import parse_packet_lazy
+from export.export_columnar import export_columnar
+from export.export_csv import export_csv
+from export.export_json import export_json
+
+FIELDS = ("number", "time", "src", "dst", "proto", "length", "summary")
+COLUMNS = ("frame.number", "frame.time_epoch", "ip.src", "ip.dst", "tcp.dport", "frame.len")
+
+
+def _old_json(path, packets):
+    # Lo que hacía export_json antes: lista completa + json.dump con indent
+    rows = []
+    for i, p in enumerate(packets, 1):
+        rows.append({"number": i, "time": p.timestamp, "src": p.src_str, "dst": p.dst_str,
+                     "proto": p.proto, "length": p.length, "summary": p.summary})
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(rows, f, indent=4)
+
+
+def _old_csv(path, packets):
+    # export_csv antes: columnas fijas, fila a fila
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["#", "Time", "Source", "Destination", "Protocol", "Summary"])
+        for i, p in enumerate(packets, 1):
+            writer.writerow([i, p.timestamp, p.src_str, p.dst_str, p.proto, p.summary])
+
+
+def _run(label, func, n):
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<32} {elapsed:>7.2f} s   {n / elapsed:>12,.0f} paquetes/s")
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    packets = [parse_packet_lazy(f, i * 1000) for i, f in enumerate(make_frames(n))]
+    with tempfile.TemporaryDirectory() as tmp:
+        out = lambda name: os.path.join(tmp, name)
+        _run("json.dump(indent=4) de la lista", lambda: _old_json(out("old.json"), packets), n)
+        _run("NDJSON", lambda: export_json(out("a.ndjson"), packets, FIELDS), n)
+        _run("NDJSON + raw base64", lambda: export_json(out("b.ndjson"), packets, FIELDS, "base64"), n)
+        _run("NDJSON gzip", lambda: export_json(out("c.ndjson.gz"), packets, FIELDS), n)
+        _run("CSV fijo (anterior)", lambda: _old_csv(out("old.csv"), packets), n)
+        _run("CSV columnas por defecto", lambda: export_csv(out("a.csv"), packets), n)
+        _run("CSV ip/tcp por expresión", lambda: export_csv(out("b.csv"), packets, COLUMNS), n)
+        _run("CSV expresión, 2 workers",
+             lambda: export_csv(out("c.csv"), packets, COLUMNS, workers=2), n)
+        _run("Parquet (zstd)", lambda: export_columnar(out("a.parquet"), packets), n)
+        _run("Arrow IPC", lambda: export_columnar(out("a.arrow"), packets), n)
+        _run("NumPy .npz", lambda: export_columnar(out("a.npz"), packets), n)
+
+
+if __name__ == "__main__":
+    main()
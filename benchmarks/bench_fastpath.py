@@ -0,0 +1,23 @@
+# benchmarks/bench_fastpath.py
+# Camino rápido Ethernet/IPv4/TCP|UDP frente al camino general de parse_packet.
+# Uso: python -m benchmarks.bench_fastpath [num_paquetes]
+import sys
+
+from benchmarks.common import make_frames, tcp_frame, timeit, udp_frame
+from core.dispatcher import _parse_general, parse_packet
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    cases = {
+        "solo TCP": [tcp_frame([10, 0, 0, 1], [10, 0, 0, 2], 40000, 443, b"x" * 100)] * n,
+        "solo UDP": [udp_frame([10, 0, 0, 1], [10, 0, 0, 2], 40000, 5004, b"x" * 100)] * n,
+        "mezcla":   make_frames(n),
+    }
+    for name, frames in cases.items():
+        slow = timeit(lambda: [_parse_general(f) for f in frames])
+        fast = timeit(lambda: [parse_packet(f) for f in frames])
+        print(f"{name:<9} general {n / slow:>10,.0f} pps   rápido {n / fast:>10,.0f} pps"
+              f"   x{slow / fast:.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+# benchmarks/bench_filter.py
+# Filtro compilado (core.display_filter) frente a la cadena de lambdas
+# equivalente de PacketFilter.add_filter, sobre paquetes ya disecados y
+# sobre los bytes crudos.
+# Uso: python -m benchmarks.bench_filter [num_paquetes]
+import ipaddress
+import sys
+
+from benchmarks.common import make_frames, timeit
+from core.dispatcher import parse_packet
+from core.filters import PacketFilter
+
+EXPRESSION = "ip.src == 10.0.0.0/8 && tcp.dport in {80,443} && !arp"
+
+def _layer(pkt, name):
+    for layer in pkt["layers"]:
+        if layer["layer"] == name:
+            return layer["fields"]
+    return None
+
+NET = ipaddress.ip_network("10.0.0.0/8")
+
+def lambda_chain():
+    f = PacketFilter()
+    f.add_filter(lambda p: _layer(p, "IPv4") is not None
+                 and ipaddress.ip_address(_layer(p, "IPv4")["src"]) in NET)
+    f.add_filter(lambda p: (_layer(p, "TCP") or {}).get("Destination Port") in (80, 443))
+    f.add_filter(lambda p: _layer(p, "ARP") is None)
+    return f
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    frames = make_frames(n)
+    parsed = [parse_packet(f) for f in frames]
+    chain = lambda_chain()
+    compiled = PacketFilter(EXPRESSION)
+
+    expected = sum(map(chain.match, parsed))
+    assert expected == sum(map(compiled.match_layers, parsed)) == sum(map(compiled.match_raw, frames))
+
+    # match() usa los bytes crudos que conserva el dict; match_layers()
+    # es el camino de respaldo que solo mira las capas
+    slow = timeit(lambda: [chain.match(p) for p in parsed])
+    fast = timeit(lambda: [compiled.match(p) for p in parsed])
+    layers = timeit(lambda: [compiled.match_layers(p) for p in parsed])
+    print(f"{EXPRESSION}  ({expected:,} de {n:,} pasan)")
+    print(f"lambdas                {n / slow:>12,.0f} pps")
+    print(f"compilado              {n / fast:>12,.0f} pps   x{slow / fast:.2f}")
+    print(f"compilado, solo capas  {n / layers:>12,.0f} pps   x{slow / layers:.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+# benchmarks/bench_index.py
+# Re-filtrado con core.inverted_index frente a recorrer todos los paquetes
+# con PacketFilter.match (lo que hacía la GUI al cambiar de filtro).
+# Uso: python -m benchmarks.bench_index [num_paquetes]
+import sys
+import time
+
+from benchmarks.common import make_frames, timeit
+from core.dispatcher import parse_packet_lazy
+from core.filters import PacketFilter
+from core.inverted_index import InvertedIndex
+
+EXPRESSIONS = (
+    "ip.src == 10.0.0.0/8 && tcp.dport in {80,443}",
+    "udp.port == 53",
+    "tcp && !tcp.port == 443",
+    "dns || ip.addr == 10.0.0.1",
+    "tcp.flags.syn == 1 && ip.dst == 192.168.0.0/16",
+)
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    packets = [parse_packet_lazy(f) for f in make_frames(n)]
+
+    start = time.perf_counter()
+    index = InvertedIndex()
+    for p in packets:
+        index.add(p)
+    print(f"índice de {n:,} paquetes en {time.perf_counter() - start:.2f} s")
+
+    for text in EXPRESSIONS:
+        f = PacketFilter(text)
+        got = index.query(f, packets)
+        assert list(got) == [i for i, p in enumerate(packets) if f.match(p)], text
+        scan = timeit(lambda: [i for i, p in enumerate(packets) if f.match(p)])
+        fast = timeit(lambda: index.query(f, packets))
+        print(f"{text:<50} {len(got):>8,}  recorrido {scan * 1000:>8.1f} ms"
+              f"   índice {fast * 1000:>7.1f} ms   x{scan / fast:.1f}")
+
+if __name__ == "__main__":
+    main()
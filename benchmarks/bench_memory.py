@@ -0,0 +1,35 @@
+# benchmarks/bench_memory.py
+# Bytes por paquete: dict anidado de parse_packet frente al Packet compacto.
+# Uso: python -m benchmarks.bench_memory [num_paquetes]
+import sys
+import tracemalloc
+
+from benchmarks.common import make_frames
+from core.dispatcher import parse_packet, parse_packet_lazy
+
+def measure(build, frames):
+    """Bytes retenidos por paquete (incluida la copia de raw)."""
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    kept = [build(bytes(bytearray(f))) for f in frames]
+    used = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+    del kept
+    return used / len(frames)
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    frames = make_frames(n)
+    avg_len = sum(len(f) for f in frames) / n
+    print(f"tamaño medio de trama: {avg_len:.0f} bytes")
+    print(f"dict parse_packet     {measure(parse_packet, frames):>8.0f} B/paquete")
+    print(f"Packet (sin capas)    {measure(parse_packet_lazy, frames):>8.0f} B/paquete")
+    print(f"Packet (con capas)    {measure(lambda r: (p := parse_packet_lazy(r), p.layers)[0], frames):>8.0f} B/paquete")
+
+    # Trama TCP mínima (60 bytes) para la cifra del docstring de core.packet.Packet
+    tcp = [f[:54] + b"\x00" * 6 for f in frames if f[23] == 6][:10_000]
+    print(f"TCP 60 B: dict {measure(parse_packet, tcp):.0f} B/paquete, "
+          f"Packet {measure(parse_packet_lazy, tcp):.0f} B/paquete")
+
+if __name__ == "__main__":
+    main()
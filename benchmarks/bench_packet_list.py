@@ -0,0 +1,62 @@
+# benchmarks/bench_packet_list.py
+# Coste de añadir filas a gui.packet_list.PacketList (modelo virtual) frente
+# a un QTableWidget con un QTableWidgetItem por celda, y memoria por fila
+# (RSS del proceso, incluye los objetos de Qt; solo en Linux).
+# Uso: QT_QPA_PLATFORM=offscreen python -m benchmarks.bench_packet_list [num_paquetes]
+import sys
+import time
+
+from PyQt6.QtWidgets import QApplication, QTableWidget, QTableWidgetItem
+
+from benchmarks.common import make_frames
+from core.dispatcher import parse_packet_lazy
+from core.utils import format_time
+from gui.packet_list import PacketList
+
+def table_widget(packets):
+    """Lo que hacía PacketList antes: insertRow + 7 items por paquete."""
+    w = QTableWidget(0, 7)
+    for p in packets:
+        row = w.rowCount()
+        w.insertRow(row)
+        for col, text in enumerate((str(row + 1), format_time(p.ts_ns), p.src_str, p.dst_str,
+                                    p.proto, str(p.length), p.summary)):
+            w.setItem(row, col, QTableWidgetItem(text))
+    return w
+
+def virtual(packets):
+    w = PacketList()
+    for p in packets:
+        w.add_parsed_packet(p)
+    return w
+
+def rss():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * 4096
+    except OSError:
+        return 0
+
+def measure(name, build, packets):
+    before = rss()
+    start = time.perf_counter()
+    w = build(packets)
+    w.resize(1000, 600)
+    w.show()
+    QApplication.processEvents()
+    elapsed = time.perf_counter() - start
+    n = len(packets)
+    print(f"{name:<14} {n:>9,} filas  {elapsed:6.2f} s  {n / elapsed:>10,.0f} filas/s"
+          f"  {(rss() - before) / n:6.0f} B/fila")
+    w.close()
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    app = QApplication.instance() or QApplication(sys.argv)
+    frames = make_frames(n)
+    packets = [parse_packet_lazy(f) for f in frames]
+    measure("QTableWidget", table_widget, packets[:min(n, 50_000)])
+    measure("PacketList", virtual, packets)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+# benchmarks/bench_parallel.py
+# Escalado de la disección paralela con 1, 2, 4 y 8 workers.
+# Uso: python -m benchmarks.bench_parallel [num_paquetes]
+import os
+import sys
+import tempfile
+
+from benchmarks.common import make_frames, timeit, write_pcap
+from capture.pcap_index import PcapIndex
+from capture.pcap_reader import read_pcap
+from core.parallel import parallel_parse
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.pcap")
+        write_pcap(path, make_frames(n))
+        PcapIndex.open(path)  # el índice se construye una vez, fuera del cronómetro
+
+        # Referencia: la misma disección completa, secuencial en este proceso
+        t = timeit(lambda: read_pcap(path, lambda p: p.dissect()), repeat=1)
+        print(f"read_pcap + disección   {n / t:>12,.0f} pps")
+
+        base = None
+        for workers in (1, 2, 4, 8):
+            t = timeit(lambda: parallel_parse(path, lambda p: None, workers=workers), repeat=1)
+            base = base or t
+            print(f"parallel_parse w={workers}      {n / t:>12,.0f} pps   x{base / t:.2f}")
+
+    print(f"(CPUs disponibles: {os.cpu_count()})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+# benchmarks/bench_pushdown.py
+# Filtro evaluado sobre bytes crudos antes de disecar frente a filtrar
+# los paquetes ya disecados, con la mayoría del tráfico descartado.
+# Uso: python -m benchmarks.bench_pushdown [num_paquetes]
+import os
+import sys
+import tempfile
+
+from benchmarks.common import make_frames, timeit, write_pcap
+from capture.pcap_reader import read_pcap
+from core.filters import PacketFilter
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    frames = make_frames(n)
+    f = PacketFilter(proto="udp", port=53)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.pcap")
+        write_pcap(path, frames)
+
+        def post_parse():
+            out = []
+            read_pcap(path, lambda p: f.match_layers(p) and out.append(p))
+            return out
+
+        def pushdown():
+            out = []
+            read_pcap(path, out.append, packet_filter=f)
+            return out
+
+        accepted = len(pushdown())
+        slow = timeit(post_parse)
+        fast = timeit(pushdown)
+        print(f"{n:,} paquetes, {accepted:,} aceptados ({accepted / n:.1%})")
+        print(f"tras disecar   {n / slow:>10,.0f} pps")
+        print(f"sobre crudo    {n / fast:>10,.0f} pps   x{slow / fast:.2f}")
+
+if __name__ == "__main__":
+    main()
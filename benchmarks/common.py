@@ -0,0 +1,67 @@
+# benchmarks/common.py
+# Utilidades compartidas por los benchmarks: tráfico sintético y cronómetro
+import random
+import struct
+import time
+
+ETH_HDR = b"\xaa\xbb\xcc\xdd\xee\xff\x11\x22\x33\x44\x55\x66"
+
+def _ipv4(proto, src, dst, payload):
+    hdr = struct.pack("!BBHHHBBH4s4s", 0x45, 0, 20 + len(payload), 1, 0x4000,
+                      64, proto, 0, bytes(src), bytes(dst))
+    return ETH_HDR + b"\x08\x00" + hdr + payload
+
+def tcp_frame(src, dst, sport, dport, data=b"", flags=0x18):
+    tcp = struct.pack("!HHLLHHHH", sport, dport, 1000, 2000, (5 << 12) | flags, 65535, 0, 0)
+    return _ipv4(6, src, dst, tcp + data)
+
+def udp_frame(src, dst, sport, dport, data=b""):
+    udp = struct.pack("!HHHH", sport, dport, 8 + len(data), 0)
+    return _ipv4(17, src, dst, udp + data)
+
+DNS_QUERY = (b"\x12\x34\x01\x00\x00\x01\x00\x00\x00\x00\x00\x00"
+             b"\x07example\x03com\x00\x00\x01\x00\x01")
+HTTP_GET = b"GET /index.html HTTP/1.1\r\nHost: example.com\r\n\r\n"
+
+def make_frames(n, seed=1):
+    """
+    Genera n tramas con una mezcla típica: mayoría TCP/UDP "genérico"
+    y algo de DNS y HTTP para ejercitar los parsers de aplicación.
+    """
+    rnd = random.Random(seed)
+    frames = []
+    for _ in range(n):
+        src = [10, 0, rnd.randrange(256), rnd.randrange(1, 255)]
+        dst = [192, 168, 1, rnd.randrange(1, 255)]
+        r = rnd.random()
+        if r < 0.60:
+            frames.append(tcp_frame(src, dst, rnd.randrange(1024, 65535), 443,
+                                    b"\x17" * rnd.randrange(0, 1200)))
+        elif r < 0.85:
+            frames.append(udp_frame(src, dst, rnd.randrange(1024, 65535), 5004,
+                                    b"\x80" * rnd.randrange(20, 400)))
+        elif r < 0.95:
+            frames.append(udp_frame(src, dst, rnd.randrange(1024, 65535), 53, DNS_QUERY))
+        else:
+            frames.append(tcp_frame(src, dst, rnd.randrange(1024, 65535), 80, HTTP_GET))
+    return frames
+
+def write_pcap(path, frames, start_ns=1_700_000_000_000_000_000, step_ns=1000):
+    """Escribe un pcap clásico (nanosegundos, Ethernet) con las tramas dadas."""
+    with open(path, "wb") as f:
+        f.write(struct.pack("<IHHiIII", 0xA1B23C4D, 2, 4, 0, 0, 65535, 1))
+        ts = start_ns
+        for frame in frames:
+            f.write(struct.pack("<IIII", ts // 1_000_000_000, ts % 1_000_000_000,
+                                len(frame), len(frame)))
+            f.write(frame)
+            ts += step_ns
+
+def timeit(func, repeat=3):
+    """Mejor tiempo (segundos) de 'repeat' ejecuciones de func()."""
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - t0)
+    return best
@@ -0,0 +1,244 @@
+# capture/afpacket.py
+# Captura nativa en Linux con AF_PACKET + anillo mmap TPACKET_V3 (no requiere scapy)
+import mmap
+import select
+import socket
+import struct
+import sys
+
+from capture.pcap_file import LINKTYPE_ETHERNET
+
+LINKTYPE_RAW = 101
+
+# -------------------------------------------------------------------------
+# CONSTANTES DEL KERNEL (linux/if_packet.h, linux/if_ether.h)
+# -------------------------------------------------------------------------
+SOL_PACKET = 263
+PACKET_ADD_MEMBERSHIP = 1
+PACKET_RX_RING = 5
+PACKET_STATISTICS = 6
+PACKET_VERSION = 10
+PACKET_MR_PROMISC = 1
+TPACKET_V3 = 2
+TP_STATUS_KERNEL = 0
+TP_STATUS_USER = 1
+PACKET_OUTGOING = 4
+ARPHRD_LOOPBACK = 772
+ETH_P_ALL = 0x0003
+
+# ARPHRD_* (/sys/class/net/<if>/type) -> linktype de pcap
+_ARPHRD_LINKTYPES = {1: LINKTYPE_ETHERNET, ARPHRD_LOOPBACK: LINKTYPE_ETHERNET, 65534: LINKTYPE_RAW}
+
+# tpacket_req3: block_size, block_nr, frame_size, frame_nr, retire_blk_tov,
+# sizeof_priv, feature_req_word
+_REQ3 = struct.Struct("=IIIIIII")
+# tpacket_block_desc: version, offset_to_priv y tpacket_hdr_v1 (block_status,
+# num_pkts, offset_to_first_pkt, blk_len...)
+_BLOCK = struct.Struct("=IIIIII")
+_BLOCK_STATUS = 8
+# tpacket3_hdr: tp_next_offset, tp_sec, tp_nsec, tp_snaplen, tp_len, tp_status, tp_mac
+_FRAME = struct.Struct("=IIIIIIH")
+# sockaddr_ll tras la cabecera (TPACKET_ALIGN(sizeof(tpacket3_hdr)) = 48): sll_pkttype
+_PKTTYPE = 48 + 10
+_MREQ = struct.Struct("=iHH8s")
+_STATS = struct.Struct("=III")
+_KERNEL = TP_STATUS_KERNEL.to_bytes(4, sys.byteorder)
+
+# Bloques de 1 MB (potencia de dos y múltiplo de página) y 32 MB de anillo:
+# ~15000 tramas de 64 bytes por bloque, una sola vuelta del bucle para todas
+DEFAULT_BLOCK_SIZE = 1 << 20
+DEFAULT_BLOCK_COUNT = 32
+DEFAULT_FRAME_SIZE = 2048
+# El kernel entrega un bloque a medio llenar tras este tiempo sin llenarse
+DEFAULT_TIMEOUT_MS = 50
+
+
+def available():
+    """True si se puede abrir un socket AF_PACKET (Linux y CAP_NET_RAW)."""
+    if not sys.platform.startswith("linux") or not hasattr(socket, "AF_PACKET"):
+        return False
+    try:
+        socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.htons(ETH_P_ALL)).close()
+    except OSError:
+        return False
+    return True
+
+
+def _hardware_type(interface):
+    try:
+        with open(f"/sys/class/net/{interface}/type") as f:
+            return int(f.read())
+    except (OSError, ValueError):
+        return None
+
+
+def interface_linktype(interface):
+    """Linktype de pcap de las tramas que entrega AfPacketSocket en 'interface'."""
+    return _ARPHRD_LINKTYPES.get(_hardware_type(interface), LINKTYPE_ETHERNET)
+
+
+class AfPacketSocket:
+    """
+    Socket AF_PACKET con anillo de recepción TPACKET_V3 mapeado en memoria.
+
+    El kernel copia las tramas directamente al anillo y lo entrega por
+    bloques (llenos, o a medio llenar tras timeout_ms): blocks() despierta
+    una vez por bloque con poll() y recorre sus tramas sin ninguna llamada
+    al sistema por paquete. Las tramas son memoryview sobre el anillo,
+    válidas solo hasta pedir el siguiente bloque (entonces el bloque vuelve
+    al kernel); quien necesite conservarlas las copia con bytes().
+
+    Requiere Linux y root (o CAP_NET_RAW); si no, el constructor lanza
+    PermissionError como socket.socket().
+    """
+
+    def __init__(self, interface, block_size=DEFAULT_BLOCK_SIZE, block_count=DEFAULT_BLOCK_COUNT,
+                 frame_size=DEFAULT_FRAME_SIZE, timeout_ms=DEFAULT_TIMEOUT_MS, promisc=True):
+        self.interface = interface
+        self.block_size = block_size
+        self.block_count = block_count
+        self.timeout_ms = timeout_ms
+        hatype = _hardware_type(interface)
+        self.linktype = _ARPHRD_LINKTYPES.get(hatype, LINKTYPE_ETHERNET)
+        # En loopback cada trama pasa dos veces (salida y entrada): como
+        # libpcap, se descarta la copia de salida
+        self._skip_outgoing = hatype == ARPHRD_LOOPBACK
+        self.packets = 0        # tramas entregadas
+        self.blocks_read = 0
+        self.drops = 0          # tramas que el kernel no pudo meter en el anillo
+        self.freezes = 0        # veces que el anillo se llenó
+        self._block = 0         # siguiente bloque a leer
+        self._ring = None
+        self._view = None
+
+        self.sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.htons(ETH_P_ALL))
+        try:
+            self.sock.setsockopt(SOL_PACKET, PACKET_VERSION, TPACKET_V3)
+            self.sock.setsockopt(SOL_PACKET, PACKET_RX_RING, _REQ3.pack(
+                block_size, block_count, frame_size, block_size // frame_size * block_count,
+                timeout_ms, 0, 0))
+            self._ring = mmap.mmap(self.sock.fileno(), block_size * block_count,
+                                   mmap.MAP_SHARED, mmap.PROT_READ | mmap.PROT_WRITE)
+            self._view = memoryview(self._ring)
+            self.sock.bind((interface, ETH_P_ALL))
+            if promisc:
+                self.sock.setsockopt(SOL_PACKET, PACKET_ADD_MEMBERSHIP, _MREQ.pack(
+                    socket.if_nametoindex(interface), PACKET_MR_PROMISC, 0, b""))
+        except Exception:
+            self.close()
+            raise
+        self._poll = select.poll()
+        self._poll.register(self.sock, select.POLLIN | select.POLLERR)
+
+    # ------------------------------
+    #   Lectura por bloques
+    # ------------------------------
+    def _frames(self, base):
+        """(memoryview, ts_ns, origlen) de cada trama del bloque en 'base'."""
+        ring = self._ring
+        view = self._view
+        _, _, _, count, offset, _ = _BLOCK.unpack_from(ring, base)
+        frames = []
+        pos = base + offset
+        unpack = _FRAME.unpack_from
+        skip_outgoing = self._skip_outgoing
+        for _ in range(count):
+            next_offset, sec, nsec, caplen, origlen, _, mac = unpack(ring, pos)
+            if not (skip_outgoing and ring[pos + _PKTTYPE] == PACKET_OUTGOING):
+                start = pos + mac
+                frames.append((view[start:start + caplen], sec * 1_000_000_000 + nsec, origlen))
+            pos += next_offset
+        return frames
+
+    def blocks(self, stop_callback=None):
+        """
+        Generador de bloques: cada uno es una lista de (memoryview, ts_ns,
+        origlen), con el timestamp del kernel. El bloque anterior se
+        devuelve al kernel al pedir el siguiente. Termina cuando
+        stop_callback() devuelve True (se comprueba al menos cada
+        timeout_ms) o al cerrar el socket.
+        """
+        ring = self._ring
+        while self._ring is not None:
+            base = self._block * self.block_size
+            if not ring[base + _BLOCK_STATUS] & TP_STATUS_USER:
+                if stop_callback is not None and stop_callback():
+                    return
+                self._poll.poll(self.timeout_ms)
+                continue
+            frames = self._frames(base)
+            self.packets += len(frames)
+            self.blocks_read += 1
+            try:
+                yield frames
+            finally:
+                if self._ring is not None:
+                    ring[base + _BLOCK_STATUS:base + _BLOCK_STATUS + 4] = _KERNEL
+                self._block = (self._block + 1) % self.block_count
+            if stop_callback is not None and stop_callback():
+                return
+
+    # ------------------------------
+    #   Estadísticas y cierre
+    # ------------------------------
+    def stats(self):
+        """Contadores acumulados (el kernel pone los suyos a cero al leerlos)."""
+        if self._ring is not None:
+            _, drops, freezes = _STATS.unpack(
+                self.sock.getsockopt(SOL_PACKET, PACKET_STATISTICS, _STATS.size))
+            self.drops += drops
+            self.freezes += freezes
+        return {"packets": self.packets, "blocks": self.blocks_read, "drops": self.drops,
+                "freezes": self.freezes}
+
+    def close(self):
+        if self._view is not None:
+            self._view.release()
+            self._view = None
+        if self._ring is not None:
+            try:
+                self._ring.close()
+            except BufferError:
+                pass    # quedan memoryview de tramas vivos: se libera con ellos
+            self._ring = None
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def capture_afpacket(interface, on_frames, stop_callback=None, packet_filter=None, count=0,
+                     **options):
+    """
+    Captura de 'interface' con AfPacketSocket hasta que stop_callback()
+    devuelva True o se alcancen 'count' tramas (0 = sin límite).
+
+    on_frames(lista) recibe un lote por bloque del anillo con tuplas
+    (raw, ts_ns, linktype), el formato de CapturePipeline.put_many: una
+    sola llamada (y una sola toma del lock de la cola) por bloque. El
+    filtro se evalúa sobre el memoryview del anillo y solo se copian las
+    tramas que pasan (o que necesitan disección para decidirse).
+    Devuelve AfPacketSocket.stats().
+    """
+    with AfPacketSocket(interface, **options) as sock:
+        linktype = sock.linktype
+        match_raw = packet_filter.match_raw if packet_filter is not None else None
+        seen = 0
+        for frames in sock.blocks(stop_callback):
+            if count:
+                frames = frames[:count - seen]
+            seen += len(frames)
+            if match_raw is None:
+                batch = [(bytes(data), ts_ns, linktype) for data, ts_ns, _ in frames]
+            else:
+                batch = [(bytes(data), ts_ns, linktype) for data, ts_ns, _ in frames
+                         if match_raw(data, linktype) is not False]
+            del frames
+            if batch:
+                on_frames(batch)
+            if count and seen >= count:
+                break
+        return sock.stats()
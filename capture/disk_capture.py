@@ -0,0 +1,154 @@
+# capture/disk_capture.py
+# Captura directa a disco (estilo dumpcap): la escritura no espera a la disección
+import argparse
+import threading
+import time
+
+from capture.live_capture import capture_linktype
+from capture.packet_queue import PacketQueue
+from capture.pcap_file import LINKTYPE_ETHERNET
+from capture.pcap_writer import PcapngWriter, PcapWriter, RotatingPcapWriter
+
+DEFAULT_QUEUE = 200_000
+WRITE_BATCH = 4096
+
+
+class DiskWriter:
+    """
+    Hilo escritor entre la captura y un writer (PcapWriter,
+    RotatingPcapWriter...). La callback de captura solo hace put(raw, ts_ns)
+    sobre una PacketQueue acotada; este hilo la vacía por lotes y escribe.
+    Si el disco no da abasto la cola se llena y las tramas nuevas se
+    descartan y se cuentan, sin frenar nunca la captura.
+    """
+
+    def __init__(self, writer, queue_size=DEFAULT_QUEUE, batch_size=WRITE_BATCH):
+        self.writer = writer
+        self.queue = PacketQueue(queue_size)
+        self.batch_size = batch_size
+        self.packets = 0
+        self.bytes = 0
+        self._started = None
+        self._stopped = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="disk-writer", daemon=True)
+
+    def put(self, raw, ts_ns, linktype=LINKTYPE_ETHERNET, origlen=None):
+        """Callback para start_live_capture(on_raw=...). False si se descartó."""
+        return self.queue.put((raw, ts_ns, linktype, origlen))
+
+    def start(self):
+        self._started = time.monotonic()
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Escribe lo que quede en la cola, cierra el writer y espera al hilo."""
+        self._stop.set()
+        self._thread.join()
+        self.writer.close()
+
+    def _run(self):
+        write = self.writer.write
+        while True:
+            batch = self.queue.drain(self.batch_size)
+            if not batch:
+                if self._stop.is_set():
+                    break
+                time.sleep(0.005)
+                continue
+            for raw, ts_ns, linktype, origlen in batch:
+                write(raw, ts_ns, origlen, linktype)
+                self.bytes += len(raw)
+            self.packets += len(batch)
+        self._stopped = time.monotonic()
+
+    def stats(self):
+        """Tramas y bytes escritos, descartes y throughput sostenido."""
+        q = self.queue.stats()
+        end = self._stopped or time.monotonic()
+        elapsed = end - self._started if self._started else 0.0
+        return {
+            "written": self.packets,
+            "bytes": self.bytes,
+            "dropped": q["dropped"],
+            "queued": q["queued"],
+            "high_water": q["high_water"],
+            "elapsed": elapsed,
+            "pps": self.packets / elapsed if elapsed else 0.0,
+            "mbps": self.bytes * 8 / 1e6 / elapsed if elapsed else 0.0,
+            "files": len(getattr(self.writer, "files", ())) or 1,
+        }
+
+
+def capture_to_disk(interface, writer, stop_callback=None, packet_filter=None, on_packet=None,
+                    queue_size=DEFAULT_QUEUE, report=None, report_interval=2.0, backend="auto"):
+    """
+    Captura de 'interface' a 'writer' con capture.live_capture (anillo
+    AF_PACKET en Linux, scapy si no; ver 'backend' allí) hasta que
+    stop_callback() devuelva True o llegue Ctrl+C. El writer debe usar el
+    linktype de la interfaz (capture.live_capture.capture_linktype). Las
+    tramas van a la cola del DiskWriter antes de parsear nada; on_packet
+    opcional recibe además los Packet (su disección no retrasa la escritura).
+    report(stats) se llama cada report_interval segundos desde otro hilo.
+    Devuelve las estadísticas finales de DiskWriter.stats().
+    """
+    from capture.live_capture import start_live_capture
+
+    disk = DiskWriter(writer, queue_size).start()
+    done = threading.Event()
+    if report is not None:
+        def _reporter():
+            while not done.wait(report_interval):
+                report(disk.stats())
+        threading.Thread(target=_reporter, daemon=True).start()
+    try:
+        start_live_capture(interface, on_packet, stop_callback,
+                           packet_filter=packet_filter, on_raw=disk.put, backend=backend)
+    except KeyboardInterrupt:
+        pass    # Ctrl+C: se vacía la cola y se cierra el archivo igualmente
+    finally:
+        done.set()
+        disk.stop()
+    return disk.stats()
+
+
+def _format_stats(s):
+    return (f"{s['written']:,} tramas  {s['bytes'] / 1e6:,.1f} MB  "
+            f"{s['pps']:,.0f} pps  {s['mbps']:,.1f} Mbit/s  "
+            f"descartadas {s['dropped']:,}  archivos {s['files']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Captura a un anillo de archivos pcap.")
+    parser.add_argument("-i", "--interface", required=True)
+    parser.add_argument("-w", "--directory", required=True, help="directorio de salida")
+    parser.add_argument("--prefix", default="capture")
+    parser.add_argument("--filesize", type=int, help="rotar cada N kB")
+    parser.add_argument("--duration", type=float, help="rotar cada N segundos")
+    parser.add_argument("--files", type=int, help="conservar solo los últimos N archivos")
+    parser.add_argument("-f", "--filter", help="filtro (core.display_filter)")
+    parser.add_argument("--pcapng", action="store_true", help="escribir pcapng en vez de pcap")
+    parser.add_argument("--backend", choices=("auto", "afpacket", "scapy"), default="auto",
+                        help="método de captura (auto: afpacket si es posible)")
+    args = parser.parse_args(argv)
+
+    packet_filter = None
+    if args.filter:
+        from core.filters import PacketFilter
+        packet_filter = PacketFilter(args.filter)
+
+    writer = RotatingPcapWriter(args.directory, args.prefix,
+                                linktype=capture_linktype(args.interface, args.backend),
+                                max_bytes=args.filesize * 1000 if args.filesize else None,
+                                max_seconds=args.duration, max_files=args.files,
+                                writer_class=PcapngWriter if args.pcapng else PcapWriter,
+                                extension=".pcapng" if args.pcapng else ".pcap")
+    stats = capture_to_disk(args.interface, writer, packet_filter=packet_filter,
+                            report=lambda s: print(_format_stats(s), end="\r", flush=True),
+                            backend=args.backend)
+    print(_format_stats(stats))
+
+
+if __name__ == "__main__":
+    main()
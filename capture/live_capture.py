@@ -1,21 +1,74 @@
 # capture/live_capture.py
-from scapy.all import sniff
-from core.dispatcher import parse_packet
+from core.dispatcher import parse_packet_lazy
+from capture import afpacket
+from capture.pcap_file import LINKTYPE_ETHERNET
 import time
 
-def start_live_capture(interface, on_packet, stop_callback=None, count=0):
+def capture_backend(backend="auto"):
+    """Resuelve backend="auto": "afpacket" si se puede abrir el socket, si no "scapy"."""
+    if backend == "auto":
+        return "afpacket" if afpacket.available() else "scapy"
+    return backend
+
+def capture_linktype(interface, backend="auto"):
+    """Linktype de las tramas que entregará start_live_capture (para el pcap de salida)."""
+    if capture_backend(backend) == "afpacket":
+        return afpacket.interface_linktype(interface)
+    return LINKTYPE_ETHERNET
+
+def start_live_capture(interface, on_packet, stop_callback=None, count=0, packet_filter=None,
+                       on_raw=None, backend="auto"):
     """
-    Inicia captura en la interfaz y llama on_packet(parsed).
+    Inicia captura en la interfaz y llama on_packet(packet) con un core.packet.Packet.
     Revisa stop_callback() para saber si debe detenerse.
+    packet_filter: core.filters.PacketFilter opcional, evaluado sobre los
+    bytes crudos antes de disecar (las tramas descartadas no se parsean).
+    on_raw: función opcional on_raw(raw, ts_ns, linktype, origlen) que
+    recibe la trama tal cual, antes de parsearla (p. ej. para escribirla a
+    disco). Si on_packet es None no se parsea nada.
+    backend: "afpacket" (Linux, anillo TPACKET_V3, ver capture.afpacket),
+    "scapy", o "auto" para usar afpacket si se puede abrir el socket.
     """
-    def _handle(pkt):
-        raw = bytes(pkt)
-        parsed = parse_packet(raw)
-        
-        # Agregar timestamp
-        parsed["timestamp"] = time.strftime("%H:%M:%S")
-        
-        on_packet(parsed)
+    backend = capture_backend(backend)
+
+    def _handle(data, ts_ns, linktype=LINKTYPE_ETHERNET, origlen=None):
+        # El filtro mira la trama sin copiarla; solo se copia si pasa
+        verdict = packet_filter.match_raw(data, linktype) if packet_filter else True
+        if verdict is False:
+            return
+        raw = bytes(data)
+        if origlen is None:
+            origlen = len(raw)
+        if verdict is True and on_raw is not None:
+            on_raw(raw, ts_ns, linktype, origlen)
+            if on_packet is None:
+                return
+        parsed = parse_packet_lazy(raw, ts_ns, linktype)
+        parsed.length = origlen
+        if verdict is None:
+            if not packet_filter.match_layers(parsed):
+                return
+            if on_raw is not None:
+                on_raw(raw, ts_ns, linktype, origlen)
+        if on_packet is not None:
+            on_packet(parsed)
+
+    if backend == "afpacket":
+        with afpacket.AfPacketSocket(interface) as sock:
+            seen = 0
+            for frames in sock.blocks(stop_callback):
+                for data, ts_ns, origlen in frames:
+                    _handle(data, ts_ns, sock.linktype, origlen)
+                    seen += 1
+                    if seen == count:
+                        return
+        return
+
+    from scapy.all import sniff
+
+    def _scapy_handle(pkt):
+        # Timestamp de captura en nanosegundos
+        _handle(bytes(pkt), time.time_ns())
 
     # Función que Scapy ejecuta con cada paquete para ver si para
     def _stop_check(pkt):
@@ -25,9 +78,9 @@ def start_live_capture(interface, on_packet, stop_callback=None, count=0):
 
     # Iniciamos el sniff pasando el stop_filter
     sniff(
-        iface=interface, 
-        prn=_handle, 
-        stop_filter=_stop_check, 
-        store=False, 
+        iface=interface,
+        prn=_scapy_handle,
+        stop_filter=_stop_check,
+        store=False,
         count=count
-    )
\ No newline at end of file
+    )
@@ -0,0 +1,114 @@
+# capture/packet_queue.py
+# Cola acotada entre el hilo de captura y la GUI (o entre etapas de capture.pipeline)
+import threading
+from collections import deque
+
+DEFAULT_MAXSIZE = 50_000
+
+# Qué hacer cuando la cola está llena
+DROP_NEW = "drop_new"   # descartar lo que llega (por defecto: nunca frena al productor)
+DROP_OLD = "drop_old"   # descartar lo más antiguo para hacer sitio
+BLOCK = "block"         # esperar a que haya sitio (contrapresión hacia el productor)
+POLICIES = (DROP_NEW, DROP_OLD, BLOCK)
+
+
+class PacketQueue:
+    """
+    Cola FIFO acotada y thread-safe: el hilo de captura hace put() y la GUI
+    vacía la cola por lotes con drain() desde un temporizador.
+
+    Si la GUI no da abasto y la cola se llena, los paquetes nuevos se
+    descartan (y se cuentan en 'dropped') en lugar de hacer crecer la
+    memoria o bloquear la captura. Con policy=DROP_OLD se descartan los
+    más antiguos y con policy=BLOCK put() espera a que haya sitio.
+    """
+
+    def __init__(self, maxsize=DEFAULT_MAXSIZE, policy=DROP_NEW):
+        if policy not in POLICIES:
+            raise ValueError(f"Política desconocida: {policy}")
+        self.maxsize = maxsize
+        self.policy = policy
+        self._items = deque()
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        self.closed = False
+        self.received = 0       # paquetes aceptados en la cola
+        self.dropped = 0        # descartados por cola llena
+        self.high_water = 0     # máximo de paquetes encolados a la vez
+
+    def put(self, item):
+        """Encola un paquete; False si se descartó por estar llena."""
+        return self.put_many((item,)) == 1
+
+    def put_many(self, items):
+        """Encola varios paquetes con una sola toma del lock; devuelve cuántos entraron."""
+        with self._lock:
+            accepted = 0
+            for item in items:
+                n = len(self._items)
+                if self.closed:
+                    self.dropped += 1
+                    continue
+                if n >= self.maxsize:
+                    if self.policy == BLOCK:
+                        while len(self._items) >= self.maxsize and not self.closed:
+                            self._not_full.wait()
+                        n = len(self._items)
+                    elif self.policy == DROP_OLD:
+                        self._items.popleft()
+                        self.dropped += 1
+                        n -= 1
+                    if self.closed or n >= self.maxsize:
+                        self.dropped += 1
+                        continue
+                self._items.append(item)
+                accepted += 1
+                if n >= self.high_water:
+                    self.high_water = n + 1
+            self.received += accepted
+            if accepted:
+                self._not_empty.notify_all()
+            return accepted
+
+    def drain(self, limit=None, timeout=0):
+        """
+        Saca hasta 'limit' paquetes (todos si es None), en orden. Con
+        timeout > 0 espera hasta ese tiempo si la cola está vacía.
+        """
+        with self._lock:
+            if timeout and not self._items and not self.closed:
+                self._not_empty.wait(timeout)
+            items = self._items
+            if limit is None or limit >= len(items):
+                self._items = deque()
+                out = list(items)
+            else:
+                out = [items.popleft() for _ in range(limit)]
+            if out:
+                self._not_full.notify_all()
+            return out
+
+    def close(self):
+        """Despierta a quien espere; lo que llegue después se descarta."""
+        with self._lock:
+            self.closed = True
+            self._not_empty.notify_all()
+            self._not_full.notify_all()
+
+    def __len__(self):
+        return len(self._items)
+
+    def stats(self):
+        """Contadores para la barra de estado."""
+        with self._lock:
+            return {
+                "queued": len(self._items),
+                "received": self.received,
+                "dropped": self.dropped,
+                "high_water": self.high_water,
+            }
+
+    def reset_stats(self):
+        with self._lock:
+            self.received = self.dropped = self.high_water = 0
@@ -0,0 +1,211 @@
+# capture/pcap_file.py
+# Lector nativo de pcap / pcapng basado en mmap (no requiere scapy)
+import mmap
+import struct
+from collections import namedtuple
+
+LINKTYPE_ETHERNET = 1
+
+# Cada paquete leído del archivo.
+# - offset: posición en el archivo donde empiezan los bytes de la trama
+# - ts_ns: marca temporal en nanosegundos desde epoch (entero, sin pérdida)
+# - caplen / origlen: bytes capturados / longitud original en el cable
+# - linktype: tipo de enlace (1 = Ethernet)
+# - data: memoryview sobre el mmap (zero-copy, válido mientras el archivo esté abierto)
+PcapRecord = namedtuple("PcapRecord", "offset ts_ns caplen origlen linktype data")
+
+# -------------------------------------------------------------------------
+# CONSTANTES DE FORMATO
+# -------------------------------------------------------------------------
+PCAP_MAGIC_US = 0xA1B2C3D4
+PCAP_MAGIC_NS = 0xA1B23C4D
+
+PCAPNG_SHB = 0x0A0D0D0A
+PCAPNG_IDB = 0x00000001
+PCAPNG_SPB = 0x00000003
+PCAPNG_EPB = 0x00000006
+PCAPNG_BYTE_ORDER_MAGIC = 0x1A2B3C4D
+
+OPT_ENDOFOPT = 0
+OPT_IF_TSRESOL = 9
+OPT_IF_TSOFFSET = 14
+
+
+def _ts_to_ns(ts, tsresol):
+    """
+    Convierte un timestamp pcapng (unidades de if_tsresol) a nanosegundos.
+    tsresol sigue la codificación del estándar: MSB=0 → 10^-v, MSB=1 → 2^-v.
+    """
+    if tsresol & 0x80:
+        return (ts * 1_000_000_000) >> (tsresol & 0x7F)
+    if tsresol <= 9:
+        return ts * 10 ** (9 - tsresol)
+    return ts // 10 ** (tsresol - 9)
+
+
+class PcapFile:
+    """
+    Archivo de captura (pcap clásico o pcapng) mapeado en memoria.
+
+    Iterar sobre el objeto devuelve PcapRecord con 'data' como memoryview
+    sobre el mmap: no se copian bytes por paquete.
+    Soporta pcap en ambos endians (micro y nanosegundos) y los bloques
+    SHB/IDB/EPB/SPB de pcapng (el resto de bloques se ignoran).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError as e:
+            self._file.close()
+            raise ValueError(f"Archivo de captura vacío: {path}") from e
+        self._view = memoryview(self._mm)
+        self.size = len(self._mm)
+
+        if self.size < 4:
+            self.close()
+            raise ValueError(f"Archivo de captura demasiado corto: {path}")
+
+        magic_le = struct.unpack_from("<I", self._mm, 0)[0]
+        magic_be = struct.unpack_from(">I", self._mm, 0)[0]
+
+        if magic_le == PCAPNG_SHB:
+            self.format = "pcapng"
+        elif PCAP_MAGIC_US in (magic_le, magic_be) or PCAP_MAGIC_NS in (magic_le, magic_be):
+            self.format = "pcap"
+            self._endian = "<" if magic_le in (PCAP_MAGIC_US, PCAP_MAGIC_NS) else ">"
+            self._nanos = PCAP_MAGIC_NS in (magic_le, magic_be)
+            if self.size < 24:
+                self.close()
+                raise ValueError(f"Cabecera pcap incompleta: {path}")
+            self.snaplen, self.linktype = struct.unpack_from(self._endian + "II", self._mm, 16)
+        else:
+            self.close()
+            raise ValueError(f"Formato de captura no reconocido: {path}")
+
+    # ------------------------------
+    #   Context manager / cierre
+    # ------------------------------
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """
+        Libera el mmap. Si todavía existen memoryviews de tramas vivas,
+        el mapeo se libera cuando el último de ellos desaparezca.
+        """
+        try:
+            if self._view is not None:
+                self._view.release()
+            self._mm.close()
+        except BufferError:
+            pass
+        self._view = None
+        self._file.close()
+
+    # ------------------------------
+    #   Acceso aleatorio
+    # ------------------------------
+    @property
+    def buffer(self):
+        """memoryview de todo el archivo (para decodificación por lotes)."""
+        return self._view
+
+    def frame(self, offset, caplen):
+        """Devuelve la trama que empieza en 'offset' (ver PcapRecord.offset)."""
+        return self._view[offset:offset + caplen]
+
+    # ------------------------------
+    #   Iteración
+    # ------------------------------
+    def __iter__(self):
+        if self.format == "pcap":
+            return self._iter_pcap()
+        return self._iter_pcapng()
+
+    def _iter_pcap(self):
+        hdr = struct.Struct(self._endian + "IIII")
+        mm, view, size = self._mm, self._view, self.size
+        linktype = self.linktype
+        frac_ns = 1 if self._nanos else 1000
+        off = 24
+
+        while off + 16 <= size:
+            ts_sec, ts_frac, caplen, origlen = hdr.unpack_from(mm, off)
+            start = off + 16
+            end = start + caplen
+            if end > size:
+                break  # registro truncado al final del archivo
+            yield PcapRecord(start, ts_sec * 1_000_000_000 + ts_frac * frac_ns,
+                             caplen, origlen, linktype, view[start:end])
+            off = end
+
+    def _iter_pcapng(self):
+        mm, view, size = self._mm, self._view, self.size
+        endian = "<"
+        interfaces = []   # lista de (linktype, snaplen, tsresol, tsoffset_ns)
+        off = 0
+
+        while off + 12 <= size:
+            block_type = struct.unpack_from(endian + "I", mm, off)[0]
+
+            # Un SHB puede cambiar el orden de bytes: se detecta por el magic
+            if block_type == PCAPNG_SHB:
+                bom = struct.unpack_from("<I", mm, off + 8)[0]
+                endian = "<" if bom == PCAPNG_BYTE_ORDER_MAGIC else ">"
+                interfaces = []
+
+            block_len = struct.unpack_from(endian + "I", mm, off + 4)[0]
+            if block_len < 12 or off + block_len > size:
+                break  # bloque corrupto o truncado
+            body = off + 8
+            body_end = off + block_len - 4
+
+            if block_type == PCAPNG_IDB:
+                linktype, _, snaplen = struct.unpack_from(endian + "HHI", mm, body)
+                tsresol, tsoffset = self._idb_options(endian, body + 8, body_end)
+                interfaces.append((linktype, snaplen, tsresol, tsoffset * 1_000_000_000))
+
+            elif block_type == PCAPNG_EPB:
+                iface, ts_high, ts_low, caplen, origlen = struct.unpack_from(endian + "IIIII", mm, body)
+                start = body + 20
+                if iface < len(interfaces) and start + caplen <= body_end:
+                    linktype, _, tsresol, tsoffset_ns = interfaces[iface]
+                    ts_ns = _ts_to_ns((ts_high << 32) | ts_low, tsresol) + tsoffset_ns
+                    yield PcapRecord(start, ts_ns, caplen, origlen, linktype,
+                                     view[start:start + caplen])
+
+            elif block_type == PCAPNG_SPB:
+                origlen = struct.unpack_from(endian + "I", mm, body)[0]
+                start = body + 4
+                if interfaces:
+                    linktype, snaplen, _, _ = interfaces[0]
+                    caplen = min(origlen, body_end - start)
+                    if snaplen:
+                        caplen = min(caplen, snaplen)
+                    # SPB no lleva timestamp
+                    yield PcapRecord(start, 0, caplen, origlen, linktype,
+                                     view[start:start + caplen])
+
+            off += block_len
+
+    def _idb_options(self, endian, off, end):
+        """Lee if_tsresol / if_tsoffset de las opciones de un IDB."""
+        tsresol = 6
+        tsoffset = 0
+        while off + 4 <= end:
+            code, length = struct.unpack_from(endian + "HH", self._mm, off)
+            if code == OPT_ENDOFOPT:
+                break
+            value = off + 4
+            if code == OPT_IF_TSRESOL and length >= 1:
+                tsresol = self._mm[value]
+            elif code == OPT_IF_TSOFFSET and length >= 8:
+                tsoffset = struct.unpack_from(endian + "q", self._mm, value)[0]
+            off = value + ((length + 3) & ~3)
+        return tsresol, tsoffset
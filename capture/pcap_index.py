@@ -0,0 +1,200 @@
+# capture/pcap_index.py
+# Índice "sidecar" de offsets de paquetes para acceso aleatorio a capturas grandes
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_left
+
+from capture.pcap_file import PcapFile
+
+INDEX_SUFFIX = ".idx"
+INDEX_MAGIC = b"SNIFIDX1"
+
+# magic, tamaño y mtime del pcap origen, nº paquetes, bytes capturados,
+# bytes originales, primer ts, último ts, flag ordenado, nº linktypes
+_HEADER = struct.Struct("<8sQqQQQqqBH")
+
+
+def index_path(path):
+    """Ruta del sidecar asociado a una captura."""
+    return os.fspath(path) + INDEX_SUFFIX
+
+
+def _source_id(path):
+    st = os.stat(path)
+    return st.st_size, st.st_mtime_ns
+
+
+class PcapIndex:
+    """
+    Índice compacto de una captura: por cada paquete guarda el offset de la
+    trama en el archivo, su timestamp (ns), caplen y linktype en arrays.
+    Ocupa 22 bytes por paquete y permite saltar al paquete N o al primer
+    paquete posterior a un instante T sin volver a recorrer el archivo.
+    """
+
+    def __init__(self):
+        self.offsets = array("Q")
+        self.timestamps = array("q")
+        self.caplens = array("I")
+        self.linktypes = array("H")
+        self.stats = {}
+
+    # ------------------------------
+    #   Construcción / persistencia
+    # ------------------------------
+    @classmethod
+    def build(cls, path):
+        """Recorre la captura una vez y construye el índice."""
+        idx = cls()
+        offsets, timestamps = idx.offsets, idx.timestamps
+        caplens, linktypes = idx.caplens, idx.linktypes
+        origbytes = 0
+
+        with PcapFile(path) as pcap:
+            for rec in pcap:
+                offsets.append(rec.offset)
+                timestamps.append(rec.ts_ns)
+                caplens.append(rec.caplen)
+                linktypes.append(rec.linktype)
+                origbytes += rec.origlen
+
+        idx.compute_stats(origbytes)
+        return idx
+
+    def append(self, offset, ts_ns, caplen, linktype):
+        """Añade un paquete (índice construido mientras se escribe la captura)."""
+        self.offsets.append(offset)
+        self.timestamps.append(ts_ns)
+        self.caplens.append(caplen)
+        self.linktypes.append(linktype)
+
+    def compute_stats(self, origbytes=None):
+        """Recalcula stats a partir de los arrays (origbytes = caplens si no se conoce)."""
+        offsets, timestamps = self.offsets, self.timestamps
+        caplens, linktypes = self.caplens, self.linktypes
+        ordered = all(a <= b for a, b in zip(timestamps, timestamps[1:]))
+        self.stats = {
+            "packets": len(offsets),
+            "bytes": sum(caplens),
+            "orig_bytes": sum(caplens) if origbytes is None else origbytes,
+            "first_ts": timestamps[0] if timestamps else 0,
+            "last_ts": timestamps[-1] if timestamps else 0,
+            "ordered": ordered,
+            "linktypes": sorted(set(linktypes)),
+        }
+        self._finish_stats()
+
+    def _finish_stats(self):
+        s = self.stats
+        s["duration"] = (s["last_ts"] - s["first_ts"]) / 1e9
+        s["avg_packet_size"] = s["bytes"] / s["packets"] if s["packets"] else 0.0
+
+    def save(self, path):
+        """Escribe el sidecar de la captura 'path'."""
+        size, mtime = _source_id(path)
+        s = self.stats
+        with open(index_path(path), "wb") as f:
+            f.write(_HEADER.pack(INDEX_MAGIC, size, mtime, s["packets"], s["bytes"],
+                                 s["orig_bytes"], s["first_ts"], s["last_ts"],
+                                 int(s["ordered"]), len(s["linktypes"])))
+            f.write(struct.pack(f"<{len(s['linktypes'])}H", *s["linktypes"]))
+            for arr in (self.offsets, self.timestamps, self.caplens, self.linktypes):
+                if sys.byteorder == "big":
+                    arr = array(arr.typecode, arr)
+                    arr.byteswap()
+                arr.tofile(f)
+
+    @classmethod
+    def _read_header(cls, f, path):
+        head = f.read(_HEADER.size)
+        if len(head) < _HEADER.size:
+            return None
+        (magic, size, mtime, packets, nbytes, origbytes,
+         first_ts, last_ts, ordered, n_link) = _HEADER.unpack(head)
+        if magic != INDEX_MAGIC or (size, mtime) != _source_id(path):
+            return None  # sidecar de otra versión del archivo
+        return {
+            "packets": packets,
+            "bytes": nbytes,
+            "orig_bytes": origbytes,
+            "first_ts": first_ts,
+            "last_ts": last_ts,
+            "ordered": bool(ordered),
+            "linktypes": list(struct.unpack(f"<{n_link}H", f.read(2 * n_link))),
+        }
+
+    @classmethod
+    def load(cls, path):
+        """Carga el sidecar si existe y corresponde al archivo actual; si no, None."""
+        try:
+            with open(index_path(path), "rb") as f:
+                stats = cls._read_header(f, path)
+                if stats is None:
+                    return None
+                idx = cls()
+                idx.stats = stats
+                idx._finish_stats()
+                n = stats["packets"]
+                for arr in (idx.offsets, idx.timestamps, idx.caplens, idx.linktypes):
+                    arr.fromfile(f, n)
+                    if sys.byteorder == "big":
+                        arr.byteswap()
+                return idx
+        except (OSError, EOFError, struct.error):
+            return None
+
+    @classmethod
+    def open(cls, path):
+        """Devuelve el índice de la captura: lo carga o lo construye y lo guarda."""
+        idx = cls.load(path)
+        if idx is None:
+            idx = cls.build(path)
+            try:
+                idx.save(path)
+            except OSError:
+                pass  # directorio de solo lectura: el índice queda solo en memoria
+        return idx
+
+    # ------------------------------
+    #   Consultas
+    # ------------------------------
+    def __len__(self):
+        return len(self.offsets)
+
+    def frame(self, pcap, n):
+        """Trama del paquete n (memoryview) dentro de un PcapFile abierto."""
+        return pcap.frame(self.offsets[n], self.caplens[n])
+
+    def find_time(self, ts_ns):
+        """
+        Índice del primer paquete con timestamp >= ts_ns (len(self) si no hay).
+        Búsqueda binaria si la captura está ordenada; lineal si no lo está.
+        """
+        if self.stats.get("ordered", True):
+            return bisect_left(self.timestamps, ts_ns)
+        for i, ts in enumerate(self.timestamps):
+            if ts >= ts_ns:
+                return i
+        return len(self)
+
+
+def capinfos(path):
+    """
+    Totales estilo capinfos (paquetes, duración, bytes, linktypes).
+    Si el sidecar está al día solo se lee su cabecera.
+    """
+    try:
+        with open(index_path(path), "rb") as f:
+            stats = PcapIndex._read_header(f, path)
+    except OSError:
+        stats = None
+
+    if stats is None:
+        return dict(PcapIndex.open(path).stats)
+
+    idx = PcapIndex()
+    idx.stats = stats
+    idx._finish_stats()
+    return idx.stats
@@ -1,23 +1,98 @@
 # capture/pcap_reader.py
-from core.dispatcher import parse_packet
+from core.dispatcher import parse_packet_lazy
+from capture.pcap_file import PcapFile
+from capture.pcap_index import PcapIndex
 import time
 
-def read_pcap(path, on_packet):
-    """
-    Lee un pcap y para cada paquete llama on_packet(parsed_dict).
-    Requiere scapy; si no está instalado, lanza excepción instructiva.
-    on_packet: función que recibe el resultado de parse_packet(raw_bytes)
-    """
-    try:
-        from scapy.all import rdpcap, RawPcapReader
-    except Exception as e:
-        raise RuntimeError("scapy no está instalado. Instálalo: pip install scapy") from e
-
-    # Usamos RawPcapReader para obtener bytes crudos
-    for ts, pkt_bytes in RawPcapReader(path):
-        # pkt_bytes ya es bytes de la trama (incluye layer 2 si es pcap normal)
-        parsed = parse_packet(bytes(pkt_bytes))
-        parsed["_pcap_ts"] = ts
-        on_packet(parsed)
-        # pequeña pausa opcional
-        time.sleep(0.001)
+# Lotes de iter_pcap_batches (carga en segundo plano de la GUI)
+FIRST_BATCH = 500
+MAX_BATCH = 20_000
+BATCH_INTERVAL = 0.1
+
+def _parse_frame(data, ts_ns, linktype):
+    # El paquete sobrevive al archivo: guardamos una copia propia de la trama.
+    # Las capas se disecan solo cuando alguien las pide (Packet.layers).
+    return parse_packet_lazy(bytes(data), ts_ns, linktype)
+
+def _filtered(packet_filter, data, ts_ns, linktype):
+    """
+    Aplica el filtro en dos fases: primero sobre los bytes crudos (sin
+    copiar ni disecar) y, solo si no basta, sobre el paquete disecado.
+    Devuelve el Packet si pasa o None si se descarta.
+    """
+    verdict = packet_filter.match_raw(data, linktype)
+    if verdict is False:
+        return None
+    pkt = _parse_frame(data, ts_ns, linktype)
+    if verdict is None and not packet_filter.match_layers(pkt):
+        return None
+    return pkt
+
+def read_pcap(path, on_packet, packet_filter=None):
+    """
+    Lee un pcap/pcapng y para cada paquete llama on_packet(packet).
+    Usa el lector nativo basado en mmap (no requiere scapy).
+    on_packet: función que recibe un core.packet.Packet con el timestamp
+    y el linktype originales de la captura
+    packet_filter: core.filters.PacketFilter opcional; las tramas que
+    descarta no se copian ni se disecan
+    """
+    with PcapFile(path) as pcap:
+        if packet_filter is None:
+            for rec in pcap:
+                on_packet(_parse_frame(rec.data, rec.ts_ns, rec.linktype))
+            return
+        for rec in pcap:
+            pkt = _filtered(packet_filter, rec.data, rec.ts_ns, rec.linktype)
+            if pkt is not None:
+                on_packet(pkt)
+
+def iter_pcap_batches(path, packet_filter=None, first_batch=FIRST_BATCH,
+                      max_batch=MAX_BATCH, interval=BATCH_INTERVAL):
+    """
+    Lee un pcap/pcapng por lotes para mostrarlo mientras se carga.
+    Genera (paquetes, bytes_leídos, bytes_totales).
+
+    El primer lote es pequeño (first_batch paquetes) para que la primera
+    pantalla aparezca enseguida; después cada lote se entrega al pasar
+    'interval' segundos o al llegar a max_batch paquetes, así el receptor
+    recibe pocos lotes por segundo sea cual sea el tamaño del archivo.
+    Para cancelar basta con dejar de iterar (el archivo se cierra).
+    """
+    clock = time.monotonic
+    with PcapFile(path) as pcap:
+        total = pcap.size
+        batch = []
+        limit = first_batch
+        deadline = clock() + interval
+        for n, rec in enumerate(pcap):
+            if packet_filter is None:
+                batch.append(_parse_frame(rec.data, rec.ts_ns, rec.linktype))
+            else:
+                pkt = _filtered(packet_filter, rec.data, rec.ts_ns, rec.linktype)
+                if pkt is not None:
+                    batch.append(pkt)
+            end = rec.offset + rec.caplen
+            # El reloj se consulta cada 256 tramas, no en todas
+            if len(batch) >= limit or (not n & 0xFF and clock() >= deadline):
+                yield batch, end, total
+                batch = []
+                limit = max_batch
+                deadline = clock() + interval
+        yield batch, total, total
+
+def read_pcap_range(path, start, count, on_packet):
+    """
+    Lee 'count' paquetes a partir del paquete número 'start' (base 0)
+    usando el índice sidecar, sin recorrer los paquetes anteriores.
+    Devuelve cuántos paquetes se entregaron.
+    """
+    idx = PcapIndex.open(path)
+    stop = min(len(idx), start + count)
+
+    with PcapFile(path) as pcap:
+        for n in range(start, stop):
+            data = idx.frame(pcap, n)
+            on_packet(_parse_frame(data, idx.timestamps[n], idx.linktypes[n]))
+
+    return max(0, stop - start)
@@ -0,0 +1,225 @@
+# capture/pcap_writer.py
+# Escritores nativos de pcap / pcapng y de anillos de archivos (no requieren scapy)
+import os
+import struct
+import time
+from collections import deque
+
+from capture.pcap_file import (LINKTYPE_ETHERNET, OPT_ENDOFOPT, OPT_IF_TSRESOL, PCAP_MAGIC_NS,
+                               PCAP_MAGIC_US, PCAPNG_BYTE_ORDER_MAGIC, PCAPNG_EPB, PCAPNG_IDB,
+                               PCAPNG_SHB)
+
+DEFAULT_SNAPLEN = 262144
+# Escrituras grandes: el sistema recibe bloques de 1 MB, no una llamada por trama
+DEFAULT_BUFFER = 1024 * 1024
+
+_GLOBAL_HEADER = struct.Struct("<IHHiIII")
+_RECORD_HEADER = struct.Struct("<IIII")
+
+# pcapng: SHB sin opciones, IDB con if_tsresol = 9 (ns) y cabecera de EPB
+_SHB = struct.Struct("<IIIHHqI")
+_IDB = struct.Struct("<IIHHIHHB3xHHI")
+_EPB_HEADER = struct.Struct("<IIIIIII")
+_PAD = (b"", b"\0\0\0", b"\0\0", b"\0")
+
+
+class _Writer:
+    """Parte común: archivo con buffer grande, cierre y context manager."""
+
+    def __init__(self, path, buffer_size):
+        self.path = path
+        self.count = 0
+        self._file = open(path, "wb", buffering=buffer_size)
+        self.offset = 0         # bytes escritos hasta ahora
+
+    def _write(self, data):
+        self._file.write(data)
+        self.offset += len(data)
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+    @property
+    def closed(self):
+        return self._file.closed
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class PcapWriter(_Writer):
+    """
+    Escribe un pcap clásico (little endian) con timestamps en nanosegundos
+    (magic 0xA1B23C4D) o en microsegundos (nanos=False).
+
+    write() devuelve el offset de la trama dentro del archivo, el mismo que
+    daría PcapRecord.offset al leerlo, para poder construir un PcapIndex
+    mientras se escribe.
+    """
+
+    def __init__(self, path, linktype=LINKTYPE_ETHERNET, snaplen=DEFAULT_SNAPLEN, nanos=True,
+                 buffer_size=DEFAULT_BUFFER):
+        super().__init__(path, buffer_size)
+        self.linktype = linktype
+        self.snaplen = snaplen
+        self.nanos = nanos
+        magic = PCAP_MAGIC_NS if nanos else PCAP_MAGIC_US
+        self._write(_GLOBAL_HEADER.pack(magic, 2, 4, 0, 0, snaplen, linktype))
+
+    def write(self, data, ts_ns, origlen=None, linktype=None):
+        """
+        Añade una trama; devuelve el offset de sus bytes en el archivo.
+        El pcap clásico tiene un solo linktype: si se indica otro distinto
+        se lanza ValueError (usar PcapngWriter para mezclar).
+        """
+        if linktype is not None and linktype != self.linktype:
+            raise ValueError(f"linktype {linktype} en un pcap de linktype {self.linktype}")
+        data = bytes(data[:self.snaplen])
+        sec, frac = divmod(ts_ns, 1_000_000_000)
+        if not self.nanos:
+            frac //= 1000
+        origlen = max(len(data), origlen or 0)
+        self._write(_RECORD_HEADER.pack(sec, frac, len(data), origlen))
+        start = self.offset
+        self._write(data)
+        self.count += 1
+        return start
+
+
+class PcapngWriter(_Writer):
+    """
+    Escribe pcapng (little endian): un SHB, un IDB por cada linktype que
+    aparezca (con if_tsresol = 9, timestamps en ns sin pérdida) y un EPB
+    por trama. A diferencia del pcap clásico admite mezclar linktypes.
+    """
+
+    def __init__(self, path, linktype=LINKTYPE_ETHERNET, snaplen=DEFAULT_SNAPLEN,
+                 buffer_size=DEFAULT_BUFFER):
+        super().__init__(path, buffer_size)
+        self.linktype = linktype
+        self.snaplen = snaplen
+        self._interfaces = {}   # linktype -> id de interfaz
+        self._write(_SHB.pack(PCAPNG_SHB, _SHB.size, PCAPNG_BYTE_ORDER_MAGIC, 1, 0, -1, _SHB.size))
+        self._interface(linktype)
+
+    def _interface(self, linktype):
+        iface = self._interfaces.get(linktype)
+        if iface is None:
+            iface = self._interfaces[linktype] = len(self._interfaces)
+            self._write(_IDB.pack(PCAPNG_IDB, _IDB.size, linktype, 0, self.snaplen,
+                                  OPT_IF_TSRESOL, 1, 9, OPT_ENDOFOPT, 0, _IDB.size))
+        return iface
+
+    def write(self, data, ts_ns, origlen=None, linktype=None):
+        """Añade una trama (EPB); devuelve el offset de sus bytes en el archivo."""
+        iface = self._interface(self.linktype if linktype is None else linktype)
+        data = bytes(data[:self.snaplen])
+        pad = _PAD[len(data) & 3]
+        size = _EPB_HEADER.size + len(data) + len(pad) + 4
+        origlen = max(len(data), origlen or 0)
+        self._write(_EPB_HEADER.pack(PCAPNG_EPB, size, iface, ts_ns >> 32, ts_ns & 0xFFFFFFFF,
+                                     len(data), origlen))
+        start = self.offset
+        self._write(data + pad + size.to_bytes(4, "little"))
+        self.count += 1
+        return start
+
+
+def open_writer(path, linktype=LINKTYPE_ETHERNET, **options):
+    """PcapngWriter si la ruta acaba en .pcapng, PcapWriter si no."""
+    if os.fspath(path).lower().endswith(".pcapng"):
+        options.pop("nanos", None)
+        return PcapngWriter(path, linktype, **options)
+    return PcapWriter(path, linktype, **options)
+
+
+class RotatingPcapWriter:
+    """
+    Escritura continua en un anillo de archivos (como dumpcap -b):
+    se pasa al siguiente archivo al llegar a max_bytes o cuando la trama
+    está a más de max_seconds del inicio del archivo actual (según los
+    timestamps de las tramas), y solo se conservan los últimos max_files
+    (los anteriores se borran). None desactiva cada límite.
+
+    Los archivos se llaman <prefix>_<nnnnn>_<AAAAmmddHHMMSS>.pcap.
+    writer_class permite cambiar el formato (recibe path, linktype y
+    las opciones extra de writer_options).
+    """
+
+    def __init__(self, directory, prefix="capture", linktype=LINKTYPE_ETHERNET,
+                 max_bytes=None, max_seconds=None, max_files=None,
+                 writer_class=PcapWriter, extension=".pcap", **writer_options):
+        self.directory = directory
+        self.prefix = prefix
+        self.linktype = linktype
+        self.max_bytes = max_bytes
+        self.max_seconds = max_seconds
+        self.max_files = max_files
+        self.writer_class = writer_class
+        self.extension = extension
+        self.writer_options = writer_options
+        os.makedirs(directory, exist_ok=True)
+
+        self.files = deque()        # rutas conservadas, de la más antigua a la actual
+        self.packets = 0
+        self.bytes = 0
+        self.rotations = 0
+        self._writer = None
+        self._file_start_ns = 0
+        self._seq = 0
+
+    @property
+    def path(self):
+        """Archivo en escritura (None antes de la primera trama)."""
+        return self._writer.path if self._writer is not None else None
+
+    def write(self, data, ts_ns, origlen=None, linktype=None):
+        writer = self._writer
+        if writer is None or (self.max_bytes is not None and writer.offset >= self.max_bytes) or \
+                (self.max_seconds is not None and
+                 ts_ns - self._file_start_ns >= self.max_seconds * 1_000_000_000):
+            writer = self.rotate(ts_ns)
+        writer.write(data, ts_ns, origlen, linktype)
+        self.packets += 1
+        self.bytes += len(data)
+
+    def rotate(self, ts_ns=None):
+        """Cierra el archivo actual y abre el siguiente del anillo."""
+        if ts_ns is None:
+            ts_ns = time.time_ns()
+        if self._writer is not None:
+            self._writer.close()
+            self.rotations += 1
+        self._seq += 1
+        stamp = time.strftime("%Y%m%d%H%M%S", time.localtime(ts_ns / 1e9))
+        path = os.path.join(self.directory, f"{self.prefix}_{self._seq:05d}_{stamp}{self.extension}")
+        self._writer = self.writer_class(path, self.linktype, **self.writer_options)
+        self._file_start_ns = ts_ns
+        self.files.append(path)
+        while self.max_files is not None and len(self.files) > self.max_files:
+            try:
+                os.remove(self.files.popleft())
+            except OSError:
+                pass
+        return self._writer
+
+    def flush(self):
+        if self._writer is not None:
+            self._writer.flush()
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,266 @@
+# capture/pipeline.py
+# Pipeline por etapas captura -> disección -> filtro -> sinks, con colas acotadas
+import threading
+import time
+import traceback
+
+from capture.packet_queue import BLOCK, DROP_NEW, PacketQueue
+from core.dispatcher import parse_packet_lazy
+
+DEFAULT_QUEUE = 50_000
+DEFAULT_BATCH = 1024
+# Espera máxima de un worker sin trabajo antes de comprobar si debe terminar
+_IDLE_WAIT = 0.05
+
+
+class Stage:
+    """
+    Etapa del pipeline: una PacketQueue acotada de entrada y 'workers'
+    hilos que sacan lotes, los procesan con func(lote) -> lote de salida
+    y entregan el resultado a las etapas siguientes.
+
+    Aunque haya varios workers el orden se conserva: cada lote recibe un
+    número al sacarse de la cola y los resultados se publican en ese orden.
+    'policy' (capture.packet_queue) decide qué pasa si la cola se llena:
+    descartar lo nuevo, lo antiguo o bloquear a la etapa anterior.
+
+    func None: la etapa es solo una cola que otro hilo vacía con drain()
+    (por ejemplo el temporizador de la GUI); no arranca hilos.
+    """
+
+    def __init__(self, name, func=None, workers=1, queue_size=DEFAULT_QUEUE, policy=DROP_NEW,
+                 batch_size=DEFAULT_BATCH, queue=None):
+        self.name = name
+        self.func = func
+        self.workers = workers if func is not None else 0
+        self.batch_size = batch_size
+        self.queue = queue if queue is not None else PacketQueue(queue_size, policy)
+        self.outputs = []
+
+        self.processed = 0      # elementos sacados de la cola y procesados
+        self.emitted = 0        # elementos entregados a las etapas siguientes
+        self.errors = 0         # lotes en los que func lanzó una excepción
+        self.lost = 0           # elementos de esos lotes (perdidos, no filtrados)
+        self.busy = 0.0         # segundos dentro de func
+        self.latency_sum = 0.0  # espera en cola + proceso, sumada por elemento
+        self.latency_max = 0.0
+        self._started = None
+        self._stopped = None
+
+        self._take_lock = threading.Lock()
+        self._publish = threading.Condition()
+        self._next_take = 0
+        self._next_publish = 0
+        self._threads = []
+
+    # ------------------------------
+    #   Entrada
+    # ------------------------------
+    def put_many(self, items):
+        """Encola elementos de la etapa anterior (con su instante de llegada)."""
+        now = time.monotonic()
+        if self.func is None:
+            return self.queue.put_many(items)
+        return self.queue.put_many([(now, item) for item in items])
+
+    # ------------------------------
+    #   Workers
+    # ------------------------------
+    def start(self):
+        self._started = time.monotonic()
+        for i in range(self.workers):
+            t = threading.Thread(target=self._run, name=f"pipeline-{self.name}-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def _run(self):
+        queue = self.queue
+        while True:
+            with self._take_lock:
+                batch = queue.drain(self.batch_size, timeout=_IDLE_WAIT)
+                if not batch:
+                    if queue.closed and not len(queue):
+                        return
+                    continue
+                seq = self._next_take
+                self._next_take += 1
+
+            start = time.monotonic()
+            error = None
+            try:
+                # Los sinks no devuelven nada: no entregan a ninguna etapa
+                out = self.func([item for _, item in batch]) or []
+            except Exception:
+                error = traceback.format_exc()
+                out = []
+            end = time.monotonic()
+
+            with self._publish:
+                if error is not None:
+                    # Solo la primera traza de cada etapa: el resto se cuenta
+                    if not self.errors:
+                        print(f"Error en la etapa '{self.name}' del pipeline; "
+                              f"se pierden los lotes que fallen:\n{error}", end="")
+                    self.errors += 1
+                    self.lost += len(batch)
+                while self._next_publish != seq:
+                    self._publish.wait()
+                for stage in self.outputs:
+                    stage.put_many(out)
+                self.processed += len(batch)
+                self.emitted += len(out)
+                self.busy += end - start
+                self.latency_sum += end * len(batch) - sum(t for t, _ in batch)
+                self.latency_max = max(self.latency_max, end - batch[0][0])
+                self._next_publish += 1
+                self._publish.notify_all()
+
+    def close(self):
+        """No admite más entrada; los workers terminan al vaciar la cola."""
+        self.queue.close()
+
+    def join(self, timeout=None):
+        for t in self._threads:
+            t.join(timeout)
+        self._stopped = time.monotonic()
+
+    # ------------------------------
+    #   Estadísticas
+    # ------------------------------
+    def stats(self):
+        q = self.queue.stats()
+        end = self._stopped or time.monotonic()
+        elapsed = end - self._started if self._started else 0.0
+        processed = self.processed if self.func is not None else q["received"] - q["queued"]
+        return {
+            "queued": q["queued"],
+            "received": q["received"],
+            "dropped": q["dropped"],
+            "high_water": q["high_water"],
+            "policy": self.queue.policy,
+            "workers": self.workers,
+            "processed": processed,
+            "emitted": self.emitted,
+            "errors": self.errors,
+            "lost": self.lost,
+            "pps": processed / elapsed if elapsed else 0.0,
+            "busy": self.busy / elapsed / max(1, self.workers) if elapsed else 0.0,
+            "latency_avg_ms": self.latency_sum / self.processed * 1000 if self.processed else 0.0,
+            "latency_max_ms": self.latency_max * 1000,
+        }
+
+
+class CapturePipeline:
+    """
+    Captura desacoplada en etapas con colas acotadas:
+
+        put(raw, ts_ns) -> [parse] -> [filter] -> sink 1, sink 2, ...
+
+    - parse: parse_packet_lazy en parse_workers hilos; con packet_filter
+      las tramas que match_raw descarta ni se copian a Packet
+    - filter: solo si el filtro necesita disecar (protocolos de aplicación)
+    - sinks: cualquier número, cada uno con su cola y su política (un sink
+      lento solo pierde o frena lo suyo según su política)
+
+    put() es la callback para start_live_capture(on_raw=...) y nunca
+    bloquea salvo que la etapa de entrada use policy=BLOCK. stats() da
+    por etapa recibidos, descartados, throughput, ocupación y latencia.
+    """
+
+    def __init__(self, packet_filter=None, parse_workers=1, queue_size=DEFAULT_QUEUE,
+                 policy=DROP_NEW, batch_size=DEFAULT_BATCH, filter_policy=BLOCK):
+        self.packet_filter = packet_filter
+        self.parse = Stage("parse", self._parse, parse_workers, queue_size, policy, batch_size)
+        self.stages = [self.parse]
+        if packet_filter is not None and packet_filter.needs_dissection:
+            # Tras la disección: contrapresión hacia parse en vez de perder paquetes ya parseados
+            self.filter = Stage("filter", self._filter, 1, queue_size, filter_policy, batch_size)
+            self.parse.outputs.append(self.filter)
+            self.stages.append(self.filter)
+        self.sinks = []
+        self._running = False
+
+    @property
+    def running(self):
+        """True desde start() hasta que stop() ha vaciado todas las etapas."""
+        return self._running
+
+    @property
+    def _last(self):
+        return self.stages[1] if len(self.stages) > 1 else self.parse
+
+    def add_sink(self, name, sink, workers=1, queue_size=DEFAULT_QUEUE, policy=DROP_NEW,
+                 batch_size=DEFAULT_BATCH):
+        """
+        Conecta un consumidor de Packet. 'sink' puede ser:
+        - una función sink(lista_de_packets), que se llama desde hilos propios
+        - una PacketQueue ya existente, que vacía otro (p. ej. la GUI con drain())
+        Devuelve la Stage creada.
+        """
+        if self._running:
+            raise RuntimeError("No se pueden añadir sinks con el pipeline en marcha")
+        if isinstance(sink, PacketQueue):
+            stage = Stage(name, queue=sink)
+        else:
+            stage = Stage(name, sink, workers, queue_size, policy, batch_size)
+        self._last.outputs.append(stage)
+        self.sinks.append(stage)
+        return stage
+
+    # ------------------------------
+    #   Etapas
+    # ------------------------------
+    def _parse(self, batch):
+        f = self.packet_filter
+        out = []
+        for raw, ts_ns, linktype in batch:
+            if f is not None and f.match_raw(raw, linktype) is False:
+                continue
+            out.append(parse_packet_lazy(raw, ts_ns, linktype))
+        return out
+
+    def _filter(self, batch):
+        return [p for p in batch if self.packet_filter.match(p)]
+
+    # ------------------------------
+    #   Ciclo de vida
+    # ------------------------------
+    def start(self):
+        self._running = True
+        for stage in self.stages + self.sinks:
+            stage.start()
+        return self
+
+    def put(self, raw, ts_ns, linktype=1):
+        """Entrada del pipeline (hilo de captura). False si se descartó."""
+        return self.parse.put_many(((raw, ts_ns, linktype),)) == 1
+
+    def put_many(self, frames):
+        """
+        Entrada por lotes de tuplas (raw, ts_ns, linktype), con una sola
+        toma del lock (capture.afpacket entrega así cada bloque del anillo).
+        Devuelve cuántas tramas entraron.
+        """
+        return self.parse.put_many(frames)
+
+    def stop(self, timeout=None):
+        """
+        Cierra la entrada y espera a que cada etapa vacíe su cola, en orden.
+        Las colas externas (PacketQueue de la GUI) no se cierran.
+        """
+        for stage in self.stages + self.sinks:
+            if stage.func is None:
+                continue
+            stage.close()
+            stage.join(timeout)
+        self._running = False
+
+    def stats(self):
+        """
+        Dict nombre de etapa -> contadores (ver Stage.stats), más 'filtered':
+        paquetes que el filtro ha descartado (no son pérdidas; las
+        pérdidas son 'dropped' por cola llena y 'lost' por errores).
+        """
+        out = {stage.name: stage.stats() for stage in self.stages + self.sinks}
+        out["filtered"] = sum(s.processed - s.lost - s.emitted for s in self.stages)
+        return out
@@ -0,0 +1,140 @@
+# core/batch.py
+# Extracción vectorizada (NumPy) de cabeceras para bloques de tramas
+from capture.pcap_file import PcapFile
+from capture.pcap_index import PcapIndex
+from core.columns import ColumnStore, DEFAULT_CHUNK, _numpy
+from core.dispatcher import APP_TCP_PORTS, APP_UDP_PORTS, parse_packet_lazy
+
+
+def decode_batch(buf, offsets, lengths, timestamps=None):
+    """
+    Decodifica de una vez las cabeceras de muchas tramas.
+
+    buf: buffer con las tramas (por ejemplo PcapFile.buffer, el mmap entero)
+    offsets / lengths: posición y caplen de cada trama dentro de buf
+
+    Cada campo se obtiene con un "gather" de NumPy (data[offsets + k]) sobre
+    todas las tramas a la vez; las que son demasiado cortas o no aplican
+    quedan a 0. Devuelve un dict columna -> array con los nombres de
+    core.columns.COLUMNS, listo para ColumnStore.append_columns().
+    """
+    np = _numpy()
+    data = np.frombuffer(buf, dtype=np.uint8)
+    if not len(data):
+        # Solo tramas vacías (p. ej. paquetes simulados): todo queda a 0,
+        # pero los gathers necesitan al menos el byte 0 al que se redirigen
+        data = np.zeros(1, dtype=np.uint8)
+    off = np.asarray(offsets, dtype=np.int64)
+    ln = np.asarray(lengths, dtype=np.int64)
+    end = off + ln
+
+    def u8(pos, valid):
+        # Las posiciones no válidas se redirigen al byte 0 y luego se anulan
+        return np.where(valid, data[np.where(valid, pos, 0)], 0).astype(np.uint32)
+
+    def u16(pos, valid):
+        return (u8(pos, valid) << 8) | u8(pos + 1, valid)
+
+    def u32(pos, valid):
+        return (u16(pos, valid) << 16) | u16(pos + 2, valid)
+
+    # ------------------ ETHERNET (+ VLAN) ------------------
+    ethertype = u16(off + 12, ln >= 14)
+    vlan = (ethertype == 0x8100) & (ln >= 18)
+    ethertype = np.where(vlan, u16(off + 16, vlan), ethertype)
+    l3 = off + 14 + 4 * vlan
+
+    # ------------------ IPv4 / IPv6 ------------------
+    v4 = (ethertype == 0x0800) & (end >= l3 + 20)
+    v6 = (ethertype == 0x86DD) & (end >= l3 + 40)
+
+    ihl = (u8(l3, v4) & 0x0F) * 4
+    proto = np.where(v4, u8(l3 + 9, v4), u8(l3 + 6, v6))
+    ttl = np.where(v4, u8(l3 + 8, v4), u8(l3 + 7, v6))
+    src = u32(l3 + 12, v4)
+    dst = u32(l3 + 16, v4)
+
+    n = len(off)
+    src6 = np.zeros((n, 16), dtype=np.uint8)
+    dst6 = np.zeros((n, 16), dtype=np.uint8)
+    rows6 = np.flatnonzero(v6)
+    if len(rows6):
+        k = np.arange(16)
+        src6[rows6] = data[(l3[rows6] + 8)[:, None] + k]
+        dst6[rows6] = data[(l3[rows6] + 24)[:, None] + k]
+
+    # ------------------ TCP / UDP ------------------
+    l4 = np.where(v4, l3 + ihl, l3 + 40)
+    tcp = (v4 | v6) & (proto == 6)
+    udp = (v4 | v6) & (proto == 17)
+    has_ports = (tcp | udp) & (end >= l4 + 4)
+    sport = u16(l4, has_ports)
+    dport = u16(l4 + 2, has_ports)
+    has_flags = tcp & (end >= l4 + 14)
+    tcp_flags = u16(l4 + 12, has_flags) & 0x01FF
+
+    return {
+        "ts_ns": np.zeros(n, dtype=np.int64) if timestamps is None else np.asarray(timestamps),
+        "length": ln,
+        "ethertype": ethertype,
+        "ip_version": np.where(v4, 4, np.where(v6, 6, 0)),
+        "src": src,
+        "dst": dst,
+        "src6": src6.view("S16").ravel(),
+        "dst6": dst6.view("S16").ravel(),
+        "proto": proto,
+        "sport": sport,
+        "dport": dport,
+        "tcp_flags": tcp_flags,
+        "ttl": ttl,
+        "offset": off,
+    }
+
+
+def needs_dissection(columns):
+    """
+    Máscara de las tramas que llevan un protocolo de aplicación
+    (DNS, DHCP, HTTP, FTP...) y por tanto deben pasar por los parsers.
+    """
+    np = _numpy()
+    tcp_ports = np.array(sorted(APP_TCP_PORTS))
+    udp_ports = np.array(sorted(APP_UDP_PORTS))
+    sport, dport, proto = columns["sport"], columns["dport"], columns["proto"]
+    tcp = (proto == 6) & (np.isin(sport, tcp_ports) | np.isin(dport, tcp_ports))
+    udp = (proto == 17) & (np.isin(sport, udp_ports) | np.isin(dport, udp_ports))
+    return tcp | udp
+
+
+def ingest_pcap(path, store=None, on_packet=None, batch_size=DEFAULT_CHUNK):
+    """
+    Carga una captura en un ColumnStore por bloques de 'batch_size' tramas.
+
+    Las cabeceras se extraen con decode_batch() directamente del mmap; solo
+    las tramas con protocolo de aplicación se disecan una a una y se
+    entregan a on_packet(row, packet) (row = número de fila en el store).
+    Devuelve el store.
+    """
+    np = _numpy()
+    store = store if store is not None else ColumnStore(batch_size)
+    idx = PcapIndex.open(path)
+    offsets = np.frombuffer(idx.offsets, dtype=np.uint64).astype(np.int64)
+    caplens = np.frombuffer(idx.caplens, dtype=np.uint32)
+    timestamps = np.frombuffer(idx.timestamps, dtype=np.int64)
+
+    with PcapFile(path) as pcap:
+        for start in range(0, len(idx), batch_size):
+            stop = start + batch_size
+            first_row = len(store)
+            cols = decode_batch(pcap.buffer, offsets[start:stop], caplens[start:stop],
+                                timestamps[start:stop])
+            store.append_columns(cols)
+
+            if on_packet is not None:
+                for i in np.flatnonzero(needs_dissection(cols)):
+                    n = start + int(i)
+                    pkt = parse_packet_lazy(bytes(idx.frame(pcap, n)),
+                                            idx.timestamps[n], idx.linktypes[n])
+                    pkt.dissect()   # disección completa (capa de aplicación)
+                    on_packet(first_row + int(i), pkt)
+
+    return store
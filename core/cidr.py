@@ -0,0 +1,287 @@
+# core/cidr.py
+# Tablas de prefijos CIDR (IPv4/IPv6) con búsqueda del prefijo más largo
+import csv
+import ipaddress
+from bisect import bisect_left, bisect_right
+
+from core.packet import AF_INET, AF_INET6, addr_to_int
+
+_BITS = {AF_INET: 32, AF_INET6: 128}
+# Bits altos de la dirección que indexan el directorio de intervalos
+DIRECTORY_BITS = 16
+
+
+class _Node:
+    __slots__ = ("key", "length", "value", "has_value", "children")
+
+    def __init__(self, key, length, value=None, has_value=False):
+        self.key = key              # dirección de red (entero, ya enmascarada)
+        self.length = length        # longitud del prefijo
+        self.value = value
+        self.has_value = has_value
+        self.children = [None, None]
+
+
+class RadixTrie:
+    """
+    Trie binario con compresión de caminos (Patricia) para una familia de
+    direcciones de 'bits' bits. Cada nodo guarda un prefijo completo; solo
+    hay nodos donde dos prefijos se separan, así que la profundidad depende
+    del número de prefijos y no de la longitud de la dirección.
+    """
+
+    def __init__(self, bits):
+        self.bits = bits
+        self.root = _Node(0, 0)
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def _mask(self, key, length):
+        shift = self.bits - length
+        return (key >> shift) << shift
+
+    def _bit(self, key, pos):
+        """Bit 'pos' de la dirección, contando desde el más significativo."""
+        return (key >> (self.bits - 1 - pos)) & 1
+
+    def insert(self, key, length, value):
+        """Añade (o sustituye) el prefijo key/length."""
+        key = self._mask(key, length)
+        node = self.root
+        while True:
+            if node.length == length:
+                if not node.has_value:
+                    self.size += 1
+                node.value, node.has_value = value, True
+                return
+            bit = self._bit(key, node.length)
+            child = node.children[bit]
+            if child is None:
+                node.children[bit] = _Node(key, length, value, True)
+                self.size += 1
+                return
+            # Bits comunes entre el prefijo nuevo y el del hijo
+            common = min(length, child.length,
+                         self.bits - (key ^ child.key).bit_length())
+            if common == child.length:
+                node = child
+                continue
+            # Se separan antes de llegar al hijo: nodo intermedio
+            mid = _Node(self._mask(key, common), common)
+            mid.children[self._bit(child.key, common)] = child
+            node.children[bit] = mid
+            if common == length:
+                mid.value, mid.has_value = value, True
+            else:
+                mid.children[self._bit(key, common)] = _Node(key, length, value, True)
+            self.size += 1
+            return
+
+    def get(self, key, length, default=None):
+        """Valor del prefijo exacto key/length."""
+        key = self._mask(key, length)
+        node = self.root
+        while node is not None:
+            if node.length == length:
+                return node.value if node.key == key and node.has_value else default
+            if node.length > length or self._mask(key, node.length) != node.key:
+                return default
+            node = node.children[self._bit(key, node.length)]
+        return default
+
+    def longest_match(self, addr):
+        """(longitud, valor) del prefijo más largo que contiene addr, o None."""
+        best = None
+        node = self.root
+        while node is not None:
+            if self._mask(addr, node.length) != node.key:
+                break
+            if node.has_value:
+                best = (node.length, node.value)
+            if node.length == self.bits:
+                break
+            node = node.children[self._bit(addr, node.length)]
+        return best
+
+    def items(self):
+        """(clave, longitud, valor) en preorden: por dirección y el padre antes que sus hijos."""
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            if node.has_value:
+                yield node.key, node.length, node.value
+            stack.extend(c for c in reversed(node.children) if c is not None)
+
+    def flatten(self):
+        """
+        Aplana el trie en intervalos disjuntos: (inicios, valores), con
+        valores[i] el resultado de longest_match para las direcciones
+        desde inicios[i] hasta el siguiente inicio. inicios[0] es siempre 0
+        (valor None si no hay prefijo). Con bisect la búsqueda es O(log n)
+        y se hace en C.
+        """
+        starts, values = [0], [None]
+
+        def emit(pos, value):
+            if starts[-1] == pos:
+                values[-1] = value
+            else:
+                starts.append(pos)
+                values.append(value)
+
+        stack = []      # (última dirección, valor) de los prefijos abiertos
+        for key, length, value in self.items():
+            while stack and stack[-1][0] < key:
+                end, _ = stack.pop()
+                emit(end + 1, stack[-1][1] if stack else None)
+            emit(key, value)
+            stack.append((key | ((1 << (self.bits - length)) - 1), value))
+        while stack:
+            end, _ = stack.pop()
+            emit(end + 1, stack[-1][1] if stack else None)
+
+        # Fusionar intervalos contiguos con el mismo valor
+        merged_starts, merged_values = [starts[0]], [values[0]]
+        for start, value in zip(starts[1:], values[1:]):
+            if value != merged_values[-1]:
+                merged_starts.append(start)
+                merged_values.append(value)
+        if merged_starts[-1] > (1 << self.bits) - 1:
+            del merged_starts[-1], merged_values[-1]
+        return merged_starts, merged_values
+
+
+class PrefixTable:
+    """
+    Conjunto de prefijos IPv4/IPv6 con una etiqueta cada uno (sitio,
+    proveedor, lista de vigilancia...). lookup() devuelve la etiqueta del
+    prefijo más largo que contiene la dirección.
+
+    Los prefijos se guardan en un RadixTrie por familia; para buscar se usa
+    su versión aplanada (intervalos ordenados + bisect), que se recalcula
+    solo cuando la tabla cambia.
+    """
+
+    def __init__(self, prefixes=(), name=None):
+        self.name = name
+        self.tries = {af: RadixTrie(bits) for af, bits in _BITS.items()}
+        self._lookups = {}          # af -> función compilada (ver _compile)
+        for prefix, label in prefixes:
+            self.add(prefix, label)
+
+    @classmethod
+    def from_csv(cls, path, name=None):
+        """
+        Carga un CSV con filas "prefijo,etiqueta" (la etiqueta es opcional
+        y por defecto es el propio prefijo). Se ignoran las líneas vacías,
+        las que empiezan por '#' y una cabecera inicial.
+        """
+        table = cls(name=name)
+        with open(path, newline="", encoding="utf-8") as f:
+            for lineno, row in enumerate(csv.reader(f), 1):
+                if not row or not row[0].strip() or row[0].lstrip().startswith("#"):
+                    continue
+                prefix = row[0].strip()
+                label = row[1].strip() if len(row) > 1 and row[1].strip() else None
+                try:
+                    table.add(prefix, label)
+                except ValueError:
+                    if lineno == 1:
+                        continue        # cabecera
+                    raise ValueError(f"{path}:{lineno}: prefijo no válido {prefix!r}") from None
+        return table
+
+    def add(self, prefix, label=None):
+        """Añade un prefijo ("10.0.0.0/8", "2001:db8::/32" o una dirección suelta)."""
+        net = ipaddress.ip_network(prefix, strict=False)
+        af = AF_INET if net.version == 4 else AF_INET6
+        self.tries[af].insert(int(net.network_address), net.prefixlen,
+                              str(net) if label is None else label)
+        self._lookups.pop(af, None)
+
+    def __len__(self):
+        return sum(len(t) for t in self.tries.values())
+
+    def _compile(self, af):
+        """
+        Función value -> etiqueta para una familia. Sobre los intervalos
+        aplanados se añade un directorio por los 16 bits altos: cada
+        búsqueda hace bisect solo dentro de su tramo (pocas comparaciones
+        y casi sin fallos de caché aunque haya cientos de miles de prefijos).
+        """
+        if af not in self.tries:
+            return lambda value: None
+        starts, values = self.tries[af].flatten()
+        shift = _BITS[af] - DIRECTORY_BITS
+        directory = [bisect_left(starts, k << shift) for k in range(1 << DIRECTORY_BITS)]
+        directory.append(len(starts))
+
+        def lookup(value, _s=starts, _v=values, _d=directory, _b=bisect_right):
+            k = value >> shift
+            return _v[_b(_s, value, _d[k], _d[k + 1]) - 1]
+
+        self._lookups[af] = lookup
+        return lookup
+
+    # ------------------------------
+    #   Búsqueda
+    # ------------------------------
+    def lookup(self, af, value):
+        """Etiqueta del prefijo más largo que contiene la dirección (af, entero), o None."""
+        fn = self._lookups.get(af)
+        if fn is None:
+            fn = self._compile(af)
+        return fn(value)
+
+    def contains(self, af, value):
+        return self.lookup(af, value) is not None
+
+    def label(self, address):
+        """Como lookup() pero con la dirección en texto."""
+        return self.lookup(*addr_to_int(address))
+
+    def __contains__(self, address):
+        return self.label(address) is not None
+
+    def matcher(self, af):
+        """
+        Función value -> bool para direcciones de la familia 'af'. Es la
+        que usan los filtros compilados; sigue viendo los prefijos que se
+        añadan después.
+        """
+        lookups = self._lookups
+
+        def match(value):
+            fn = lookups.get(af)
+            if fn is None:
+                fn = self._compile(af)
+            return fn(value) is not None
+        return match
+
+    def __repr__(self):
+        return f"PrefixTable({self.name!r}, {len(self)} prefijos)"
+
+
+# -------------------------------------------------------------------------
+# LISTAS CON NOMBRE (ip.addr in @nombre en los filtros)
+# -------------------------------------------------------------------------
+PREFIX_SETS = {}
+
+
+def register_prefix_set(name, table):
+    """Publica una PrefixTable para los filtros como @name."""
+    table.name = name
+    PREFIX_SETS[name.lower()] = table
+    return table
+
+
+def load_prefix_set(name, path):
+    """Carga un CSV de prefijos y lo registra como @name."""
+    return register_prefix_set(name, PrefixTable.from_csv(path))
+
+
+def get_prefix_set(name):
+    """PrefixTable registrada como @name (KeyError si no existe)."""
+    return PREFIX_SETS[name.lstrip("@").lower()]
@@ -0,0 +1,262 @@
+# core/columns.py
+# Almacén columnar en memoria (NumPy) para analizar capturas completas
+import struct
+
+ETHERTYPE_VLAN = 0x8100
+ETHERTYPE_IPV4 = 0x0800
+ETHERTYPE_IPV6 = 0x86DD
+
+IPPROTO_TCP = 6
+IPPROTO_UDP = 17
+
+# Columnas y su tipo NumPy. IPv4 va en src/dst como uint32;
+# IPv6 en src6/dst6 como 16 bytes. 'offset' enlaza cada fila con su
+# trama en el archivo de captura (-1 si el paquete no viene de un archivo).
+COLUMNS = (
+    ("ts_ns", "i8"),
+    ("length", "u4"),
+    ("ethertype", "u2"),
+    ("ip_version", "u1"),
+    ("src", "u4"),
+    ("dst", "u4"),
+    ("src6", "S16"),
+    ("dst6", "S16"),
+    ("proto", "u1"),
+    ("sport", "u2"),
+    ("dport", "u2"),
+    ("tcp_flags", "u2"),
+    ("ttl", "u1"),
+    ("offset", "i8"),
+)
+COLUMN_NAMES = tuple(name for name, _ in COLUMNS)
+
+DEFAULT_CHUNK = 65536
+
+_ETH = struct.Struct("!12xH")
+_IPV4 = struct.Struct("!BxH4xBB2xII")
+_IPV6 = struct.Struct("!4xHBB16s16s")
+_PORTS = struct.Struct("!HH")
+_TCP_FLAGS = struct.Struct("!12xH")
+
+
+def _numpy():
+    try:
+        import numpy as np
+    except Exception as e:
+        raise RuntimeError("numpy no está instalado. Instálalo: pip install numpy") from e
+    return np
+
+
+def decode_row(raw, ts_ns=0, offset=-1):
+    """
+    Extrae los campos de cabecera de una trama (Ethernet, VLAN opcional,
+    IPv4/IPv6, puertos TCP/UDP) como tupla en el orden de COLUMNS.
+    Los campos que no aplican quedan a 0.
+    """
+    n = len(raw)
+    ethertype = ip_version = src = dst = proto = sport = dport = flags = ttl = 0
+    src6 = dst6 = b""
+    l4 = -1
+
+    if n >= 14:
+        ethertype = _ETH.unpack_from(raw, 0)[0]
+        l3 = 14
+        if ethertype == ETHERTYPE_VLAN and n >= 18:
+            ethertype = _ETH.unpack_from(raw, 4)[0]
+            l3 = 18
+
+        if ethertype == ETHERTYPE_IPV4 and n >= l3 + 20:
+            ver_ihl, _, ttl, proto, src, dst = _IPV4.unpack_from(raw, l3)
+            ip_version = 4
+            l4 = l3 + (ver_ihl & 0x0F) * 4
+        elif ethertype == ETHERTYPE_IPV6 and n >= l3 + 40:
+            _, proto, ttl, src6, dst6 = _IPV6.unpack_from(raw, l3)
+            ip_version = 6
+            l4 = l3 + 40
+
+        if proto in (IPPROTO_TCP, IPPROTO_UDP) and 0 <= l4 and n >= l4 + 4:
+            sport, dport = _PORTS.unpack_from(raw, l4)
+            if proto == IPPROTO_TCP and n >= l4 + 14:
+                flags = _TCP_FLAGS.unpack_from(raw, l4)[0] & 0x01FF
+
+    return (ts_ns, n, ethertype, ip_version, src, dst, src6, dst6,
+            proto, sport, dport, flags, ttl, offset)
+
+
+class ColumnStore:
+    """
+    Campos de cabecera de todos los paquetes en columnas tipadas.
+
+    Las filas se acumulan en una lista y cada 'chunk_size' paquetes se
+    convierten en un array estructurado de NumPy; column() concatena los
+    bloques (y lo cachea) para operar de forma vectorizada sobre millones
+    de filas: filtrar, ordenar o sacar estadísticas sin bucles Python.
+
+    Además de COLUMNS admite columnas extra ya completas (por ejemplo los
+    campos de aplicación que trae export.export_columnar) con set_column().
+    """
+
+    def __init__(self, chunk_size=DEFAULT_CHUNK):
+        np = _numpy()
+        self.dtype = np.dtype(list(COLUMNS))
+        self.chunk_size = chunk_size
+        self._chunks = []
+        self._pending = []
+        self._rows = 0
+        self._cache = {}
+        self._extra = {}
+
+    # ------------------------------
+    #   Inserción
+    # ------------------------------
+    def append(self, raw, ts_ns=0, offset=-1):
+        """Decodifica y añade una trama."""
+        self.append_row(decode_row(raw, ts_ns, offset))
+
+    def append_packet(self, packet, offset=-1):
+        """Añade un core.packet.Packet (usa sus bytes crudos)."""
+        self.append_row(decode_row(packet.raw, packet.ts_ns, offset))
+
+    def append_row(self, row):
+        """Añade una fila ya decodificada (tupla en el orden de COLUMNS)."""
+        self._pending.append(row)
+        self._rows += 1
+        if len(self._pending) >= self.chunk_size:
+            self.flush()
+        else:
+            self._cache.clear()
+
+    def append_columns(self, columns):
+        """
+        Añade un bloque ya vectorizado: dict nombre -> array (mismo largo).
+        Las columnas ausentes quedan a 0.
+        """
+        np = _numpy()
+        self.flush()
+        n = len(next(iter(columns.values()))) if columns else 0
+        if not n:
+            return
+        chunk = np.zeros(n, dtype=self.dtype)
+        for name, values in columns.items():
+            chunk[name] = values
+        self._chunks.append(chunk)
+        self._rows += n
+        self._cache.clear()
+
+    def set_column(self, name, values):
+        """Añade (o sustituye) una columna extra con un valor por fila."""
+        np = _numpy()
+        values = np.asarray(values)
+        if name in self.dtype.names:
+            raise ValueError(f"{name} es una columna de cabecera")
+        if len(values) != self._rows:
+            raise ValueError(f"{name}: {len(values)} valores para {self._rows} filas")
+        self._extra[name] = values
+
+    def flush(self):
+        """Convierte las filas pendientes en un bloque NumPy."""
+        if self._pending:
+            np = _numpy()
+            self._chunks.append(np.array(self._pending, dtype=self.dtype))
+            self._pending = []
+        self._cache.clear()
+
+    # ------------------------------
+    #   Acceso
+    # ------------------------------
+    def __len__(self):
+        return self._rows
+
+    def table(self):
+        """Array estructurado con todas las filas."""
+        if "__table__" not in self._cache:
+            np = _numpy()
+            self.flush()
+            if not self._chunks:
+                table = np.zeros(0, dtype=self.dtype)
+            elif len(self._chunks) == 1:
+                table = self._chunks[0]
+            else:
+                # Compactamos en un solo bloque para no concatenar en cada consulta
+                table = np.concatenate(self._chunks)
+                self._chunks = [table]
+            self._cache["__table__"] = table
+        return self._cache["__table__"]
+
+    @property
+    def extra_columns(self):
+        return tuple(self._extra)
+
+    def column(self, name):
+        """Array NumPy de una columna (contiguo)."""
+        if name in self._extra:
+            return self._extra[name]
+        if name not in self._cache:
+            self._cache[name] = _numpy().ascontiguousarray(self.table()[name])
+        return self._cache[name]
+
+    def __getitem__(self, name):
+        return self.column(name)
+
+    # ------------------------------
+    #   Operaciones vectorizadas
+    # ------------------------------
+    def where(self, mask):
+        """Índices de fila donde mask (array bool) es True."""
+        return _numpy().flatnonzero(mask)
+
+    def sort_index(self, by, descending=False):
+        """Orden estable de filas según una o varias columnas."""
+        np = _numpy()
+        keys = [by] if isinstance(by, str) else list(by)
+        # lexsort ordena por la última clave primero
+        columns = [self.column(k) for k in reversed(keys)]
+        if not descending:
+            return np.lexsort(columns)
+        # Invertir el resultado dejaría los empates en orden inverso: se
+        # ordenan las filas al revés y se deshace, así los empates siguen
+        # en orden de inserción (vale también para columnas no numéricas)
+        n = len(self)
+        order = np.lexsort([c[::-1] for c in columns])
+        return (n - 1 - order)[::-1]
+
+    def frame(self, pcap, row, caplen=None):
+        """
+        Trama cruda de una fila a partir de su offset en un PcapFile abierto.
+        Usa la longitud de la fila si no se indica caplen.
+        """
+        offset = int(self.column("offset")[row])
+        if offset < 0:
+            return None
+        return pcap.frame(offset, caplen or int(self.column("length")[row]))
+
+    def stats(self):
+        """Totales y reparto por protocolo IP, calculados sin bucles Python."""
+        np = _numpy()
+        if not self._rows:
+            return {"packets": 0, "bytes": 0, "duration": 0.0, "protocols": {}}
+        ts = self.column("ts_ns")
+        length = self.column("length").astype(np.int64)
+        proto = self.column("proto")
+        protos, inverse = np.unique(proto, return_inverse=True)
+        counts = np.bincount(inverse)
+        nbytes = np.bincount(inverse, weights=length)
+        return {
+            "packets": self._rows,
+            "bytes": int(length.sum()),
+            "duration": float(ts.max() - ts.min()) / 1e9,
+            "protocols": {int(p): {"packets": int(c), "bytes": int(b)}
+                          for p, c, b in zip(protos, counts, nbytes)},
+        }
+
+
+def from_pcap(path, chunk_size=DEFAULT_CHUNK):
+    """Construye un ColumnStore recorriendo una captura (ver PcapFile)."""
+    from capture.pcap_file import PcapFile
+
+    store = ColumnStore(chunk_size)
+    with PcapFile(path) as pcap:
+        for rec in pcap:
+            store.append(rec.data, rec.ts_ns, rec.offset)
+    store.flush()
+    return store
@@ -1,33 +1,9 @@
 # core/dispatcher.py
 import struct
+from socket import inet_ntoa
 
-# -------------------------------------------------------------------------
-# IMPORTAR TODOS LOS PARSERS
-# -------------------------------------------------------------------------
-def try_import(path, name):
-    try:
-        module = __import__(path, fromlist=[name])
-        return getattr(module, name)
-    except Exception as e:
-        print(f"⚠️  ERROR IMPORTANDO {name}: {e}")
-        return None
-
-EthernetFrame = try_import("parsers.ethernet", "EthernetFrame")
-IPv4Packet    = try_import("parsers.ipv4", "IPv4Packet")
-IPv6          = try_import("parsers.ipv6", "IPv6")
-ARP           = try_import("parsers.arp", "ARP")
-TCP           = try_import("parsers.tcp", "TCP")
-UDP           = try_import("parsers.udp", "UDP")
-ICMP          = try_import("parsers.icmp", "ICMP")
-ICMPv6        = try_import("parsers.icmpv6", "ICMPv6")
-NDP           = try_import("parsers.ndp", "NDP")
-DNS           = try_import("parsers.dns", "DNS")
-DHCP          = try_import("parsers.dhcp", "DHCP")
-HTTP          = try_import("parsers.http", "HTTP") 
-FTP           = try_import("parsers.ftp", "FTP")
-SMTP          = try_import("parsers.smtp", "SMTP")
-POP3          = try_import("parsers.pop3", "POP3")
-IMAP          = try_import("parsers.imap", "IMAP")
+from core.packet import AF_INET, Packet
+from core.registry import REGISTRY
 
 # -------------------------------------------------------------------------
 # CONSTANTES
@@ -41,9 +17,21 @@ IPPROTO_UDP   = 17
 IPPROTO_ICMP  = 1
 IPPROTO_ICMPV6 = 58
 
+# -------------------------------------------------------------------------
+# PARSERS (se importan la primera vez que se usan, ver core.registry)
+# -------------------------------------------------------------------------
+_ARP  = REGISTRY.parser("parsers.arp:ARP")
+_IPV4 = REGISTRY.parser("parsers.ipv4:IPv4Packet")
+_IPV6 = REGISTRY.parser("parsers.ipv6:IPv6")
+_TCP  = REGISTRY.parser("parsers.tcp:TCP")
+_UDP  = REGISTRY.parser("parsers.udp:UDP")
+_ICMP = REGISTRY.parser("parsers.icmp:ICMP")
+
 # -------------------------------------------------------------------------
 # FUNCIONES AYUDA
 # -------------------------------------------------------------------------
+_ETHERTYPE = struct.Struct("!H")
+
 def mac_format(b):
     return ":".join(f"{x:02x}" for x in b)
 
@@ -52,7 +40,7 @@ def parse_ethernet(raw):
         return None
     dst = raw[0:6]
     src = raw[6:12]
-    ethertype = struct.unpack("!H", raw[12:14])[0]
+    ethertype = _ETHERTYPE.unpack_from(raw, 12)[0]
     payload = raw[14:]
     return {
         "layer": "Ethernet",
@@ -65,6 +53,202 @@ def parse_ethernet(raw):
         "ethertype": ethertype
     }
 
+# -------------------------------------------------------------------------
+# CAPA 3: handler(payload, out) -> (payload_l4, proto_ip) o None
+# -------------------------------------------------------------------------
+def _dissect_arp(payload, out):
+    ARP = _ARP.get()
+    if not ARP:
+        return None
+    try:
+        arp = ARP(payload)
+        out["layers"].append({"layer": "ARP", "fields": arp.to_dict()})
+        out["summary"] = f"ARP Who has {arp.tpa}? Tell {arp.spa}"
+    except:
+        out["layers"].append({"layer": "ARP", "fields": {"error": "ARP parse failed"}})
+    return None
+
+def _dissect_ipv4(payload, out):
+    IPv4Packet = _IPV4.get()
+    if not IPv4Packet:
+        return None
+    try:
+        ip = IPv4Packet(payload)
+        out["layers"].append({"layer": "IPv4", "fields": ip.to_dict()})
+        out["summary"] = f"IPv4 {ip.src} -> {ip.dst}"
+        return ip.payload, ip.proto
+    except Exception as e:
+        out["layers"].append({"layer":"IPv4", "fields": {"error": str(e)}})
+        return None
+
+def _dissect_ipv6(payload, out):
+    IPv6 = _IPV6.get()
+    if not IPv6:
+        return None
+    try:
+        ip6 = IPv6(payload)
+        out["layers"].append({"layer": "IPv6", "fields": ip6.to_dict()})
+        out["summary"] = f"IPv6 {ip6.src} -> {ip6.dst}"
+        return payload[40:], ip6.next_header
+    except:
+        out["layers"].append({"layer":"IPv6","fields":{"error":"IPv6 parse failed"}})
+        return None
+
+# -------------------------------------------------------------------------
+# CAPA 4: handler(payload, out)
+# -------------------------------------------------------------------------
+def _dissect_app(transport, sport, dport, data, out):
+    """
+    Busca el protocolo de aplicación por puerto (una búsqueda en dict) y lo
+    parsea. Si no hay parser registrado usa la etiqueta de detect_application.
+    """
+    app = REGISTRY.lookup_port(transport, sport, dport)
+    parser = app.parser.get() if app else None
+
+    if parser is None:
+        label = detect_application({"Source Port": sport, "Destination Port": dport})
+        if label:
+            out["layers"].append(label)
+            if "info" in label["fields"]:
+                out["summary"] = f"{label['layer']} {label['fields']['info']}"
+        return
+
+    try:
+        # Los parsers de texto usan .decode(): si llega un memoryview lo pasamos a bytes
+        fields = parser(bytes(data)).to_dict()
+    except Exception as e:
+        if app.error:
+            # Si falla (ej. paquete truncado), mostramos error
+            out["layers"].append({"layer": app.name, "fields": {"error": f"{app.error}: {e}"}})
+        return
+
+    out["layers"].append({"layer": app.name, "fields": fields})
+    if app.summary:
+        summary = app.summary(fields)
+        if summary:
+            out["summary"] = summary
+
+def _dissect_tcp(l4_payload, out):
+    TCP = _TCP.get()
+    if not TCP:
+        return
+    try:
+        tcp = TCP(l4_payload)
+        f = tcp.to_dict()
+        out["layers"].append({"layer": "TCP", "fields": f})
+
+        # Resumen TCP básico
+        sport = f.get("Source Port")
+        dport = f.get("Destination Port")
+        flags = f.get("Flags")
+        out["summary"] = f"{sport} -> {dport} [TCP] {flags}"
+
+        # El payload TCP empieza en l4_payload[tcp.offset:] (tcp.payload)
+        _dissect_app("tcp", sport, dport, tcp.payload, out)
+
+    except Exception as e:
+        out["layers"].append({"layer":"TCP","fields":{"error": f"TCP fail: {e}"}})
+
+def _dissect_udp(l4_payload, out):
+    UDP = _UDP.get()
+    if not UDP:
+        return
+    try:
+        udp = UDP(l4_payload)
+        f = udp.to_dict()
+        out["layers"].append({"layer": "UDP", "fields": f})
+
+        sport = f.get("Source Port")
+        dport = f.get("Destination Port")
+        length = f.get("Length")
+        out["summary"] = f"{sport} -> {dport} [UDP] Len={length}"
+
+        # El payload UDP empieza después de los 8 bytes del encabezado UDP
+        _dissect_app("udp", sport, dport, l4_payload[8:], out)
+
+    except:
+        out["layers"].append({"layer":"UDP","fields":{"error":"UDP fail"}})
+
+def _dissect_icmp(l4_payload, out):
+    ICMP = _ICMP.get()
+    if not ICMP:
+        return
+    try:
+        ic = ICMP(l4_payload)
+        # Guardamos el diccionario primero para poder leer la 'Description'
+        ic_data = ic.to_dict()
+
+        out["layers"].append({"layer": "ICMP", "fields": ic_data})
+
+        # Usamos la descripción legible (ej. "Echo (ping) request")
+        desc = ic_data.get("Description", f"Type={ic.type} Code={ic.code}")
+        out["summary"] = f"ICMP {desc}"
+    except:
+        out["layers"].append({"layer":"ICMP","fields":{"error":"ICMP fail"}})
+
+# -------------------------------------------------------------------------
+# CAPA 7: resúmenes por protocolo (fields -> resumen o None)
+# -------------------------------------------------------------------------
+def _http_summary(d):
+    if d.get("Type") == "request":
+        return f"HTTP {d.get('Method')} {d.get('Path')}"
+    if d.get("Type") == "response":
+        return f"HTTP {d.get('Status Code')} {d.get('Reason')}"
+    return "HTTP Data"
+
+def _ftp_summary(d):
+    # Mostrar primer comando o respuesta en el resumen
+    parsed_lines = d.get("Parsed", [])
+    if not parsed_lines:
+        return "FTP Control"
+    first = parsed_lines[0]
+    if first["type"] == "command":
+        return f"FTP Cmd: {first['raw']}"
+    if first["type"] == "response":
+        return f"FTP Resp: {first['code']} {first['message']}"
+    return None
+
+def _dhcp_summary(d):
+    msg_type = d.get("Options", {}).get("DHCP Message Type", "Transaction")
+    return f"DHCP {msg_type}"
+
+def _dns_summary(d):
+    return f"DNS Query: {d.get('Query Name', 'Unknown')}"
+
+# -------------------------------------------------------------------------
+# TABLAS DE DESPACHO
+# -------------------------------------------------------------------------
+REGISTRY.register_ethertype(ETHERTYPE_ARP, _dissect_arp)
+REGISTRY.register_ethertype(ETHERTYPE_IPV4, _dissect_ipv4)
+REGISTRY.register_ethertype(ETHERTYPE_IPV6, _dissect_ipv6)
+
+REGISTRY.register_ip_protocol(IPPROTO_TCP, _dissect_tcp)
+REGISTRY.register_ip_protocol(IPPROTO_UDP, _dissect_udp)
+REGISTRY.register_ip_protocol(IPPROTO_ICMP, _dissect_icmp)
+
+# El orden de registro es la prioridad cuando ambos puertos coinciden
+REGISTRY.register_port("tcp", 80, "HTTP", "parsers.http:HTTP", _http_summary)
+REGISTRY.register_port("tcp", 21, "FTP", "parsers.ftp:FTP", _ftp_summary)
+REGISTRY.register_port("tcp", 25, "SMTP", "parsers.smtp:SMTP", lambda d: "SMTP Email Exchange")
+REGISTRY.register_port("tcp", 110, "POP3", "parsers.pop3:POP3", lambda d: f"POP3 {d.get('First Line')}")
+REGISTRY.register_port("tcp", 143, "IMAP", "parsers.imap:IMAP", lambda d: "IMAP Traffic")
+REGISTRY.register_port("udp", (67, 68), "DHCP", "parsers.dhcp:DHCP", _dhcp_summary,
+                       error="DHCP Parse Error")
+REGISTRY.register_port("udp", 53, "DNS", "parsers.dns:DNS", _dns_summary)
+
+# Etiquetas simples para tráfico sin parser (p. ej. estos puertos sobre UDP)
+REGISTRY.register_label(80, {"layer": "HTTP", "fields": {"info": "HTTP Traffic"}})
+REGISTRY.register_label(21, {"layer": "FTP"})
+REGISTRY.register_label(25, {"layer": "SMTP"})
+REGISTRY.register_label(110, {"layer": "POP3"})
+REGISTRY.register_label(143, {"layer": "IMAP"})
+
+# Los handlers de arriba son los que replica el camino rápido
+REGISTRY.fast_path = True
+
+# Parsers de terceros (entry points "sniffer_redes.parsers")
+REGISTRY.load_plugins()
+
 # -------------------------------------------------------------------------
 # DETECCIÓN GENÉRICA (Solo para etiquetas simples)
 # -------------------------------------------------------------------------
@@ -75,25 +259,201 @@ def detect_application(l4):
     except:
         return None
 
-    # Nota: DHCP y DNS ahora se manejan con parsers reales, los quitamos de aquí
-    # para no duplicar información o etiquetas simples.
-    if 80 in (sport, dport):
-        return {"layer": "HTTP", "fields": {"info": "HTTP Traffic"}}
-    if 21 in (sport, dport):
-        return {"layer": "FTP"}
-    if 25 in (sport, dport):
-        return {"layer": "SMTP"}
-    if 110 in (sport, dport):
-        return {"layer": "POP3"}
-    if 143 in (sport, dport):
-        return {"layer": "IMAP"}
+    # Nota: DHCP y DNS se manejan con parsers reales (ver TABLAS DE DESPACHO)
+    label = REGISTRY.lookup_label(sport, dport)
+    if label is None:
+        return None
+    # Copia para que nadie modifique la etiqueta compartida
+    layer = dict(label)
+    if "fields" in layer:
+        layer["fields"] = dict(layer["fields"])
+    return layer
+
+# -------------------------------------------------------------------------
+# CAMINO RÁPIDO: Ethernet sin VLAN + IPv4 sin opciones + TCP/UDP
+# -------------------------------------------------------------------------
+# Ethernet (14) + cabecera IPv4 fija (20) en un solo unpack a offset 0
+_ETH_IPV4 = struct.Struct("!6s6sHBBHHHBBH4s4s")
+_TCP_HDR  = struct.Struct("!HHLLHHHH")
+_UDP_HDR  = struct.Struct("!HHHH")
+
+# Puertos con parser de aplicación o etiqueta de detect_application:
+# esos paquetes siempre van por el camino general. Son los conjuntos vivos
+# del registro, así que incluyen los puertos que registren los plugins.
+APP_TCP_PORTS = REGISTRY.app_ports["tcp"]
+APP_UDP_PORTS = REGISTRY.app_ports["udp"]
+
+_IPV4_PROTO_NAMES = {1: "ICMP", 6: "TCP", 17: "UDP", 58: "ICMPv6", 89: "OSPF"}
+
+_TCP_FLAG_NAMES = ((0x001, "FIN"), (0x002, "SYN"), (0x004, "RST"), (0x008, "PSH"),
+                   (0x010, "ACK"), (0x020, "URG"), (0x040, "ECE"), (0x080, "CWR"),
+                   (0x100, "NS"))
+# Las 512 combinaciones de flags precalculadas con el mismo formato que TCP.to_dict()
+_TCP_FLAG_STR = tuple(
+    "[" + ", ".join(name for bit, name in _TCP_FLAG_NAMES if flags & bit) + "]"
+    for flags in range(512)
+)
+
+def _parse_fast(raw):
+    """
+    Decodifica en una pasada Ethernet/IPv4/TCP|UDP con Structs precompilados
+    y offsets fijos, sin copiar el payload entre capas.
+    Devuelve None si el paquete no es el caso común (VLAN, opciones IPv4,
+    truncado, protocolo de aplicación...), y entonces se usa el camino general.
+    El resultado es idéntico al de _parse_general().
+    """
+    n = len(raw)
+    if n < 34:
+        return None
+    (dst_mac, src_mac, ethertype, ver_ihl, tos, total_length, ident,
+     flags_frag, ttl, proto, ip_sum, src, dst) = _ETH_IPV4.unpack_from(raw, 0)
+    if ethertype != ETHERTYPE_IPV4 or ver_ihl != 0x45:
+        return None
 
+    # Igual que IPv4Packet: el payload se recorta a total_length
+    l4_len = min(total_length, n - 14) - 20
+
+    if proto == IPPROTO_TCP:
+        if l4_len < 20:
+            return None
+        sport, dport, seq, ack, off_flags, window, l4_sum, urg = _TCP_HDR.unpack_from(raw, 34)
+        if sport in APP_TCP_PORTS or dport in APP_TCP_PORTS:
+            return None
+        hdr_len = (off_flags >> 12) * 4
+        flags = off_flags & 0x01FF
+        flags_str = _TCP_FLAG_STR[flags]
+        l4 = {"layer": "TCP", "fields": {
+            "Source Port": sport,
+            "Destination Port": dport,
+            "Sequence Number": seq,
+            "Acknowledgment": ack,
+            "Header Length": hdr_len,
+            "Flags": flags_str,
+            "Raw Flags": hex(flags),
+            "Window Size": window,
+            "Checksum": hex(l4_sum),
+            "Urgent Pointer": urg,
+            "Payload Length": max(0, l4_len - hdr_len),
+        }}
+        summary = f"{sport} -> {dport} [TCP] {flags_str}"
+
+    elif proto == IPPROTO_UDP:
+        if l4_len < 8:
+            return None
+        sport, dport, length, l4_sum = _UDP_HDR.unpack_from(raw, 34)
+        if sport in APP_UDP_PORTS or dport in APP_UDP_PORTS:
+            return None
+        l4 = {"layer": "UDP", "fields": {
+            "Source Port": sport,
+            "Destination Port": dport,
+            "Length": length,
+            "Checksum": hex(l4_sum),
+        }}
+        summary = f"{sport} -> {dport} [UDP] Len={length}"
+
+    else:
+        return None
+
+    eth = {"layer": "Ethernet", "fields": {
+        "dst_mac": dst_mac.hex(":"),
+        "src_mac": src_mac.hex(":"),
+        "ethertype": "0x0800",
+    }}
+    ip = {"layer": "IPv4", "fields": {
+        "version": 4,
+        "ihl": 20,
+        "tos": tos,
+        "total_length": total_length,
+        "id": ident,
+        "flags": (flags_frag >> 13) & 0x07,
+        "fragment_offset": flags_frag & 0x1FFF,
+        "ttl": ttl,
+        "protocol": _IPV4_PROTO_NAMES[proto],
+        "checksum": hex(ip_sum),
+        "src": inet_ntoa(src),
+        "dst": inet_ntoa(dst),
+    }}
+    return {"layers": [eth, ip, l4], "raw": raw, "summary": summary}
+
+# Direcciones como enteros y puertos/flags: lo justo para las columnas
+_ETH_IPV4_PEEK = struct.Struct("!12xHBxH5xB2xII")
+_TCP_PEEK = struct.Struct("!HH8xH")
+_UDP_PEEK = struct.Struct("!HHH")
+
+def _peek_l4(raw):
+    """
+    Decodifica solo lo imprescindible del caso común (mismas condiciones
+    que _parse_fast): (proto, src, dst, sport, dport, extra) donde extra son
+    los flags TCP o la longitud UDP. None si no es el caso común.
+    """
+    n = len(raw)
+    if n < 34:
+        return None
+    ethertype, ver_ihl, total_length, proto, src, dst = _ETH_IPV4_PEEK.unpack_from(raw, 0)
+    if ethertype != ETHERTYPE_IPV4 or ver_ihl != 0x45:
+        return None
+
+    l4_len = min(total_length, n - 14) - 20
+
+    if proto == IPPROTO_TCP and l4_len >= 20:
+        sport, dport, off_flags = _TCP_PEEK.unpack_from(raw, 34)
+        return proto, src, dst, sport, dport, off_flags & 0x01FF
+    if proto == IPPROTO_UDP and l4_len >= 8:
+        sport, dport, length = _UDP_PEEK.unpack_from(raw, 34)
+        return proto, src, dst, sport, dport, length
     return None
 
+def peek_summary(raw):
+    """
+    Resumen del caso común calculado solo con las cabeceras.
+    None si el paquete necesita disección completa para el resumen.
+    """
+    l4 = _peek_l4(raw)
+    if l4 is None:
+        return None
+    proto, _, _, sport, dport, extra = l4
+    if proto == IPPROTO_TCP:
+        if sport in APP_TCP_PORTS or dport in APP_TCP_PORTS:
+            return None
+        return f"{sport} -> {dport} [TCP] {_TCP_FLAG_STR[extra]}"
+    if sport in APP_UDP_PORTS or dport in APP_UDP_PORTS:
+        return None
+    return f"{sport} -> {dport} [UDP] Len={extra}"
+
+def parse_packet_lazy(raw_bytes, ts_ns=0, linktype=1):
+    """
+    Devuelve un Packet compacto. En el caso común las columnas salen de las
+    cabeceras (sin construir capas) y las capas se disecan solo cuando se
+    piden; en el resto se hace la disección completa en el momento.
+    raw_bytes debe ser bytes propios (el paquete puede vivir mucho tiempo).
+    """
+    l4 = _peek_l4(raw_bytes) if REGISTRY.fast_path else None
+    if l4 is None:
+        return Packet.from_parsed(parse_packet(raw_bytes), ts_ns, linktype)
+    proto, src, dst, sport, dport, _ = l4
+    return Packet(raw_bytes, ts_ns, linktype, AF_INET, src, dst,
+                  "TCP" if proto == IPPROTO_TCP else "UDP", sport, dport)
+
 # -------------------------------------------------------------------------
 # PARSEAR PAQUETE
 # -------------------------------------------------------------------------
 def parse_packet(raw_bytes):
+    """
+    Parsea una trama Ethernet completa.
+    raw_bytes puede ser bytes o un memoryview (por ejemplo, de PcapFile).
+    Prueba primero el camino rápido y si no aplica usa el general.
+    """
+    if REGISTRY.fast_path:
+        out = _parse_fast(raw_bytes)
+        if out is not None:
+            return out
+    return _parse_general(raw_bytes)
+
+def _parse_general(raw_bytes):
+    """
+    Camino general: cada capa con su parser y su to_dict().
+    Una búsqueda en las tablas de REGISTRY por capa (ethertype, protocolo IP).
+    """
     out = {"layers": [], "raw": raw_bytes, "summary": ""}
 
     # ------------------ ETHERNET ------------------
@@ -103,209 +463,19 @@ def parse_packet(raw_bytes):
         return out
 
     out["layers"].append({"layer": "Ethernet", "fields": eth["fields"]})
-    payload = eth["payload"]
-    ethertype = eth["ethertype"]
-    
-    l4_payload = b""
-    l4_proto = None
-
-    # ------------------ ARP ------------------
-    if ethertype == ETHERTYPE_ARP and ARP:
-        try:
-            arp = ARP(payload)
-            out["layers"].append({"layer": "ARP", "fields": arp.to_dict()})
-            out["summary"] = f"ARP Who has {arp.tpa}? Tell {arp.spa}"
-        except:
-            out["layers"].append({"layer": "ARP", "fields": {"error": "ARP parse failed"}})
-        return out
 
-    # ------------------ IPv4 ------------------
-    if ethertype == ETHERTYPE_IPV4 and IPv4Packet:
-        try:
-            ip = IPv4Packet(payload)
-            out["layers"].append({"layer": "IPv4", "fields": ip.to_dict()})
-            out["summary"] = f"IPv4 {ip.src} -> {ip.dst}"
-            l4_payload = ip.payload
-            l4_proto = ip.proto
-        except Exception as e:
-            out["layers"].append({"layer":"IPv4", "fields": {"error": str(e)}})
-            return out
-
-    # ------------------ IPv6 ------------------
-    elif ethertype == ETHERTYPE_IPV6 and IPv6:
-        try:
-            ip6 = IPv6(payload)
-            out["layers"].append({"layer": "IPv6", "fields": ip6.to_dict()})
-            out["summary"] = f"IPv6 {ip6.src} -> {ip6.dst}"
-            l4_payload = payload[40:]
-            l4_proto = ip6.next_header
-        except:
-            out["layers"].append({"layer":"IPv6","fields":{"error":"IPv6 parse failed"}})
-            return out
-    else:
+    # ------------------ CAPA 3 ------------------
+    l3_handler = REGISTRY.ethertypes.get(eth["ethertype"])
+    if l3_handler is None:
+        return out
+    l3 = l3_handler(eth["payload"], out)
+    if l3 is None:
         return out
 
-    # ------------------ TCP ------------------
-    if l4_proto == IPPROTO_TCP and TCP:
-        try:
-            tcp = TCP(l4_payload)
-            f = tcp.to_dict()
-            out["layers"].append({"layer": "TCP", "fields": f})
-            
-            # Resumen TCP básico
-            sport = f.get("Source Port")
-            dport = f.get("Destination Port")
-            flags = f.get("Flags")
-            out["summary"] = f"{sport} -> {dport} [TCP] {flags}"
-            
-            # --- AQUÍ ESTÁ LA MEJORA PARA PROTOCOLOS TCP ---
-            # El payload TCP empieza en l4_payload[tcp.offset:]
-            # tcp.offset es el tamaño del header calculado en el parser TCP
-            tcp_payload_data = tcp.payload # Tu parser TCP ya tiene esto guardado en self.payload
-            
-            # 1. HTTP (Puerto 80)
-            if (sport == 80 or dport == 80) and HTTP:
-                try:
-                    http_parsed = HTTP(tcp_payload_data)
-                    out["layers"].append({"layer": "HTTP", "fields": http_parsed.to_dict()})
-                    
-                    # Resumen Inteligente HTTP
-                    d = http_parsed.to_dict()
-                    if d.get("Type") == "request":
-                        out["summary"] = f"HTTP {d.get('Method')} {d.get('Path')}"
-                    elif d.get("Type") == "response":
-                        out["summary"] = f"HTTP {d.get('Status Code')} {d.get('Reason')}"
-                    else:
-                        out["summary"] = "HTTP Data"
-                except:
-                    pass
-
-            # 2. FTP (Puerto 21)
-            elif (sport == 21 or dport == 21) and FTP:
-                try:
-                    ftp_parsed = FTP(tcp_payload_data)
-                    out["layers"].append({"layer": "FTP", "fields": ftp_parsed.to_dict()})
-                    
-                    # Mostrar primer comando o respuesta en el resumen
-                    parsed_lines = ftp_parsed.to_dict().get("Parsed", [])
-                    if parsed_lines:
-                        first = parsed_lines[0]
-                        if first["type"] == "command":
-                            out["summary"] = f"FTP Cmd: {first['raw']}"
-                        elif first["type"] == "response":
-                            out["summary"] = f"FTP Resp: {first['code']} {first['message']}"
-                    else:
-                        out["summary"] = "FTP Control"
-                except:
-                    pass
-
-            # 3. SMTP (Puerto 25)
-            elif (sport == 25 or dport == 25) and SMTP:
-                try:
-                    smtp_parsed = SMTP(tcp_payload_data)
-                    out["layers"].append({"layer": "SMTP", "fields": smtp_parsed.to_dict()})
-                    out["summary"] = "SMTP Email Exchange"
-                except:
-                    pass
-
-            # 4. POP3 (Puerto 110)
-            elif (sport == 110 or dport == 110) and POP3:
-                try:
-                    pop3_parsed = POP3(tcp_payload_data)
-                    out["layers"].append({"layer": "POP3", "fields": pop3_parsed.to_dict()})
-                    out["summary"] = f"POP3 {pop3_parsed.to_dict().get('First Line')}"
-                except:
-                    pass
-
-            # 5. IMAP (Puerto 143)
-            elif (sport == 143 or dport == 143) and IMAP:
-                try:
-                    imap_parsed = IMAP(tcp_payload_data)
-                    out["layers"].append({"layer": "IMAP", "fields": imap_parsed.to_dict()})
-                    out["summary"] = "IMAP Traffic"
-                except:
-                    pass
-
-            # Si no es ninguno de los anteriores, usamos la detección simple
-            else:
-                app = detect_application(f)
-                if app: 
-                    out["layers"].append(app)
-                    if "info" in app["fields"]:
-                            out["summary"] = f"{app['layer']} {app['fields']['info']}"
-
-        except Exception as e:
-            out["layers"].append({"layer":"TCP","fields":{"error": f"TCP fail: {e}"}})
-
-    # ------------------ UDP ------------------
-    if l4_proto == IPPROTO_UDP and UDP:
-        try:
-            udp = UDP(l4_payload)
-            f = udp.to_dict()
-            out["layers"].append({"layer": "UDP", "fields": f})
-            
-            sport = f.get("Source Port")
-            dport = f.get("Destination Port")
-            length = f.get("Length")
-            out["summary"] = f"{sport} -> {dport} [UDP] Len={length}"
-
-            # --- AQUI ESTA LA MAGIA PARA DHCP y DNS ---
-            
-            # 1. DHCP (Puertos 67 Servidor / 68 Cliente)
-            if (sport in (67, 68) or dport in (67, 68)) and DHCP:
-                try:
-                    # El payload UDP empieza después de los 8 bytes del encabezado UDP
-                    dhcp_data = l4_payload[8:]
-                    dhcp_parsed = DHCP(dhcp_data)
-                    out["layers"].append({"layer": "DHCP", "fields": dhcp_parsed.to_dict()})
-                    
-                    # Actualizamos el resumen con info útil
-                    opts = dhcp_parsed.to_dict().get("Options", {})
-                    msg_type = opts.get("DHCP Message Type", "Transaction")
-                    out["summary"] = f"DHCP {msg_type}"
-                except Exception as e:
-                        # Si falla (ej. paquete truncado), mostramos error
-                        out["layers"].append({"layer": "DHCP", "fields": {"error": f"DHCP Parse Error: {e}"}})
-            # 2. DNS (Puerto 53)
-            elif (sport == 53 or dport == 53) and DNS:
-                try:
-                    dns_data = l4_payload[8:]
-                    dns_parsed = DNS(dns_data)
-                    d_dict = dns_parsed.to_dict() # Guardamos el dict
-                    out["layers"].append({"layer": "DNS", "fields": d_dict})
-                    
-                    # Resumen VIP:
-                    q_name = d_dict.get("Query Name", "Unknown")
-                    out["summary"] = f"DNS Query: {q_name}"
-                except:
-                    pass
-            
-            # 3. Otras aplicaciones simples
-            else:
-                app = detect_application(f)
-                if app: 
-                    out["layers"].append(app)
-                    if "info" in app["fields"]:
-                            out["summary"] = f"{app['layer']} {app['fields']['info']}"
-
-        except:
-            out["layers"].append({"layer":"UDP","fields":{"error":"UDP fail"}})
-
-# ------------------ ICMPv4 ------------------
-    if l4_proto == IPPROTO_ICMP and ICMP:
-        try:
-            ic = ICMP(l4_payload)
-            # Guardamos el diccionario primero para poder leer la 'Description'
-            ic_data = ic.to_dict()
-            
-            out["layers"].append({"layer": "ICMP", "fields": ic_data})
-            
-            # Usamos la descripción legible (ej. "Echo (ping) request")
-            # Si no existe el campo (por si no guardaste el otro archivo), usa el Type/Code
-            desc = ic_data.get("Description", f"Type={ic.type} Code={ic.code}")
-            
-            out["summary"] = f"ICMP {desc}"
-        except:
-            out["layers"].append({"layer":"ICMP","fields":{"error":"ICMP fail"}})
-            
-    return out
\ No newline at end of file
+    # ------------------ CAPA 4 (+ aplicación) ------------------
+    l4_payload, l4_proto = l3
+    l4_handler = REGISTRY.ip_protocols.get(l4_proto)
+    if l4_handler is not None:
+        l4_handler(l4_payload, out)
+
+    return out
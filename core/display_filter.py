@@ -0,0 +1,689 @@
+# core/display_filter.py
+# Lenguaje de filtros estilo Wireshark: "ip.src == 10.0.0.0/8 && tcp.dport in {80,443} && !arp"
+import ipaddress
+import re
+from struct import Struct
+
+from core.cidr import get_prefix_set
+from core.packet import AF_INET, AF_INET6, AF_NONE, addr_to_int
+
+
+class FilterError(ValueError):
+    """Expresión de filtro mal formada o con campos desconocidos."""
+
+
+# -------------------------------------------------------------------------
+# CAMPOS DE CABECERA (a offset fijo: se leen sin disecar)
+# -------------------------------------------------------------------------
+LINKTYPE_ETHERNET = 1
+
+_ETHERTYPE = Struct("!H")
+_IPV4 = Struct("!BxH5xB2xII")      # ver_ihl, total_length, proto, src, dst
+_IPV6 = Struct("!6xBx16s16s")      # next_header, src, dst
+_PORTS = Struct("!HH")
+_TCP_FLAGS = Struct("!H")          # offset(4) + reservado + flags(9), byte 12
+
+# Índices de la tupla de campos que devuelven decode_raw / decode_layers
+ETHERTYPE, AF, SRC, DST, PROTO, SPORT, DPORT, FLAGS, NAMES, LENGTH = range(10)
+
+# Nombre de protocolo en el dict de IPv4 -> número (ver parsers/ipv4.py)
+_IPV4_PROTO_NUMBERS = {"ICMP": 1, "TCP": 6, "UDP": 17, "ICMPv6": 58, "OSPF": 89}
+
+
+def decode_raw(raw):
+    """
+    Lee de la trama los campos que los filtros pueden evaluar sin disecar.
+    Devuelve None si la trama no es concluyente (truncada o con cabeceras
+    inválidas): en ese caso decide la evaluación sobre las capas.
+    """
+    n = len(raw)
+    if n < 14:
+        return None
+    ethertype = _ETHERTYPE.unpack_from(raw, 12)[0]
+    af = AF_NONE
+    src = dst = 0
+    proto = -1
+    l4 = l4_end = 0
+
+    if ethertype == 0x0800:
+        if n < 34:
+            return None
+        ver_ihl, total_length, proto, src, dst = _IPV4.unpack_from(raw, 14)
+        ihl = (ver_ihl & 0x0F) * 4
+        if ihl < 20:
+            return None
+        af = AF_INET
+        l4 = 14 + ihl
+        l4_end = min(14 + total_length, n)
+    elif ethertype == 0x86DD:
+        if n < 54:
+            return None
+        proto, src, dst = _IPV6.unpack_from(raw, 14)
+        af = AF_INET6
+        src = int.from_bytes(src, "big")
+        dst = int.from_bytes(dst, "big")
+        l4 = 54
+        l4_end = n
+
+    sport = dport = flags = None
+    if proto == 6:
+        if l4_end - l4 < 20:
+            return None
+        sport, dport = _PORTS.unpack_from(raw, l4)
+        flags = _TCP_FLAGS.unpack_from(raw, l4 + 12)[0] & 0x01FF
+    elif proto == 17:
+        if l4_end - l4 < 8:
+            return None
+        sport, dport = _PORTS.unpack_from(raw, l4)
+
+    return (ethertype, af, src, dst, proto, sport, dport, flags, None, n)
+
+
+ALL_FIELDS = frozenset(range(10))
+
+
+def _extractor_source(wanted):
+    """
+    Código de una función extract(layers, length) que recorre la lista de
+    capas una sola vez y calcula solo los índices de 'wanted'.
+    """
+    addresses = SRC in wanted or DST in wanted
+    lines = [
+        "def extract(layers, length):",
+        "    ethertype = proto = -1",
+        "    af = 0",
+        "    src = dst = 0",
+        "    sport = dport = flags = None",
+        "    names = set() if %r else None" % (NAMES in wanted),
+        "    for layer in layers:",
+        "        name = layer.get('layer')",
+    ]
+    if NAMES in wanted:
+        lines.append("        names.add(_lower(name))")
+    if ETHERTYPE in wanted:
+        lines += ["        if name == 'Ethernet':",
+                  "            f = layer.get('fields') or {}",
+                  "            if 'ethertype' in f:",
+                  "                ethertype = int(f['ethertype'], 16)",
+                  "            continue"]
+    lines += ["        if name == 'IPv4':",
+              "            f = layer.get('fields') or {}",
+              "            af = 4",
+              "            p = f.get('protocol')",
+              "            if p is not None:",
+              "                proto = _IPV4_PROTO_NUMBERS.get(p) or int(p)"]
+    if addresses:
+        lines += ["            s, d = f.get('src'), f.get('dst')"]
+    lines += ["        elif name == 'IPv6':",
+              "            f = layer.get('fields') or {}",
+              "            af = 6",
+              "            proto = f.get('Next Header', proto)"]
+    if addresses:
+        lines += ["            s, d = f.get('Source IPv6'), f.get('Destination IPv6')"]
+    lines += ["        elif name == 'TCP' or name == 'UDP':",
+              "            f = layer.get('fields') or {}",
+              "            if 'Source Port' in f:",
+              "                sport = f['Source Port']",
+              "                dport = f['Destination Port']"]
+    if FLAGS in wanted:
+        lines += ["                if 'Raw Flags' in f:",
+                  "                    flags = int(f['Raw Flags'], 16)"]
+    if addresses:
+        lines += ["        else:",
+                  "            continue",
+                  "        if name[:2] == 'IP':",
+                  "            if s:",
+                  "                af, src = _address(s)",
+                  "            if d:",
+                  "                af, dst = _address(d)"]
+    lines.append("    return (ethertype, af, src, dst, proto, sport, dport, flags, names, length)")
+    return "\n".join(lines) + "\n"
+
+
+_EXTRACTORS = {}
+
+
+def _extractor(wanted):
+    """Función extract() compilada para un conjunto de campos (cacheada)."""
+    fn = _EXTRACTORS.get(wanted)
+    if fn is None:
+        namespace = {"_IPV4_PROTO_NUMBERS": _IPV4_PROTO_NUMBERS, "_address": _address,
+                     "_lower": _lower}
+        exec(compile(_extractor_source(wanted), "<extract>", "exec"), namespace)
+        fn = _EXTRACTORS[wanted] = namespace["extract"]
+    return fn
+
+
+def decode_layers(layers, length=0, wanted=ALL_FIELDS):
+    """
+    Los mismos campos que decode_raw, sacados de las capas ya disecadas.
+    Recorre la lista de capas una sola vez; 'wanted' limita el trabajo a
+    los índices que usa el filtro (el resto queda con su valor por defecto).
+    """
+    return _extractor(wanted)(layers, length)
+
+
+# Las mismas direcciones y nombres se repiten en toda la captura: se
+# cachea su conversión (acotada para no crecer sin límite)
+_ADDRESS_CACHE = {}
+_LOWER_CACHE = {}
+_CACHE_MAX = 65536
+
+
+def _address(text):
+    value = _ADDRESS_CACHE.get(text)
+    if value is None:
+        if len(_ADDRESS_CACHE) >= _CACHE_MAX:
+            _ADDRESS_CACHE.clear()
+        value = _ADDRESS_CACHE[text] = addr_to_int(text)
+    return value
+
+
+def _lower(name):
+    value = _LOWER_CACHE.get(name)
+    if value is None:
+        if len(_LOWER_CACHE) >= _CACHE_MAX:
+            _LOWER_CACHE.clear()
+        value = _LOWER_CACHE[name] = str(name).lower()
+    return value
+
+
+# -------------------------------------------------------------------------
+# TABLA DE CAMPOS DEL LENGUAJE
+# -------------------------------------------------------------------------
+# nombre -> (índices, tipo, guarda). 'guarda' es código Python que debe
+# cumplirse para que el campo exista (p. ej. tcp.* solo en TCP).
+_TCP = "h[4] == 6"
+_UDP = "h[4] == 17"
+
+FIELDS = {
+    "frame.len":   ((LENGTH,), "int", None),
+    "eth.type":    ((ETHERTYPE,), "int", None),
+    "ip.src":      ((SRC,), "ipv4", "h[1] == 4"),
+    "ip.dst":      ((DST,), "ipv4", "h[1] == 4"),
+    "ip.addr":     ((SRC, DST), "ipv4", "h[1] == 4"),
+    "ip.proto":    ((PROTO,), "int", "h[1] == 4"),
+    "ipv6.src":    ((SRC,), "ipv6", "h[1] == 6"),
+    "ipv6.dst":    ((DST,), "ipv6", "h[1] == 6"),
+    "ipv6.addr":   ((SRC, DST), "ipv6", "h[1] == 6"),
+    "ipv6.nxt":    ((PROTO,), "int", "h[1] == 6"),
+    "tcp.srcport": ((SPORT,), "int", _TCP),
+    "tcp.dstport": ((DPORT,), "int", _TCP),
+    "tcp.port":    ((SPORT, DPORT), "int", _TCP),
+    "tcp.flags":   ((FLAGS,), "int", _TCP),
+    "udp.srcport": ((SPORT,), "int", _UDP),
+    "udp.dstport": ((DPORT,), "int", _UDP),
+    "udp.port":    ((SPORT, DPORT), "int", _UDP),
+}
+FIELDS["tcp.sport"] = FIELDS["tcp.srcport"]
+FIELDS["tcp.dport"] = FIELDS["tcp.dstport"]
+FIELDS["udp.sport"] = FIELDS["udp.srcport"]
+FIELDS["udp.dport"] = FIELDS["udp.dstport"]
+
+TCP_FLAGS = {
+    "fin": 0x001, "syn": 0x002, "reset": 0x004, "push": 0x008, "ack": 0x010,
+    "urg": 0x020, "ecn": 0x040, "cwr": 0x080, "ns": 0x100,
+}
+TCP_FLAGS["rst"] = TCP_FLAGS["reset"]
+TCP_FLAGS["psh"] = TCP_FLAGS["push"]
+TCP_FLAGS["ece"] = TCP_FLAGS["ecn"]
+
+# Protocolos que se pueden decidir en crudo: nombre -> (código crudo, capa)
+PROTOCOLS = {
+    "eth":  ("True", "ethernet"),
+    "ip":   ("(h[0] == 2048)", "ipv4"),
+    "ipv4": ("(h[0] == 2048)", "ipv4"),
+    "ipv6": ("(h[0] == 34525)", "ipv6"),
+    "arp":  ("(h[0] == 2054)", "arp"),
+    "icmp": ("(h[1] != 0 and h[4] == 1)", "icmp"),
+    "tcp":  ("(h[1] != 0 and h[4] == 6)", "tcp"),
+    "udp":  ("(h[1] != 0 and h[4] == 17)", "udp"),
+}
+IP_PROTOCOLS = {"icmp": 1, "tcp": 6, "udp": 17}
+
+# Coste estimado de cada tipo de comprobación (para ordenar && / ||)
+_COST = {"const": 0, "flag": 1, "cmp": 1, "addr": 2, "in": 2, "proto": 2, "prefixes": 3,
+         "layer": 5}
+
+
+# -------------------------------------------------------------------------
+# TOKENIZADOR Y PARSER
+# -------------------------------------------------------------------------
+_TOKEN = re.compile(r'\s*(?:(&&|\|\||==|!=|<=|>=|[<>!(){},])|"([^"]*)"|([^\s&|=!<>(){},"]+))')
+
+_OPS = {"==": "==", "eq": "==", "!=": "!=", "ne": "!=", "<": "<", "lt": "<",
+        "<=": "<=", "le": "<=", ">": ">", "gt": ">", ">=": ">=", "ge": ">="}
+_KEYWORDS = {"and": "&&", "or": "||", "not": "!"}
+_PUNCT = {"&&", "||", "!", "(", ")", "{", "}", ","}
+
+
+def tokenize(text):
+    tokens = []
+    pos = 0
+    text = text.rstrip()
+    while pos < len(text):
+        m = _TOKEN.match(text, pos)
+        if not m:
+            raise FilterError(f"Carácter inesperado en la posición {pos}: {text[pos]!r}")
+        op, string, word = m.groups()
+        if op:
+            tokens.append(op)
+        elif string is not None:
+            tokens.append(('"', string))
+        else:
+            tokens.append(_KEYWORDS.get(word.lower(), word))
+        pos = m.end()
+    return tokens
+
+
+class _Parser:
+    """
+    Descenso recursivo. Produce un AST de tuplas:
+        ("and", [nodos]) / ("or", [nodos]) / ("not", nodo)
+        ("cmp", campo, op, valor) / ("in", campo, [valores]) / ("field", campo)
+        ("prefixes", campo, lista)   <- "ip.addr in @lista" (ver core.cidr)
+    """
+
+    def __init__(self, text):
+        self.tokens = tokenize(text)
+        self.pos = 0
+
+    def peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def next(self):
+        tok = self.peek()
+        if tok is None:
+            raise FilterError("Expresión incompleta")
+        self.pos += 1
+        return tok
+
+    def expect(self, tok):
+        got = self.next()
+        if got != tok:
+            raise FilterError(f"Se esperaba {tok!r} y llegó {got!r}")
+
+    def parse(self):
+        if not self.tokens:
+            raise FilterError("Expresión vacía")
+        node = self.parse_or()
+        if self.peek() is not None:
+            raise FilterError(f"Sobra texto a partir de {self.peek()!r}")
+        return node
+
+    def parse_or(self):
+        nodes = [self.parse_and()]
+        while self.peek() == "||":
+            self.pos += 1
+            nodes.append(self.parse_and())
+        return nodes[0] if len(nodes) == 1 else ("or", nodes)
+
+    def parse_and(self):
+        nodes = [self.parse_not()]
+        while self.peek() == "&&":
+            self.pos += 1
+            nodes.append(self.parse_not())
+        return nodes[0] if len(nodes) == 1 else ("and", nodes)
+
+    def parse_not(self):
+        if self.peek() == "!":
+            self.pos += 1
+            return ("not", self.parse_not())
+        return self.parse_primary()
+
+    def parse_primary(self):
+        tok = self.next()
+        if tok == "(":
+            node = self.parse_or()
+            self.expect(")")
+            return node
+        if not isinstance(tok, str) or tok in _PUNCT:
+            raise FilterError(f"Se esperaba un campo y llegó {tok!r}")
+
+        field = tok.lower()
+        op = self.peek()
+        if isinstance(op, str) and op.lower() in _OPS:
+            self.pos += 1
+            return ("cmp", field, _OPS[op.lower()], self.value())
+        if isinstance(op, str) and op.lower() == "in":
+            self.pos += 1
+            ref = self.peek()
+            if isinstance(ref, str) and ref.startswith("@") and len(ref) > 1:
+                self.pos += 1
+                return ("prefixes", field, ref[1:].lower())
+            return ("in", field, self.value_set())
+        return ("field", field)
+
+    def value(self):
+        tok = self.next()
+        if isinstance(tok, tuple):
+            return tok[1]
+        if tok in _PUNCT:
+            raise FilterError(f"Se esperaba un valor y llegó {tok!r}")
+        return tok
+
+    def value_set(self):
+        self.expect("{")
+        values = []
+        while self.peek() != "}":
+            if self.peek() == ",":
+                self.pos += 1
+                continue
+            values.append(self.value())
+        self.expect("}")
+        if not values:
+            raise FilterError("Conjunto vacío en 'in'")
+        return values
+
+
+def parse(text):
+    """Texto -> AST (ver _Parser)."""
+    return _Parser(text).parse()
+
+
+# -------------------------------------------------------------------------
+# COMPILADOR
+# -------------------------------------------------------------------------
+# Tras resolver campos y valores, los átomos del AST son:
+#   ("atom", código, código_crudo o None, coste)
+# código_crudo None = solo se conoce tras disecar (protocolos de aplicación).
+# Todo el código generado va entre paréntesis (o es True/False), así que se
+# puede negar o combinar sin preocuparse de la precedencia.
+
+def _int(value, field):
+    try:
+        return int(value, 0)
+    except ValueError:
+        raise FilterError(f"Valor no numérico para {field}: {value!r}") from None
+
+
+def _network(value, kind, field):
+    try:
+        net = ipaddress.ip_network(value, strict=False)
+    except ValueError:
+        raise FilterError(f"Dirección no válida para {field}: {value!r}") from None
+    if (net.version == 4) != (kind == "ipv4"):
+        raise FilterError(f"{field} no admite direcciones IPv{net.version}")
+    return int(net.network_address), int(net.netmask), net.prefixlen == net.max_prefixlen
+
+
+class _Compiler:
+    def __init__(self):
+        self.consts = {}
+
+    def const(self, value):
+        name = f"_c{len(self.consts)}"
+        self.consts[name] = value
+        return name
+
+    # ------------------------------
+    #   Resolución de átomos
+    # ------------------------------
+    def resolve(self, node):
+        kind = node[0]
+        if kind in ("and", "or"):
+            return (kind, [self.resolve(n) for n in node[1]])
+        if kind == "not":
+            return ("not", self.resolve(node[1]))
+        if kind == "field":
+            return self.bare(node[1])
+        if kind == "in":
+            return self.membership(node[1], node[2])
+        if kind == "prefixes":
+            return self.prefixes(node[1], node[2])
+        return self.compare(node[1], node[2], node[3])
+
+    @staticmethod
+    def atom(code, raw, cost):
+        return ("atom", code, raw, cost)
+
+    def bare(self, name):
+        """Campo o protocolo sin comparación: 'tcp', 'dns', 'tcp.flags.syn'..."""
+        if name in PROTOCOLS:
+            raw, layer = PROTOCOLS[name]
+            code = f"({layer!r} in h[8])"
+            if raw == "True":
+                # Siempre presente en una trama Ethernet decodificable
+                return self.atom(code, "True", _COST["const"])
+            return self.atom(code, raw, _COST["proto"])
+        if name.startswith("tcp.flags."):
+            bit = TCP_FLAGS.get(name[len("tcp.flags."):])
+            if bit is None:
+                raise FilterError(f"Flag TCP desconocido: {name}")
+            code = f"({_TCP} and h[7] is not None and h[7] & {bit} != 0)"
+            return self.atom(code, code, _COST["flag"])
+        if name in FIELDS:
+            idx, _, guard = FIELDS[name]
+            code = " and ".join(filter(None, [guard, f"h[{idx[0]}] is not None"]))
+            return self.atom(f"({code})", f"({code})", _COST["cmp"])
+        if "." in name or not name.isidentifier():
+            raise FilterError(f"Campo desconocido: {name}")
+        # Protocolo de aplicación (dns, http...): solo tras disecar
+        return self.atom(f"({name!r} in h[8])", None, _COST["layer"])
+
+    def compare(self, name, op, value):
+        if name.startswith("tcp.flags."):
+            # tcp.flags.syn == 1 / == 0
+            node = self.bare(name)
+            flag = _int(value, name)
+            if op not in ("==", "!=") or flag not in (0, 1):
+                raise FilterError(f"{name} solo admite == 0/1 o != 0/1")
+            return node if (op == "==") == (flag == 1) else ("not", node)
+        if name not in FIELDS:
+            raise FilterError(f"Campo desconocido: {name}")
+
+        idx, kind, guard = FIELDS[name]
+        if kind == "int":
+            number = _int(value, name)
+            tests = [f"h[{i}] {op} {number}" for i in idx]
+            cost = _COST["cmp"]
+        else:
+            if op not in ("==", "!="):
+                raise FilterError(f"{name} solo admite == y !=")
+            net, mask, host = _network(value, kind, name)
+            # Dirección exacta: comparación directa, sin máscara
+            tests = [f"h[{i}] == {net}" if host else f"h[{i}] & {mask} == {net}" for i in idx]
+            cost = _COST["addr"]
+            if op == "!=":
+                # != equivale a !(==): "ip.addr != X" descarta si cualquiera es X
+                return ("not", self.compare(name, "==", value))
+
+        return self._field_atom(idx, guard, tests, cost)
+
+    def membership(self, name, values):
+        if name not in FIELDS:
+            raise FilterError(f"Campo desconocido: {name}")
+        idx, kind, guard = FIELDS[name]
+
+        if kind != "int":
+            return ("or", [self.compare(name, "==", v) for v in values])
+
+        numbers = set()
+        ranges = []
+        for value in values:
+            if ".." in value:
+                lo, hi = value.split("..", 1)
+                ranges.append((_int(lo, name), _int(hi, name)))
+            else:
+                numbers.add(_int(value, name))
+
+        tests = []
+        for i in idx:
+            parts = []
+            # Plegado de constantes: un solo valor es un ==, varios un frozenset
+            if len(numbers) == 1:
+                parts.append(f"h[{i}] == {next(iter(numbers))}")
+            elif numbers:
+                parts.append(f"h[{i}] in {self.const(frozenset(numbers))}")
+            parts.extend(f"{lo} <= h[{i}] <= {hi}" for lo, hi in ranges)
+            tests.append(" or ".join(parts))
+        return self._field_atom(idx, guard, tests, _COST["in"])
+
+    def prefixes(self, name, set_name):
+        """ip.addr in @lista: prefijo más largo en una core.cidr.PrefixTable."""
+        if name not in FIELDS or FIELDS[name][1] == "int":
+            raise FilterError(f"{name} no admite listas de prefijos")
+        try:
+            table = get_prefix_set(set_name)
+        except KeyError:
+            raise FilterError(f"Lista de prefijos desconocida: @{set_name}") from None
+        idx, kind, guard = FIELDS[name]
+        match = self.const(table.matcher(AF_INET if kind == "ipv4" else AF_INET6))
+        tests = [f"{match}(h[{i}])" for i in idx]
+        return self._field_atom(idx, guard, tests, _COST["prefixes"])
+
+    @staticmethod
+    def _field_atom(idx, guard, tests, cost):
+        test = tests[0] if len(tests) == 1 else " or ".join(f"({t})" for t in tests)
+        checks = [guard] if guard else []
+        if idx[0] in (SPORT, DPORT, FLAGS):
+            # Pueden faltar (TCP/UDP truncado al disecar)
+            checks.append(f"h[{idx[0]}] is not None")
+        checks.append(f"({test})" if len(tests) > 1 or " or " in test else test)
+        code = "(" + " and ".join(checks) + ")"
+        return ("atom", code, code, cost)
+
+    # ------------------------------
+    #   Optimización del AST
+    # ------------------------------
+    def optimize(self, node):
+        kind = node[0]
+        if kind == "atom":
+            return node
+        if kind == "not":
+            inner = self.optimize(node[1])
+            if inner[0] == "not":
+                return inner[1]            # !!x -> x
+            return ("not", inner)
+
+        # Aplanar (a && (b && c)) -> (a && b && c) y quitar duplicados
+        flat = []
+        for child in map(self.optimize, node[1]):
+            for c in (child[1] if child[0] == kind else [child]):
+                if c not in flat:
+                    flat.append(c)
+        # Ordenar por coste: las comprobaciones baratas primero (la
+        # evaluación en cortocircuito evita las caras casi siempre)
+        flat.sort(key=self.cost)
+        return flat[0] if len(flat) == 1 else (kind, flat)
+
+    def cost(self, node):
+        if node[0] == "atom":
+            return node[3]
+        if node[0] == "not":
+            return self.cost(node[1])
+        return sum(self.cost(n) for n in node[1])
+
+    # ------------------------------
+    #   Generación de código
+    # ------------------------------
+    def code(self, node):
+        """Código de la expresión sobre los campos disecados (booleana)."""
+        kind = node[0]
+        if kind == "atom":
+            return node[1]
+        if kind == "not":
+            return _not(self.code(node[1]))
+        return _join(kind, [self.code(n) for n in node[1]])
+
+    def bounds(self, node):
+        """
+        Para los bytes crudos, donde algunos átomos son desconocidos:
+        (inferior, superior) con inferior => la expresión es cierta y
+        !superior => la expresión es falsa. Los desconocidos valen
+        (False, True) y las constantes se pliegan.
+        """
+        kind = node[0]
+        if kind == "atom":
+            raw = node[2]
+            return ("False", "True") if raw is None else (raw, raw)
+        if kind == "not":
+            lower, upper = self.bounds(node[1])
+            return _not(upper), _not(lower)
+        pairs = [self.bounds(n) for n in node[1]]
+        return (_join(kind, [p[0] for p in pairs]), _join(kind, [p[1] for p in pairs]))
+
+
+def _not(code):
+    if code in ("True", "False"):
+        return "False" if code == "True" else "True"
+    return f"(not {code})"
+
+
+def _join(kind, parts):
+    absorbing, neutral = ("False", "True") if kind == "and" else ("True", "False")
+    if absorbing in parts:
+        return absorbing
+    parts = [p for p in parts if p != neutral]
+    if not parts:
+        return neutral
+    if len(parts) == 1:
+        return parts[0]
+    return "(" + f" {kind} ".join(parts) + ")"
+
+
+class DisplayFilter:
+    """
+    Expresión de filtro compilada.
+
+    El texto se parsea una vez; el AST se optimiza (aplanado, duplicados,
+    doble negación, conjuntos -> frozenset, orden por coste) y se genera el
+    código Python de dos funciones que se compilan con compile():
+
+    - fields(h): evalúa sobre la tupla de decode_layers (paquete disecado)
+    - raw(h):    sobre la tupla de decode_raw; devuelve True/False o None si
+                 hace falta disecar (campos de aplicación)
+
+    Así cada paquete se evalúa con una sola llamada, sin recorrer el AST
+    ni la lista de capas más de una vez.
+    """
+
+    def __init__(self, text=None, ast=None):
+        if ast is None:
+            ast = parse(text)
+        self.text = text
+        compiler = _Compiler()
+        self.ast = compiler.optimize(compiler.resolve(ast))
+
+        code = compiler.code(self.ast)
+        lower, upper = compiler.bounds(self.ast)
+        # Campos que usa el código: decode_layers solo calcula esos
+        self.wanted = frozenset(int(i) for i in re.findall(r"h\[(\d+)\]", code))
+        self.needs_dissection = lower != upper
+
+        if not self.needs_dissection:
+            raw = f"    return {lower}\n"
+        else:
+            raw = ""
+            if upper != "True":
+                raw += f"    if not {upper}:\n        return False\n"
+            if lower != "False":
+                raw += f"    if {lower}:\n        return True\n"
+            raw += "    return None\n"
+        self.source = f"def fields(h):\n    return {code}\n\ndef raw(h):\n{raw}"
+
+        namespace = dict(compiler.consts)
+        exec(compile(self.source, f"<filtro {text or ''}>", "exec"), namespace)
+        self._fields = namespace["fields"]
+        self._raw = namespace["raw"]
+
+    def match_raw(self, raw, linktype=LINKTYPE_ETHERNET):
+        """True / False sobre la trama cruda, o None si hay que disecar."""
+        if linktype != LINKTYPE_ETHERNET:
+            return None
+        h = decode_raw(raw)
+        if h is None:
+            return None
+        return self._raw(h)
+
+    def match_fields(self, h):
+        """Evalúa sobre una tupla de decode_layers."""
+        return self._fields(h)
+
+    def __repr__(self):
+        return f"DisplayFilter({self.text!r})"
+
+
+def compile_filter(text):
+    """Atajo: DisplayFilter(text)."""
+    return DisplayFilter(text)
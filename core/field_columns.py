@@ -0,0 +1,161 @@
+# core/field_columns.py
+# Columnas definidas por expresiones ("ip.src", "tcp.dport", "dns.qname"...) compiladas una vez
+import re
+
+from core.display_filter import (FIELDS, LINKTYPE_ETHERNET, FilterError, _lower, decode_layers,
+                                 decode_raw)
+from core.packet import AF_INET, AF_INET6, int_to_addr
+
+# Columnas del propio registro (frame.protocols es la única que diseca)
+FRAME_COLUMNS = {
+    "frame.number":     "number",
+    "frame.time_epoch": "p.timestamp",
+    "frame.ts_ns":      "p.ts_ns",
+    "frame.len":        "p.length",
+    "frame.cap_len":    "len(p.raw)",
+    "frame.linktype":   "p.linktype",
+    "col.src":          "p.src_str",
+    "col.dst":          "p.dst_str",
+    "col.proto":        "p.proto",
+    "col.info":         "p.summary",
+    "frame.protocols":  "':'.join(_lower(l.get('layer')) for l in p.layers)",
+}
+
+# Nombres estilo Wireshark -> (capa, campo[, clave]) de los parsers, ya
+# normalizados; la clave se busca dentro de un campo dict (cabeceras HTTP...)
+ALIASES = {
+    "dns.qname":           ("dns", "query_name"),
+    "dns.qry.name":        ("dns", "query_name"),
+    "dns.qry.type":        ("dns", "query_type"),
+    "dns.id":              ("dns", "transaction_id"),
+    "http.request.method": ("http", "method"),
+    "http.request.uri":    ("http", "path"),
+    "http.response.code":  ("http", "status_code"),
+    "http.host":           ("http", "headers", "host"),
+    "http.user_agent":     ("http", "headers", "user_agent"),
+    "dhcp.type":           ("dhcp", "options", "dhcp_message_type"),
+    "dhcp.hostname":       ("dhcp", "options", "hostname"),
+    "arp.src.proto_ipv4":  ("arp", "sender_ip"),
+    "arp.dst.proto_ipv4":  ("arp", "target_ip"),
+    "ip.ttl":              ("ipv4", "ttl"),
+}
+
+# Prefijos de campo -> nombre de capa de los parsers (en minúsculas)
+LAYER_ALIASES = {"eth": "ethernet", "ip": "ipv4"}
+
+_NAME = re.compile(r"^[a-z][a-z0-9_]*(\.[a-z0-9_]+)+$")
+_NORM_CACHE = {}
+
+
+def normalize(name):
+    """'Query Name' -> 'query_name' (cacheado: los nombres se repiten)."""
+    value = _NORM_CACHE.get(name)
+    if value is None:
+        value = _NORM_CACHE[name] = re.sub(r"[^a-z0-9]+", "_", str(name).lower()).strip("_")
+    return value
+
+
+def _lookup(fields, name):
+    for key, value in fields.items():
+        if normalize(key) == name:
+            return value
+    return None
+
+
+def layer_field(layers, layer, field, key=None):
+    """
+    Primer valor del campo 'field' en una capa llamada 'layer' (nombres
+    normalizados). Con 'key', el campo es un dict y se devuelve esa clave.
+    """
+    for entry in layers:
+        if _lower(entry.get("layer")) == layer:
+            value = _lookup(entry.get("fields") or {}, field)
+            if key is not None:
+                value = _lookup(value, key) if isinstance(value, dict) else None
+            if value is not None:
+                return value
+    return None
+
+
+def _ipv4(value):
+    return int_to_addr(AF_INET, value)
+
+
+def _ipv6(value):
+    return int_to_addr(AF_INET6, value)
+
+
+def _hex16(value):
+    return None if value is None else f"0x{value:04x}"
+
+
+def _pair(a, b):
+    """Campos de dos valores (ip.addr, tcp.port): "origen,destino"."""
+    return None if a is None else f"{a},{b}"
+
+
+_FORMATS = {"ipv4": "_ipv4({})", "ipv6": "_ipv6({})", "int": "{}"}
+
+
+class FieldColumns:
+    """
+    Lista de expresiones de columna compilada a una sola función
+    row(number, packet) -> tupla de valores (None si el campo no existe
+    en ese paquete).
+
+    - frame.* / col.*: atributos del Packet (FRAME_COLUMNS)
+    - campos de cabecera de core.display_filter.FIELDS (ip.src, tcp.dport,
+      ipv6.addr...): se leen de la trama sin disecar con decode_raw, o de
+      las capas si la trama no es concluyente
+    - cualquier otro "capa.campo" (o un alias de ALIASES, como dns.qname)
+      se busca en las capas disecadas; solo entonces se diseca el paquete
+    """
+
+    def __init__(self, expressions):
+        self.expressions = tuple(expressions)
+        consts = {"decode_raw": decode_raw, "decode_layers": decode_layers,
+                  "layer_field": layer_field, "_lower": _lower, "_ipv4": _ipv4, "_ipv6": _ipv6,
+                  "_hex16": _hex16, "_pair": _pair,
+                  "LINKTYPE_ETHERNET": LINKTYPE_ETHERNET}
+        values = []
+        wanted = set()
+        self.needs_layers = False
+
+        for expr in self.expressions:
+            name = expr.strip().lower()
+            if name in FRAME_COLUMNS:
+                values.append(FRAME_COLUMNS[name])
+                self.needs_layers |= "p.layers" in FRAME_COLUMNS[name]
+            elif name in FIELDS:
+                indexes, kind, guard = FIELDS[name]
+                wanted.update(indexes)
+                fmt = _FORMATS[kind]
+                if name == "tcp.flags":
+                    fmt = "_hex16({})"
+                parts = [fmt.format(f"h[{i}]") for i in indexes]
+                code = parts[0] if len(parts) == 1 else "_pair(" + ", ".join(parts) + ")"
+                values.append(f"({code} if {guard} else None)" if guard else code)
+            else:
+                if name in ALIASES:
+                    path = ALIASES[name]
+                elif _NAME.match(name):
+                    layer, field = name.split(".", 1)
+                    path = (LAYER_ALIASES.get(layer, layer), normalize(field))
+                else:
+                    raise FilterError(f"Columna no válida: {expr!r}")
+                self.needs_layers = True
+                values.append(f"layer_field(p.layers, {', '.join(map(repr, path))})")
+
+        lines = ["def row(number, p):"]
+        if wanted:
+            consts["WANTED"] = frozenset(wanted)
+            lines += ["    h = decode_raw(p.raw) if p.linktype == LINKTYPE_ETHERNET else None",
+                      "    if h is None:",
+                      "        h = decode_layers(p.layers, p.length, WANTED)"]
+        lines.append("    return (" + "".join(v + ", " for v in values) + ")")
+        self.source = "\n".join(lines) + "\n"
+        exec(compile(self.source, "<columnas>", "exec"), consts)
+        self.row = consts["row"]
+
+    def __repr__(self):
+        return f"FieldColumns({list(self.expressions)!r})"
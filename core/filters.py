@@ -1,14 +1,80 @@
 # core/filters.py
+import ipaddress
+
+from core.display_filter import (IP_PROTOCOLS, LINKTYPE_ETHERNET, TCP_FLAGS, DisplayFilter,
+                                 decode_layers, parse)
+
+
+# Nombres de capa del filtro antiguo -> protocolo del lenguaje de filtros
+_LEGACY_PROTOCOLS = {"ethernet": "eth"}
+
+
+def _ip_field(direction, value):
+    """'src'/'dst'/'addr' + dirección -> campo ip.* o ipv6.* según la familia."""
+    version = ipaddress.ip_network(str(value), strict=False).version
+    return f"{'ip' if version == 4 else 'ipv6'}.{direction}"
+
+
+def _flag_names(value):
+    """Flags TCP como entero (máscara) o nombres ("SYN", "SYN,ACK")."""
+    if isinstance(value, int):
+        bits = {bit: name for name, bit in reversed(list(TCP_FLAGS.items()))}
+        return [bits[b] for b in sorted(bits) if value & b]
+    return [name.strip().lower() for name in str(value).replace("|", ",").split(",")]
+
 
 class PacketFilter:
     """
     Sistema básico de filtros para paquetes.
     Los filtros pueden usarse para ignorar tráfico innecesario.
+
+    Se puede construir con una expresión estilo Wireshark (ver
+    core.display_filter) y/o con criterios por campo; todo debe cumplirse:
+        src_ip / dst_ip / ip   -> dirección o red CIDR ("10.0.0.0/8")
+        src_port / dst_port / port
+        proto                  -> nombre de capa ("tcp", "arp", "dns"...)
+        ethertype              -> entero (0x0800)
+        tcp_flags              -> flags que deben estar activos ("SYN")
+
+    Los criterios sobre campos a offset fijo se compilan en comprobaciones
+    sobre los bytes crudos (match_raw), que se ejecutan ANTES de parse_packet:
+    las tramas rechazadas nunca llegan a disecarse. Lo que necesita capas
+    (protocolos de aplicación, funciones de add_filter) se evalúa después.
     """
 
-    def __init__(self):
+    def __init__(self, expression=None, src_ip=None, dst_ip=None, ip=None, src_port=None,
+                 dst_port=None, port=None, proto=None, ethertype=None, tcp_flags=None):
         self.filters = []
+        self.expression = expression
 
+        terms = [parse(expression)] if expression else []
+        for value, direction in ((src_ip, "src"), (dst_ip, "dst"), (ip, "addr")):
+            if value is not None:
+                terms.append(("cmp", _ip_field(direction, value), "==", str(value)))
+        for value, field in ((src_port, "srcport"), (dst_port, "dstport"), (port, "port")):
+            if value is not None:
+                terms.append(("or", [("cmp", f"tcp.{field}", "==", str(value)),
+                                     ("cmp", f"udp.{field}", "==", str(value))]))
+        if isinstance(proto, int):
+            name = {n: p for p, n in IP_PROTOCOLS.items()}.get(proto)
+            terms.append(("field", name) if name else
+                         ("or", [("cmp", "ip.proto", "==", str(proto)),
+                                 ("cmp", "ipv6.nxt", "==", str(proto))]))
+        elif proto is not None:
+            name = str(proto).lower()
+            terms.append(("field", _LEGACY_PROTOCOLS.get(name, name)))
+        if ethertype is not None:
+            terms.append(("cmp", "eth.type", "==", str(ethertype)))
+        if tcp_flags is not None:
+            terms.extend(("field", f"tcp.flags.{name}") for name in _flag_names(tcp_flags))
+
+        # AST combinado (lo usa core.inverted_index para resolver con índices)
+        self.ast = ("and", terms) if terms else None
+        self.compiled = DisplayFilter(expression, self.ast) if terms else None
+
+    # ------------------------------
+    #   API
+    # ------------------------------
     def add_filter(self, func):
         """
         Agrega una función de filtro.
@@ -18,12 +84,57 @@ class PacketFilter:
         if callable(func):
             self.filters.append(func)
 
-    def apply(self, packet_dict):
+    @property
+    def needs_dissection(self):
+        """True si algún criterio solo puede evaluarse sobre las capas."""
+        return bool(self.filters) or bool(self.compiled and self.compiled.needs_dissection)
+
+    def match_raw(self, raw, linktype=LINKTYPE_ETHERNET):
         """
-        Ejecuta todos los filtros. 
-        Si alguno devuelve False, el paquete es descartado.
+        Evalúa los criterios sobre la trama cruda, sin disecarla.
+        Devuelve False (descartar), True (pasa) o None (hay que disecar
+        y decidir con match_layers()).
         """
+        if self.compiled is None:
+            return None if self.filters else True
+        verdict = self.compiled.match_raw(raw, linktype)
+        if verdict and self.filters:
+            return None
+        return verdict
+
+    def match_layers(self, packet):
+        """Evalúa todos los criterios y funciones sobre el paquete ya disecado."""
+        if self.compiled is not None:
+            wanted = self.compiled.wanted
+            if isinstance(packet, dict):
+                h = decode_layers(packet.get("layers", []), len(packet.get("raw") or b""), wanted)
+            else:
+                h = decode_layers(packet.layers, packet.length, wanted)
+            if not self.compiled.match_fields(h):
+                return False
         for f in self.filters:
-            if not f(packet_dict):
+            if not f(packet):
                 return False
         return True
+
+    def match(self, packet):
+        """
+        True si el paquete (dict parseado o core.packet.Packet) pasa el filtro.
+        Si el paquete conserva sus bytes crudos se evalúa primero sobre ellos.
+        """
+        if isinstance(packet, dict):
+            raw, linktype = packet.get("raw"), LINKTYPE_ETHERNET
+        else:
+            raw, linktype = packet.raw, packet.linktype
+        if raw:
+            verdict = self.match_raw(raw, linktype)
+            if verdict is not None:
+                return verdict
+        return self.match_layers(packet)
+
+    def apply(self, packet_dict):
+        """
+        Ejecuta todos los filtros.
+        Si alguno devuelve False, el paquete es descartado.
+        """
+        return self.match(packet_dict)
@@ -0,0 +1,480 @@
+# core/inverted_index.py
+# Índices invertidos (campo -> ids de paquete) para volver a filtrar sin recorrer la captura
+import ipaddress
+from array import array
+from bisect import bisect_left
+
+from core.cidr import get_prefix_set
+from core.display_filter import (AF, DPORT, DST, ETHERTYPE, FIELDS, PROTO, SPORT, SRC,
+                                 LINKTYPE_ETHERNET, decode_raw)
+from core.dispatcher import REGISTRY
+
+# Tablas de postings: clave -> array('I') con los ids (crecientes) que la tienen
+#   "src" / "dst":  (af, dirección entera)
+#   "sport" / "dport": (proto IP, puerto)
+#   "ipproto": (af, protocolo IP)
+#   "ethertype": ethertype
+#   "flow": (af, proto, extremo menor, extremo mayor), bidireccional
+TABLES = ("src", "dst", "sport", "dport", "ipproto", "ethertype", "flow")
+
+# Protocolos "desnudos" del lenguaje de filtros -> postings que los cubren
+_PROTOCOL_KEYS = {
+    "ip":   [("ethertype", 0x0800)],
+    "ipv4": [("ethertype", 0x0800)],
+    "ipv6": [("ethertype", 0x86DD)],
+    "arp":  [("ethertype", 0x0806)],
+    "icmp": [("ipproto", (4, 1)), ("ipproto", (6, 1))],
+    "tcp":  [("ipproto", (4, 6)), ("ipproto", (6, 6))],
+    "udp":  [("ipproto", (4, 17)), ("ipproto", (6, 17))],
+}
+_OPS = {"==": int.__eq__, "!=": int.__ne__, "<": int.__lt__, "<=": int.__le__,
+        ">": int.__gt__, ">=": int.__ge__}
+
+# Una clave con más de count/DENSE ids guarda además su bitmap (a partir de
+# ahí el bitmap ocupa menos que el array de ids y evita reconstruirlo)
+DENSE = 32
+
+
+# Con muchos ids la conversión se hace con NumPy si está instalado
+_NUMPY_MIN = 4096
+
+# Memoria de las postings por paquete indexado, medida con
+# benchmarks.common.make_frames (tracemalloc): ~680 bytes con 100000
+# paquetes, ~780 con ventanas más pequeñas (más claves distintas por paquete)
+POSTINGS_OVERHEAD = 800
+
+# trim(): los ids recortados se resumen en tramos de al menos SUMMARY_CHUNK
+# paquetes, cada uno con un filtro de Bloom de SUMMARY_BITS bits (4 KB)
+# con las claves que aparecían en él
+SUMMARY_CHUNK = 16384
+SUMMARY_BITS = 1 << 15
+_SUMMARY_HASHES = 3
+
+
+def _numpy():
+    try:
+        import numpy as np
+    except ImportError:
+        return None
+    return np
+
+
+def ids_to_bitmap(ids):
+    """Ids (ordenados o no) -> bitmap como entero de Python (bit i = paquete i)."""
+    if not len(ids):
+        return 0
+    np = _numpy() if len(ids) >= _NUMPY_MIN else None
+    if np is not None:
+        values = np.asarray(ids, dtype=np.int64)
+        bits = np.zeros(int(values.max()) + 1, dtype=bool)
+        bits[values] = True
+        return int.from_bytes(np.packbits(bits, bitorder="little").tobytes(), "little")
+    buf = bytearray((max(ids) >> 3) + 1)
+    for i in ids:
+        buf[i >> 3] |= 1 << (i & 7)
+    return int.from_bytes(buf, "little")
+
+
+# Posiciones de los bits activos de cada valor de byte
+_BITS = tuple(tuple(i for i in range(8) if b >> i & 1) for b in range(256))
+
+
+def bitmap_to_ids(bitmap):
+    """Bitmap -> array('I') con los ids de los bits activos, en orden."""
+    out = array("I")
+    if not bitmap:
+        return out
+    data = bitmap.to_bytes((bitmap.bit_length() + 7) >> 3, "little")
+    np = _numpy() if len(data) >= _NUMPY_MIN else None
+    if np is not None:
+        bits = np.unpackbits(np.frombuffer(data, dtype=np.uint8), bitorder="little")
+        out.frombytes(np.flatnonzero(bits).astype(np.uint32).tobytes())
+        return out
+    table = _BITS
+    for pos, byte in enumerate(data):
+        if byte:
+            base = pos << 3
+            out.extend([base + i for i in table[byte]])
+    return out
+
+
+def _bloom_bits(pair):
+    h = hash(pair)
+    return [(h >> (17 * i)) % SUMMARY_BITS for i in range(_SUMMARY_HASHES)]
+
+
+class _Summary:
+    """Resumen de un tramo de ids recortados del índice."""
+    __slots__ = ("first", "end", "bloom", "unindexed")
+
+    def __init__(self, first, end):
+        self.first = first
+        self.end = end
+        self.bloom = bytearray(SUMMARY_BITS >> 3)
+        self.unindexed = False      # hay paquetes sin indexar: siempre residual
+
+    def add(self, pair):
+        bloom = self.bloom
+        for bit in _bloom_bits(pair):
+            bloom[bit >> 3] |= 1 << (bit & 7)
+
+    def may_contain(self, pair):
+        bloom = self.bloom
+        return all(bloom[bit >> 3] >> (bit & 7) & 1 for bit in _bloom_bits(pair))
+
+    def mask(self):
+        return ((1 << (self.end - self.first)) - 1) << self.first
+
+
+def _post(table, key, pid):
+    try:
+        table[key].append(pid)
+    except KeyError:
+        table[key] = array("I", (pid,))
+
+
+class InvertedIndex:
+    """
+    Índices invertidos incrementales sobre los paquetes capturados.
+
+    add(packet) asigna ids consecutivos (0, 1, 2...) y añade el id a las
+    postings de sus campos de cabecera (IP, puertos, protocolo, flujo),
+    leídos de los bytes crudos con decode_raw: no se disecan capas.
+
+    query(filtro) resuelve una expresión de filtro combinando bitmaps
+    (& | ~ sobre enteros de Python, en C) y solo evalúa paquete a paquete los
+    predicados residuales (protocolos de aplicación, flags, longitudes,
+    funciones de add_filter) y los paquetes que no se pudieron indexar.
+
+    Las postings cuestan unos POSTINGS_OVERHEAD bytes por paquete (una
+    clave de dict y un array por valor distinto de cada tabla), así que
+    en una captura larga trim(first_id) saca del índice los ids antiguos
+    (los que core.retention ya ha volcado a disco) y de ellos solo guarda
+    un resumen por tramo: un filtro de Bloom con sus claves, 4 KB por
+    cada SUMMARY_CHUNK paquetes (0,25 bytes por paquete). Al consultar,
+    los tramos que pueden tener la clave buscada se evalúan paquete a
+    paquete y los demás se descartan sin leerlos.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.tables = {name: {} for name in TABLES}
+        # Paquetes que no se pudieron decodificar en crudo (truncados,
+        # sin bytes, otro linktype): siempre van a la evaluación residual
+        self.unindexed = array("I")
+        self._bitmaps = {}          # (tabla, clave) -> (nº de ids, bitmap)
+        self.first = 0              # ids menores: fuera de las postings (ver trim)
+        self.summaries = []         # _Summary de los tramos recortados, en orden
+
+    # ------------------------------
+    #   Construcción
+    # ------------------------------
+    def add(self, packet):
+        """Indexa un core.packet.Packet (o dict con 'raw'). Devuelve su id."""
+        pid = self.count
+        self.count += 1
+
+        if isinstance(packet, dict):
+            raw, linktype = packet.get("raw"), LINKTYPE_ETHERNET
+        else:
+            raw, linktype = packet.raw, packet.linktype
+        h = decode_raw(raw) if raw and linktype == LINKTYPE_ETHERNET else None
+        if h is None:
+            self.unindexed.append(pid)
+            return pid
+
+        tables = self.tables
+        _post(tables["ethertype"], h[ETHERTYPE], pid)
+        af = h[AF]
+        if af:
+            proto = h[PROTO]
+            _post(tables["src"], (af, h[SRC]), pid)
+            _post(tables["dst"], (af, h[DST]), pid)
+            _post(tables["ipproto"], (af, proto), pid)
+            sport = h[SPORT]
+            if sport is not None:
+                _post(tables["sport"], (proto, sport), pid)
+                _post(tables["dport"], (proto, h[DPORT]), pid)
+            a, b = (h[SRC], sport or 0), (h[DST], h[DPORT] or 0)
+            _post(tables["flow"], (af, proto) + ((a, b) if a <= b else (b, a)), pid)
+        return pid
+
+    def __len__(self):
+        return self.count
+
+    def trim(self, first_id):
+        """
+        Saca de las postings los ids < first_id, resumiéndolos por tramos.
+        No hace nada hasta que haya al menos SUMMARY_CHUNK ids que recortar.
+        """
+        first_id = min(first_id, self.count)
+        if first_id - self.first < SUMMARY_CHUNK:
+            return
+        summary = _Summary(self.first, first_id)
+        for name, table in self.tables.items():
+            # Dict nuevo: uno del que se borran claves no devuelve su memoria
+            kept = {}
+            for key, ids in table.items():
+                if ids[0] < first_id:
+                    summary.add((name, key))
+                    cut = bisect_left(ids, first_id)
+                    if cut == len(ids):
+                        continue
+                    ids = ids[cut:]
+                kept[key] = ids
+            self.tables[name] = kept
+        cut = bisect_left(self.unindexed, first_id)
+        if cut:
+            summary.unindexed = True
+            self.unindexed = self.unindexed[cut:]
+        self.summaries.append(summary)
+        self.first = first_id
+        self._bitmaps.clear()
+
+    # ------------------------------
+    #   Flujos
+    # ------------------------------
+    def flow_of(self, packet):
+        """Clave de flujo (bidireccional) de un paquete, o None si no es IP."""
+        raw = packet.get("raw") if isinstance(packet, dict) else packet.raw
+        h = decode_raw(raw) if raw else None
+        if h is None or not h[AF]:
+            return None
+        a, b = (h[SRC], h[SPORT] or 0), (h[DST], h[DPORT] or 0)
+        return (h[AF], h[PROTO]) + ((a, b) if a <= b else (b, a))
+
+    def flow_ids(self, key):
+        """Ids de los paquetes de un flujo (array('I'), en orden)."""
+        return array("I", self.tables["flow"].get(key, ()))
+
+    # ------------------------------
+    #   Bitmaps
+    # ------------------------------
+    def universe(self):
+        """Bitmap con todos los ids."""
+        return (1 << self.count) - 1
+
+    def indexed(self):
+        """Bitmap de los paquetes que sí están en las postings (ya recortados aparte)."""
+        return self.universe() & ~((1 << self.first) - 1) & \
+            ~self._dense("unindexed", None, self.unindexed)
+
+    def trimmed(self, pairs=None):
+        """
+        Bitmap de los ids recortados que pueden tener alguna de las claves
+        (tabla, clave) de 'pairs' según los resúmenes; todos si es None.
+        """
+        if pairs is None:
+            return (1 << self.first) - 1
+        bitmap = 0
+        for summary in self.summaries:
+            if summary.unindexed or any(summary.may_contain(pair) for pair in pairs):
+                bitmap |= summary.mask()
+        return bitmap
+
+    def _dense(self, table, key, ids):
+        """Bitmap cacheado de una clave; si creció solo se añaden los ids nuevos."""
+        n, bitmap = self._bitmaps.get((table, key), (0, 0))
+        if n != len(ids):
+            bitmap |= ids_to_bitmap(ids[n:])
+            self._bitmaps[(table, key)] = (len(ids), bitmap)
+        return bitmap
+
+    def lookup(self, pairs):
+        """Bitmap con la unión de las postings de los pares (tabla, clave)."""
+        dense = 0
+        sparse = array("I")
+        threshold = self.count // DENSE
+        for table, key in pairs:
+            ids = self.tables[table].get(key)
+            if ids is None:
+                continue
+            if len(ids) > threshold:
+                dense |= self._dense(table, key, ids)
+            else:
+                sparse.extend(ids)
+        # Las claves pequeñas se juntan y se convierten en un solo bitmap
+        return dense | ids_to_bitmap(sparse)
+
+    def _keys(self, tables, predicate):
+        return [(t, k) for t in tables for k in self.tables[t] if predicate(k)]
+
+    # ------------------------------
+    #   Consultas
+    # ------------------------------
+    def query(self, packet_filter, packets):
+        """
+        Ids (array('I'), en orden) de los paquetes que pasan el filtro.
+        packet_filter: core.filters.PacketFilter; packets: secuencia indexable
+        por id con los mismos paquetes que se añadieron (para los residuos).
+        """
+        if packet_filter.ast is None:
+            lower = upper = self.universe()
+        else:
+            lower, upper = self._bounds(packet_filter.ast)
+        if packet_filter.filters:
+            lower = 0   # las funciones de add_filter siempre se evalúan
+
+        result = lower
+        residual = upper & ~lower
+        if residual:
+            match = packet_filter.match
+            extra = [i for i in bitmap_to_ids(residual) if match(packets[i])]
+            result |= ids_to_bitmap(extra)
+        return bitmap_to_ids(result)
+
+    def _bounds(self, node):
+        """
+        (inferior, superior) como bitmaps: los ids de 'inferior' cumplen
+        seguro la expresión y los que no están en 'superior' seguro que no.
+        Lo que queda entre ambos se evalúa paquete a paquete.
+        """
+        kind = node[0]
+        if kind in ("and", "or"):
+            bounds = [self._bounds(n) for n in node[1]]
+            lower, upper = bounds[0]
+            for lo, up in bounds[1:]:
+                if kind == "and":
+                    lower &= lo
+                    upper &= up
+                else:
+                    lower |= lo
+                    upper |= up
+            return lower, upper
+        if kind == "not":
+            lower, upper = self._bounds(node[1])
+            universe = self.universe()
+            return universe & ~upper, universe & ~lower
+
+        unindexed = self._dense("unindexed", None, self.unindexed)
+        exact = self._exact(node)
+        if exact is not None:
+            # Los no indexados y los recortados que pueden cumplir solo
+            # entran en 'superior'
+            return exact, exact | unindexed | self.trimmed(self._pairs(node))
+        if node[0] == "field":
+            ports = self._app_ports(node[1])
+            if ports is not None:
+                # Un protocolo de aplicación solo aparece en sus puertos
+                return 0, self.lookup(ports) | unindexed | self.trimmed(ports)
+        return 0, self.universe()
+
+    @staticmethod
+    def _app_ports(name):
+        """
+        Pares (tabla, clave) de los puertos en los que el dispatcher puede
+        añadir la capa 'name' (según core.registry), o None si no depende
+        del puerto.
+        """
+        ports = []
+        for proto, table in ((6, REGISTRY.tcp_ports), (17, REGISTRY.udp_ports)):
+            ports += [(proto, port) for port, app in table.items() if app.name.lower() == name]
+        for port, (_, layer) in REGISTRY.labels.items():
+            if layer["layer"].lower() == name:
+                ports += [(6, port), (17, port)]
+        if not ports:
+            return None
+        return [(t, key) for key in ports for t in ("sport", "dport")]
+
+    def _pairs(self, node):
+        """
+        Pares (tabla, clave) cuya unión es exactamente el átomo (protocolos,
+        == e 'in' con valores sueltos), o None si no se reduce a claves.
+        """
+        if node[0] == "field":
+            return _PROTOCOL_KEYS.get(node[1])
+        field = node[1]
+        if node[0] == "in":
+            values = node[2]
+        elif node[0] == "cmp" and node[2] == "==":
+            values = [node[3]]
+        else:
+            return None
+        idx, kind, _ = FIELDS[field]
+        if kind in ("ipv4", "ipv6"):
+            af = 4 if kind == "ipv4" else 6
+            tables = [("src", "dst")[i == DST] for i in idx]
+            pairs = []
+            for value in values:
+                net = ipaddress.ip_network(value, strict=False)
+                if net.num_addresses != 1:
+                    return None
+                pairs += [(t, (af, int(net.network_address))) for t in tables]
+            return pairs
+        if any(".." in v for v in values):
+            return None
+        numbers = {int(v, 0) for v in values}
+        if field == "eth.type":
+            return [("ethertype", v) for v in numbers]
+        tables, prefix = self._numeric_tables(field)
+        return [(t, (prefix, v)) for t in tables for v in numbers]
+
+    def _exact(self, node):
+        """Bitmap exacto (sobre los paquetes indexados) de un átomo, o None si es residual."""
+        if node[0] == "field":
+            name = node[1]
+            if name == "eth":
+                return self.indexed()
+            if name in _PROTOCOL_KEYS:
+                return self.lookup(_PROTOCOL_KEYS[name])
+            return None
+
+        field = node[1]
+        if field not in FIELDS or field in ("frame.len", "tcp.flags"):
+            return None     # campo no indexado: residual
+        idx, kind, _ = FIELDS[field]
+
+        if node[0] == "prefixes":
+            af = 4 if kind == "ipv4" else 6
+            match = get_prefix_set(node[2]).matcher(af)
+            tables = [("src", "dst")[i == DST] for i in idx]
+            return self.lookup(self._keys(tables, lambda k: k[0] == af and match(k[1])))
+
+        if node[0] == "in":
+            if kind != "int":
+                bitmap = 0
+                for value in node[2]:
+                    bitmap |= self._exact(("cmp", field, "==", value))
+                return bitmap
+            numbers = {int(v, 0) for v in node[2] if ".." not in v}
+            ranges = [tuple(int(x, 0) for x in v.split("..", 1)) for v in node[2] if ".." in v]
+            return self._numeric(field, lambda x: x in numbers or
+                                 any(lo <= x <= hi for lo, hi in ranges),
+                                 numbers if not ranges else None)
+
+        _, _, op, value = node
+        if kind in ("ipv4", "ipv6"):
+            if op == "!=":
+                # En direcciones != es !(==), igual que en core.display_filter
+                return self.indexed() & ~self._exact(("cmp", field, "==", value))
+            af = 4 if kind == "ipv4" else 6
+            net = ipaddress.ip_network(value, strict=False)
+            lo, hi = int(net.network_address), int(net.broadcast_address)
+            tables = [("src", "dst")[i == DST] for i in idx]
+            if lo == hi:
+                return self.lookup([(t, (af, lo)) for t in tables])
+            return self.lookup(self._keys(tables, lambda k: k[0] == af and lo <= k[1] <= hi))
+
+        number = int(value, 0)
+        test = _OPS[op]
+        return self._numeric(field, lambda x: test(x, number), {number} if op == "==" else None)
+
+    def _numeric(self, field, test, exact=None):
+        """Átomo numérico: claves cuyo valor cumple test (o exactamente las de 'exact')."""
+        if field == "eth.type":
+            if exact is not None:
+                return self.lookup([("ethertype", v) for v in exact])
+            return self.lookup(self._keys(["ethertype"], test))
+
+        tables, prefix = self._numeric_tables(field)
+        if exact is not None:
+            return self.lookup([(t, (prefix, v)) for t in tables for v in exact])
+        return self.lookup(self._keys(tables, lambda k: k[0] == prefix and test(k[1])))
+
+    @staticmethod
+    def _numeric_tables(field):
+        """Tablas y primer elemento de la clave de un campo numérico (no eth.type)."""
+        if field in ("ip.proto", "ipv6.nxt"):
+            return ["ipproto"], 4 if field == "ip.proto" else 6
+        idx = FIELDS[field][0]
+        return [("sport", "dport")[i == DPORT] for i in idx], 6 if field.startswith("tcp.") else 17
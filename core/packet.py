@@ -1,20 +1,209 @@
 # core/packet.py
-from dataclasses import dataclass, field
-from typing import Any, Dict, List
+import socket
+import sys
+from typing import Any, Dict, List, Optional
+
+# Familia de las direcciones src/dst guardadas como enteros
+AF_NONE = 0    # sin dirección conocida
+AF_MAC  = 1    # MAC de 48 bits (tramas no IP)
+AF_INET = 4
+AF_INET6 = 6
+
+_ADDR_BYTES = {AF_MAC: 6, AF_INET: 4, AF_INET6: 16}
+
+
+def addr_to_int(text: str):
+    """Convierte 'x.x.x.x', IPv6 o MAC en (af, entero). (AF_NONE, 0) si no se reconoce."""
+    try:
+        return AF_INET, int.from_bytes(socket.inet_pton(socket.AF_INET, text), "big")
+    except (OSError, TypeError):
+        pass
+    try:
+        return AF_INET6, int.from_bytes(socket.inet_pton(socket.AF_INET6, text), "big")
+    except (OSError, TypeError):
+        pass
+    try:
+        b = bytes.fromhex(text.replace(":", ""))
+        if len(b) == 6:
+            return AF_MAC, int.from_bytes(b, "big")
+    except (ValueError, AttributeError):
+        pass
+    return AF_NONE, 0
+
+
+def int_to_addr(af: int, value: int) -> str:
+    """Inverso de addr_to_int: formatea la dirección entera para mostrarla."""
+    if af == AF_INET:
+        return socket.inet_ntoa(value.to_bytes(4, "big"))
+    if af == AF_INET6:
+        return socket.inet_ntop(socket.AF_INET6, value.to_bytes(16, "big"))
+    if af == AF_MAC:
+        return value.to_bytes(6, "big").hex(":")
+    return "Desconocido"
+
+
+def packet_columns(parsed: Dict[str, Any]):
+    """
+    Calcula (src, dst, proto) para la lista de paquetes recorriendo las capas
+    de un dict ya parseado. Prioridad: IP (v4/v6, ARP) y si no hay, MAC.
+    """
+    src = "Desconocido"
+    dst = "Desconocido"
+    layers = parsed.get("layers", [])
+
+    for layer in layers:
+        f = layer.get("fields", {})
+        s = f.get("Source") or f.get("src") or f.get("Sender IP") or f.get("Source IPv6")
+        d = f.get("Destination") or f.get("dst") or f.get("Target IP") or f.get("Destination IPv6")
+        if s: src = s
+        if d: dst = d
+
+    if src == "Desconocido" and layers:
+        eth = layers[0].get("fields", {})
+        src = eth.get("src_mac", src)
+        dst = eth.get("dst_mac", dst)
+
+    l4 = next((l for l in layers if l["layer"] in ("TCP", "UDP", "ICMP", "ICMPv6")), None)
+    proto = l4["layer"] if l4 else (layers[-1]["layer"] if layers else "")
+    return src, dst, proto
+
 
-@dataclass
 class Packet:
     """
-    Representación simple y serializable de un paquete dentro del sniffer.
+    Registro compacto de un paquete capturado.
+
     - raw: bytes originales del frame completo (Ethernet + ...)
-    - timestamp: opcional, marca temporal si la captura la provee
-    - layers: lista ordenada de capas parseadas (cada elemento es dict {"layer":name,"fields":{...}})
-    - meta: espacio libre para datos auxiliares (por ejemplo: interfaz, index, flags)
+    - ts_ns: marca temporal en nanosegundos (0 si no se conoce); linktype
+    - af/src/dst: familia y direcciones como enteros (ver AF_*)
+    - proto: nombre del protocolo de la lista (interned), sport/dport
+    - length: longitud mostrada (len(raw) salvo paquetes simulados)
+    - layers: capas parseadas; se disecan con parse_packet() la primera vez
+      que se piden y quedan cacheadas
+    - summary: se calcula de las cabeceras al pedirlo (o de las capas)
+    - meta: dict opcional para datos auxiliares (None si no se usa)
+
+    Usa __slots__: un paquete TCP de 60 bytes sin materializar ocupa unos
+    350 bytes en total (objeto + enteros + raw) frente a ~2.7 KB del dict
+    anidado de parse_packet (medido con benchmarks/bench_memory.py).
+    El dict clásico sigue disponible con to_dict().
     """
-    raw: bytes
-    timestamp: float = 0.0
-    layers: List[Dict[str, Any]] = field(default_factory=list)
-    meta: Dict[str, Any] = field(default_factory=dict)
+    __slots__ = ("raw", "ts_ns", "linktype", "af", "src", "dst", "proto",
+                 "sport", "dport", "length", "_summary", "_layers", "meta")
+
+    def __init__(self, raw: bytes = b"", ts_ns: int = 0, linktype: int = 1,
+                 af: int = AF_NONE, src: int = 0, dst: int = 0, proto: str = "",
+                 sport: int = 0, dport: int = 0, length: Optional[int] = None,
+                 summary: Optional[str] = None,
+                 layers: Optional[List[Dict[str, Any]]] = None,
+                 meta: Optional[Dict[str, Any]] = None):
+        self.raw = raw
+        self.ts_ns = ts_ns
+        self.linktype = linktype
+        self.af = af
+        self.src = src
+        self.dst = dst
+        self.proto = sys.intern(proto)
+        self.sport = sport
+        self.dport = dport
+        self.length = len(raw) if length is None else length
+        self._summary = summary
+        self._layers = layers
+        self.meta = meta
+
+    # ------------------------------
+    #   Adaptadores desde dicts
+    # ------------------------------
+    @classmethod
+    def from_parsed(cls, parsed: Dict[str, Any], ts_ns: int = 0, linktype: int = 1):
+        """Construye el registro a partir del dict completo de parse_packet."""
+        src, dst, proto = packet_columns(parsed)
+        af, src_i = addr_to_int(src)
+        _, dst_i = addr_to_int(dst)
+        sport = dport = 0
+        for layer in parsed["layers"]:
+            if layer["layer"] in ("TCP", "UDP"):
+                f = layer.get("fields", {})
+                sport = f.get("Source Port", 0) or 0
+                dport = f.get("Destination Port", 0) or 0
+                break
+        return cls(parsed["raw"], ts_ns, linktype, af, src_i, dst_i, proto,
+                   sport, dport, summary=parsed["summary"], layers=parsed["layers"])
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]):
+        """
+        Adaptador para dicts "a mano" (simulador, código antiguo): usa las
+        claves src/dst/proto/length/summary/layers/raw si existen.
+        """
+        src = d.get("src")
+        dst = d.get("dst")
+        proto = d.get("proto")
+        if src is None or proto is None:
+            src, dst, proto = packet_columns(d)
+        af, src_i = addr_to_int(str(src))
+        _, dst_i = addr_to_int(str(dst))
+        raw = d.get("raw", b"")
+        return cls(raw, d.get("ts_ns", 0), d.get("linktype", 1), af, src_i, dst_i, proto,
+                   length=d.get("length") or len(raw), summary=d.get("summary", ""),
+                   layers=d.get("layers", []))
+
+    # ------------------------------
+    #   Disección perezosa
+    # ------------------------------
+    def _materialize(self):
+        from core.dispatcher import parse_packet
+        full = parse_packet(self.raw)
+        self._layers = full["layers"]
+        if self._summary is None:
+            self._summary = full["summary"]
+
+    @property
+    def materialized(self) -> bool:
+        return self._layers is not None
+
+    def dissect(self):
+        """Diseca las capas ahora si aún no lo están (p. ej. en un worker)."""
+        if self._layers is None:
+            self._materialize()
+
+    def drop_layers(self):
+        """Suelta las capas disecadas si se pueden volver a sacar de raw."""
+        if self.raw:
+            self._layers = None
+
+    @property
+    def layers(self) -> List[Dict[str, Any]]:
+        if self._layers is None:
+            self._materialize()
+        return self._layers
+
+    @property
+    def summary(self) -> str:
+        if self._summary is not None:
+            return self._summary
+        if self._layers is None:
+            # Caso común: el resumen sale de las cabeceras sin construir capas
+            from core.dispatcher import peek_summary
+            s = peek_summary(self.raw)
+            if s is not None:
+                return s
+            self._materialize()
+        return self._summary
+
+    # ------------------------------
+    #   Columnas formateadas
+    # ------------------------------
+    @property
+    def timestamp(self) -> float:
+        return self.ts_ns / 1e9
+
+    @property
+    def src_str(self) -> str:
+        return int_to_addr(self.af, self.src)
+
+    @property
+    def dst_str(self) -> str:
+        return int_to_addr(self.af, self.dst)
 
     def add_layer(self, layer_name: str, fields: Dict[str, Any]):
         """Añade una capa parseada al final de self.layers."""
@@ -28,33 +217,23 @@ class Packet:
         return None
 
     def to_dict(self) -> Dict[str, Any]:
-        """Exporta una representación limpia (serializable) del paquete."""
+        """
+        Adaptador a la forma clásica del dict de parse_packet
+        (layers, raw, summary) más las columnas de la lista.
+        """
         return {
-            "timestamp": self.timestamp,
             "layers": self.layers,
-            "meta": self.meta,
-            "raw_len": len(self.raw),
+            "raw": self.raw,
+            "summary": self.summary,
+            "timestamp": self.timestamp,
+            "src": self.src_str,
+            "dst": self.dst_str,
+            "proto": self.proto,
+            "length": self.length,
         }
 
-    def summary(self) -> str:
-        """
-        Genera un resumen legible. Intenta sacar IPv4/IPv6 + L4 si existen,
-        y si no, devuelve el tipo Ethernet (ethertype).
-        """
-        l3 = self.get_layer("IPv4") or self.get_layer("IPv6")
-        l4 = self.get_layer("TCP") or self.get_layer("UDP")
-        if l3 and l4:
-            src = l3["fields"].get("src") or l3["fields"].get("Source")
-            dst = l3["fields"].get("dst") or l3["fields"].get("Destination")
-            return f"{src} -> {dst} {l4['layer']}"
-        if l3:
-            src = l3["fields"].get("src") or l3["fields"].get("Source")
-            dst = l3["fields"].get("dst") or l3["fields"].get("Destination")
-            return f"{src} -> {dst}"
-        eth = self.get_layer("Ethernet")
-        if eth:
-            return eth["fields"].get("ethertype", "Ethernet frame")
-        return "Unknown packet"
+    def __repr__(self):
+        return f"Packet({self.src_str} -> {self.dst_str} {self.proto})"
 
 # -------------------------------------------------
 # Nueva clase Ethernet para que pasen los tests
@@ -0,0 +1,108 @@
+# core/parallel.py
+# Disección en paralelo (multi-proceso) de capturas offline
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.util import Finalize
+
+from capture.pcap_file import PcapFile
+from capture.pcap_index import PcapIndex
+from capture.pcap_reader import _parse_frame
+
+DEFAULT_CHUNK = 4096
+
+# Cada proceso worker mantiene abierto el mmap de la captura que procesa:
+# ruta -> ((ruta, tamaño, mtime), PcapFile)
+_worker_pcap = {}
+
+
+def _worker_file(path):
+    """PcapFile abierto de 'path'; se reabre si el archivo cambió desde la última vez."""
+    st = os.stat(path)
+    key = (path, st.st_size, st.st_mtime_ns)
+    cached = _worker_pcap.get(path)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    if cached is not None:
+        cached[1].close()
+    pcap = PcapFile(path)
+    _worker_pcap[path] = (key, pcap)
+    return pcap
+
+
+def _close_worker_files():
+    while _worker_pcap:
+        _, (_, pcap) = _worker_pcap.popitem()
+        pcap.close()
+
+
+def _init_worker():
+    # Los workers salen sin pasar por atexit; los Finalize de
+    # multiprocessing sí se ejecutan al terminar el proceso
+    Finalize(None, _close_worker_files, exitpriority=10)
+
+
+def _parse_chunk(path, offsets, caplens, timestamps, linktypes):
+    """
+    Ejecutado en el worker: parsea un bloque contiguo de paquetes.
+    Devuelve la lista de Packet (ya disecados) en el mismo orden que los offsets.
+    """
+    pcap = _worker_file(path)
+    out = []
+    for off, caplen, ts_ns, linktype in zip(offsets, caplens, timestamps, linktypes):
+        pkt = _parse_frame(pcap.frame(off, caplen), ts_ns, linktype)
+        pkt.dissect()   # la disección completa se hace aquí, en el worker
+        out.append(pkt)
+    return out
+
+
+def _chunks(idx, chunk_size):
+    for start in range(0, len(idx), chunk_size):
+        stop = start + chunk_size
+        yield (idx.offsets[start:stop], idx.caplens[start:stop],
+               idx.timestamps[start:stop], idx.linktypes[start:stop])
+
+
+def parallel_parse(path, on_packet, workers=None, chunk_size=DEFAULT_CHUNK):
+    """
+    Parsea una captura repartiendo bloques de offsets entre procesos.
+
+    - La captura se divide en bloques contiguos usando el índice sidecar
+      (PcapIndex); cada worker mapea el archivo y parsea su bloque.
+    - Los Packet resultantes, con sus capas ya disecadas, se entregan a
+      on_packet(packet) en el orden original.
+    - parse_packet no guarda estado entre paquetes, así que el resultado es
+      idéntico al de read_pcap. Todo estado que dependa del flujo
+      (reensamblado, tablas de conexiones...) debe vivir en on_packet, que
+      se ejecuta en el proceso principal durante la fusión ordenada.
+
+    Mantiene como mucho 2 bloques en vuelo por worker para acotar memoria.
+    Devuelve el número de paquetes entregados.
+    """
+    workers = workers or os.cpu_count() or 1
+    idx = PcapIndex.open(path)
+    path = os.fspath(path)
+    total = 0
+
+    if workers <= 1:
+        for chunk in _chunks(idx, chunk_size):
+            for pkt in _parse_chunk(path, *chunk):
+                on_packet(pkt)
+                total += 1
+        _close_worker_files()
+        return total
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        pending = deque()
+        for chunk in _chunks(idx, chunk_size):
+            pending.append(pool.submit(_parse_chunk, path, *chunk))
+            if len(pending) >= workers * 2:
+                for pkt in pending.popleft().result():
+                    on_packet(pkt)
+                    total += 1
+        while pending:
+            for pkt in pending.popleft().result():
+                on_packet(pkt)
+                total += 1
+
+    return total
@@ -0,0 +1,161 @@
+# core/registry.py
+# Registro de protocolos: tablas de despacho por ethertype, protocolo IP y puerto
+from collections import namedtuple
+
+# Grupo de entry points para parsers de terceros. Cada entry point apunta a
+# una función register(registry) que llama a los register_* de este módulo.
+ENTRY_POINT_GROUP = "sniffer_redes.parsers"
+
+# Protocolo de aplicación asociado a un puerto TCP/UDP
+# - name: nombre de la capa ("HTTP", "DNS"...)
+# - parser: LazyParser con la clase cuyo to_dict() da los campos
+# - summary: función(fields) -> resumen o None para dejar el de L4
+# - error: si no es None, un fallo del parser añade una capa de error con
+#   este prefijo (si es None, el fallo se ignora)
+# - priority: si ambos puertos tienen protocolo, gana el menor
+AppProtocol = namedtuple("AppProtocol", "name parser summary error priority")
+
+
+class LazyParser:
+    """
+    Referencia a un parser que se importa la primera vez que se usa.
+    spec puede ser "modulo:Clase" o directamente la clase/función.
+    """
+    __slots__ = ("spec", "_obj", "_loaded")
+
+    def __init__(self, spec):
+        self.spec = spec
+        self._obj = None if isinstance(spec, str) else spec
+        self._loaded = not isinstance(spec, str)
+
+    def get(self):
+        """Devuelve el parser, o None si no se pudo importar."""
+        if not self._loaded:
+            self._loaded = True
+            path, name = self.spec.split(":")
+            try:
+                module = __import__(path, fromlist=[name])
+                self._obj = getattr(module, name)
+            except Exception as e:
+                print(f"⚠️  ERROR IMPORTANDO {name}: {e}")
+        return self._obj
+
+
+class ProtocolRegistry:
+    """
+    Tablas de despacho del dispatcher: una sola búsqueda en dict por capa.
+
+    - ethertypes: ethertype -> handler(payload, out) que añade la capa L3 y
+      devuelve (payload_l4, proto_ip) o None si no hay nada más que parsear
+    - ip_protocols: protocolo IP -> handler(payload, out) de la capa L4
+    - tcp_ports / udp_ports: puerto -> AppProtocol
+    - labels: puerto -> capa "etiqueta" para tráfico sin parser propio
+
+    app_ports["tcp"/"udp"] son los puertos que necesitan disección de
+    aplicación (se usan en el camino rápido y en la extracción por lotes).
+    fast_path indica que los handlers del caso común (IPv4, TCP, UDP) siguen
+    siendo los del proyecto; si alguien los sustituye se desactiva.
+    """
+
+    FAST_PATH_KEYS = {("ethertype", 0x0800), ("ip", 6), ("ip", 17)}
+
+    def __init__(self):
+        self.ethertypes = {}
+        self.ip_protocols = {}
+        self.tcp_ports = {}
+        self.udp_ports = {}
+        self.labels = {}
+        self.app_ports = {"tcp": set(), "udp": set()}
+        self.fast_path = True
+        self._parsers = {}
+        self._priority = 0
+        self._plugins_loaded = False
+
+    # ------------------------------
+    #   Registro
+    # ------------------------------
+    def parser(self, spec):
+        """LazyParser compartido para un spec ("modulo:Clase")."""
+        if spec not in self._parsers:
+            self._parsers[spec] = LazyParser(spec)
+        return self._parsers[spec]
+
+    def register_ethertype(self, ethertype, handler):
+        self.ethertypes[ethertype] = handler
+        self._touch(("ethertype", ethertype))
+
+    def register_ip_protocol(self, proto, handler):
+        self.ip_protocols[proto] = handler
+        self._touch(("ip", proto))
+
+    def register_port(self, transport, ports, name, parser, summary=None, error=None):
+        """
+        Asocia uno o varios puertos TCP/UDP a un protocolo de aplicación.
+        parser: "modulo:Clase" (import perezoso) o la clase; su instancia
+        debe ofrecer to_dict(). Los registros posteriores tienen menor prioridad.
+        """
+        table = self.tcp_ports if transport == "tcp" else self.udp_ports
+        if isinstance(ports, int):
+            ports = (ports,)
+        self._priority += 1
+        lazy = self.parser(parser) if isinstance(parser, str) else LazyParser(parser)
+        entry = AppProtocol(name, lazy, summary, error, self._priority)
+        for port in ports:
+            table[port] = entry
+            self.app_ports[transport].add(port)
+
+    def register_label(self, ports, layer):
+        """Capa fija (sin parser) para puertos conocidos en TCP y UDP."""
+        if isinstance(ports, int):
+            ports = (ports,)
+        self._priority += 1
+        for port in ports:
+            self.labels[port] = (self._priority, layer)
+            self.app_ports["tcp"].add(port)
+            self.app_ports["udp"].add(port)
+
+    def _touch(self, key):
+        if key in self.FAST_PATH_KEYS:
+            self.fast_path = False
+
+    # ------------------------------
+    #   Búsqueda
+    # ------------------------------
+    def lookup_port(self, transport, sport, dport):
+        """AppProtocol para el par de puertos (o None)."""
+        table = self.tcp_ports if transport == "tcp" else self.udp_ports
+        a = table.get(sport)
+        b = table.get(dport)
+        if a is None or (b is not None and b.priority < a.priority):
+            return b
+        return a
+
+    def lookup_label(self, sport, dport):
+        a = self.labels.get(sport)
+        b = self.labels.get(dport)
+        if a is None or (b is not None and b[0] < a[0]):
+            a = b
+        return a[1] if a else None
+
+    # ------------------------------
+    #   Plugins
+    # ------------------------------
+    def load_plugins(self, group=ENTRY_POINT_GROUP):
+        """Ejecuta los register(registry) publicados como entry points (una vez)."""
+        if self._plugins_loaded:
+            return
+        self._plugins_loaded = True
+        try:
+            from importlib.metadata import entry_points
+            eps = entry_points(group=group)
+        except Exception:
+            return
+        for ep in eps:
+            try:
+                ep.load()(self)
+            except Exception as e:
+                print(f"⚠️  ERROR CARGANDO PLUGIN {ep.name}: {e}")
+
+
+# Registro global que usa core.dispatcher
+REGISTRY = ProtocolRegistry()
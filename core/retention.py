@@ -0,0 +1,277 @@
+# core/retention.py
+# Almacén de paquetes con memoria acotada: lo antiguo se vuelca a disco
+import os
+import shutil
+import struct
+import tempfile
+from bisect import bisect_right
+from collections import OrderedDict, deque
+
+from capture.pcap_index import PcapIndex, index_path
+from capture.pcap_writer import PcapWriter
+from core.dispatcher import parse_packet_lazy
+from core.packet import Packet
+
+DEFAULT_MAX_PACKETS = 200_000
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+DEFAULT_SEGMENT_BYTES = 64 * 1024 * 1024
+DEFAULT_CACHE = 4096
+
+# Coste estimado en memoria de un Packet sin disecar, además de sus bytes
+# (ver la medida del docstring de core.packet.Packet)
+PACKET_OVERHEAD = 300
+
+# Cabecera de registro del pcap clásico (ts, ts, caplen, origlen) antes de la trama
+_RECORD = struct.Struct("<IIII")
+
+# Índices de segmentos cerrados y archivos abiertos que se mantienen a la vez
+_OPEN_SEGMENTS = 2
+
+
+class _Segment:
+    __slots__ = ("first_id", "path", "count")
+
+    def __init__(self, first_id, path):
+        self.first_id = first_id
+        self.path = path
+        self.count = 0
+
+
+class RetentionStore:
+    """
+    Secuencia de paquetes (store[id], len(store), iteración) que solo
+    mantiene en memoria los más recientes.
+
+    Cuando se supera max_packets o max_bytes, los paquetes más antiguos se
+    escriben en segmentos pcap rotativos (segment_bytes cada uno) dentro de
+    spill_dir, con su PcapIndex como sidecar, y se sueltan de la memoria.
+    Al pedir un paquete volcado se relee su trama del segmento (con una
+    pequeña caché LRU de cache_size paquetes) y se vuelve a decodificar.
+
+    La memoria queda acotada por: la ventana reciente, la caché, el índice
+    del segmento en escritura y _OPEN_SEGMENTS índices de segmentos
+    cerrados. Por cada segmento solo se guarda en memoria su primer id.
+    Con max_segments se limita también el disco: los segmentos más antiguos
+    se borran y sus paquetes dejan de estar disponibles.
+
+    Cada paquete en memoria cuenta como sus bytes más packet_overhead: al
+    añadirlo se sueltan sus capas disecadas (Packet.drop_layers), que se
+    vuelven a disecar de raw si se piden. Quien guarde estructuras por
+    paquete junto al store (p. ej. el índice de gui.PacketList) puede
+    sumarlas en packet_overhead para que max_bytes las incluya.
+
+    Los paquetes sin bytes (simulador) se vuelcan como tramas vacías: al
+    releerlos solo se conservan el timestamp y la longitud (sin protocolo,
+    direcciones ni resumen).
+    """
+
+    def __init__(self, max_packets=DEFAULT_MAX_PACKETS, max_bytes=DEFAULT_MAX_BYTES,
+                 spill_dir=None, segment_bytes=DEFAULT_SEGMENT_BYTES, max_segments=None,
+                 cache_size=DEFAULT_CACHE, packet_overhead=PACKET_OVERHEAD):
+        self.max_packets = max_packets
+        self.max_bytes = max_bytes
+        self.segment_bytes = segment_bytes
+        self.max_segments = max_segments
+        self.cache_size = cache_size
+        self.packet_overhead = packet_overhead
+        self.spill_dir = spill_dir
+        self._own_dir = spill_dir is None       # directorio temporal propio
+
+        self._hot = deque()
+        self._hot_first = 0         # id del paquete _hot[0]
+        self._hot_bytes = 0
+        self.first_available = 0    # ids menores: segmentos ya borrados
+
+        self._segments = []
+        self._firsts = []           # first_id de cada segmento (para bisect)
+        self._writer = None
+        self._active_index = None
+        self._indexes = OrderedDict()   # ruta -> PcapIndex (segmentos cerrados)
+        self._files = OrderedDict()     # ruta -> archivo abierto para leer
+        self._cache = OrderedDict()     # id -> Packet releído
+        self.spilled = 0
+
+    # ------------------------------
+    #   Secuencia
+    # ------------------------------
+    def __len__(self):
+        return self._hot_first + len(self._hot)
+
+    def __getitem__(self, pid):
+        if pid < 0:
+            pid += len(self)
+        if pid >= self._hot_first:
+            return self._hot[pid - self._hot_first]
+        if pid < 0:
+            raise IndexError(pid)
+        packet = self._cache.get(pid)
+        if packet is not None:
+            self._cache.move_to_end(pid)
+            return packet
+        packet = self._read(pid)
+        self._cache[pid] = packet
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return packet
+
+    def __iter__(self):
+        for pid in range(len(self)):
+            yield self[pid]
+
+    @property
+    def first_in_memory(self):
+        """Id del paquete más antiguo que sigue en memoria (los anteriores están en disco)."""
+        return self._hot_first
+
+    def append(self, packet):
+        packet.drop_layers()
+        self._hot.append(packet)
+        self._hot_bytes += len(packet.raw) + self.packet_overhead
+        if len(self._hot) > self.max_packets or self._hot_bytes > self.max_bytes:
+            self._evict()
+
+    def extend(self, packets):
+        for packet in packets:
+            self.append(packet)
+
+    # ------------------------------
+    #   Volcado a disco
+    # ------------------------------
+    def _evict(self):
+        hot = self._hot
+        while len(hot) > 1 and (len(hot) > self.max_packets or self._hot_bytes > self.max_bytes):
+            packet = hot.popleft()
+            self._spill(self._hot_first, packet)
+            self._hot_first += 1
+            self._hot_bytes -= len(packet.raw) + self.packet_overhead
+
+    def _spill(self, pid, packet):
+        writer = self._writer
+        if writer is None or writer.linktype != packet.linktype or \
+                writer.offset >= self.segment_bytes:
+            writer = self._rotate(pid, packet.linktype)
+        offset = writer.write(packet.raw, packet.ts_ns, packet.length)
+        self._active_index.append(offset, packet.ts_ns, len(packet.raw), packet.linktype)
+        self._segments[-1].count += 1
+        self.spilled += 1
+
+    def _rotate(self, first_id, linktype):
+        """Cierra el segmento en escritura (guardando su índice) y abre otro."""
+        self._close_active()
+        if self.spill_dir is None:
+            self.spill_dir = tempfile.mkdtemp(prefix="sniffer-spill-")
+        os.makedirs(self.spill_dir, exist_ok=True)
+
+        path = os.path.join(self.spill_dir, f"seg-{len(self._firsts):05d}.pcap")
+        self._segments.append(_Segment(first_id, path))
+        self._firsts.append(first_id)
+        self._writer = PcapWriter(path, linktype)
+        self._active_index = PcapIndex()
+
+        if self.max_segments is not None:
+            live = [s for s in self._segments if s.path is not None]
+            for seg in live[:max(0, len(live) - self.max_segments)]:
+                self._drop_segment(seg)
+        return self._writer
+
+    def _close_active(self):
+        if self._writer is None:
+            return
+        self._writer.close()
+        self._active_index.compute_stats()
+        try:
+            self._active_index.save(self._writer.path)
+        except OSError:
+            pass    # se reconstruye al leer (PcapIndex.open)
+        self._writer = self._active_index = None
+
+    def _drop_segment(self, seg):
+        self._release(seg.path)
+        for path in (seg.path, index_path(seg.path)):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        self.first_available = seg.first_id + seg.count
+        seg.path = None
+        for pid in [p for p in self._cache if p < self.first_available]:
+            del self._cache[pid]
+
+    # ------------------------------
+    #   Relectura
+    # ------------------------------
+    def _read(self, pid):
+        if pid < self.first_available:
+            return Packet(summary="[descartado por la retención]")
+        seg = self._segments[bisect_right(self._firsts, pid) - 1]
+        n = pid - seg.first_id
+        if self._writer is not None and seg is self._segments[-1]:
+            index = self._active_index
+            self._writer.flush()
+        else:
+            index = self._index(seg.path)
+
+        f = self._file(seg.path)
+        f.seek(index.offsets[n] - _RECORD.size)
+        record = f.read(_RECORD.size + index.caplens[n])
+        origlen = _RECORD.unpack_from(record)[3]
+        raw = record[_RECORD.size:]
+        if not raw:
+            return Packet(b"", index.timestamps[n], index.linktypes[n], length=origlen,
+                          summary="")
+        packet = parse_packet_lazy(raw, index.timestamps[n], index.linktypes[n])
+        packet.length = origlen
+        return packet
+
+    def _lru(self, table, path, load):
+        value = table.get(path)
+        if value is None:
+            value = table[path] = load(path)
+            if len(table) > _OPEN_SEGMENTS:
+                _, old = table.popitem(last=False)
+                if hasattr(old, "close"):
+                    old.close()
+        else:
+            table.move_to_end(path)
+        return value
+
+    def _index(self, path):
+        return self._lru(self._indexes, path, PcapIndex.open)
+
+    def _file(self, path):
+        return self._lru(self._files, path, lambda p: open(p, "rb"))
+
+    def _release(self, path):
+        self._indexes.pop(path, None)
+        f = self._files.pop(path, None)
+        if f is not None:
+            f.close()
+
+    # ------------------------------
+    #   Estado / cierre
+    # ------------------------------
+    def stats(self):
+        return {
+            "packets": len(self),
+            "in_memory": len(self._hot),
+            "memory_bytes": self._hot_bytes,
+            "spilled": self.spilled,
+            "segments": sum(1 for s in self._segments if s.path is not None),
+            "first_available": self.first_available,
+        }
+
+    def close(self):
+        """Cierra los segmentos; borra el directorio si era temporal."""
+        self._close_active()
+        for path in list(self._files):
+            self._release(path)
+        self._indexes.clear()
+        if self._own_dir and self.spill_dir is not None:
+            shutil.rmtree(self.spill_dir, ignore_errors=True)
+            self.spill_dir = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
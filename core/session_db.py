@@ -0,0 +1,399 @@
+# core/session_db.py
+# Sesión de captura persistente en SQLite: millones de paquetes consultables entre reinicios
+import ipaddress
+import os
+import sqlite3
+from array import array
+from collections import OrderedDict
+
+from capture.pcap_file import PcapFile
+from core.dispatcher import parse_packet_lazy
+from core.display_filter import (AF, DPORT, DST, ETHERTYPE, FIELDS, FLAGS, LENGTH,
+                                 LINKTYPE_ETHERNET, PROTO, PROTOCOLS, SPORT, SRC, TCP_FLAGS,
+                                 decode_layers, decode_raw)
+from core.packet import _ADDR_BYTES, AF_NONE, Packet
+
+DEFAULT_BATCH = 10_000
+PAGE_SIZE = 512
+MAX_PAGES = 16
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id   INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL
+);
+CREATE TABLE IF NOT EXISTS packets (
+    id        INTEGER PRIMARY KEY,  -- id de paquete (fila de la lista), desde 0
+    ts_ns     INTEGER NOT NULL,
+    linktype  INTEGER NOT NULL,
+    ethertype INTEGER,
+    af        INTEGER NOT NULL,     -- familia de red de la trama, 0 si no es IP (ARP incluido)
+    src       BLOB NOT NULL,        -- big endian: 4 (IPv4), 16 (IPv6) o 6 bytes (MAC)
+    dst       BLOB NOT NULL,
+    ip_proto  INTEGER,
+    sport     INTEGER,
+    dport     INTEGER,
+    tcp_flags INTEGER,
+    proto     TEXT NOT NULL,
+    length    INTEGER NOT NULL,
+    frame_len INTEGER NOT NULL,     -- longitud que ven los filtros (frame.len)
+    summary   TEXT,
+    file_id   INTEGER REFERENCES files(id),
+    offset    INTEGER,              -- posición de la trama en el archivo
+    caplen    INTEGER,
+    raw       BLOB                  -- solo si la trama no está en un archivo
+);
+CREATE INDEX IF NOT EXISTS packets_src ON packets(src);
+CREATE INDEX IF NOT EXISTS packets_dst ON packets(dst);
+CREATE INDEX IF NOT EXISTS packets_sport ON packets(sport);
+CREATE INDEX IF NOT EXISTS packets_dport ON packets(dport);
+CREATE INDEX IF NOT EXISTS packets_proto ON packets(ip_proto);
+"""
+
+_INSERT = ("INSERT INTO packets VALUES "
+           "(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)")
+_COLUMNS = "id, ts_ns, linktype, af, src, dst, proto, sport, dport, length, summary, " \
+           "file_id, offset, caplen, raw"
+
+# Campos de filtro -> columna SQL (índices de la tupla de decode_raw)
+_SQL_COLUMNS = {ETHERTYPE: "ethertype", AF: "af", SRC: "src", DST: "dst", PROTO: "ip_proto",
+                SPORT: "sport", DPORT: "dport", FLAGS: "tcp_flags", LENGTH: "frame_len"}
+# ip_proto es NULL en tramas no IP: "IS" compara sin dar NULL y usa el índice
+_GUARDS = {"h[1] == 4": "af = 4", "h[1] == 6": "af = 6",
+           "h[4] == 6": "ip_proto IS 6", "h[4] == 17": "ip_proto IS 17"}
+_PROTOCOL_SQL = {"True": "ethertype IS NOT -1", "(h[0] == 2048)": "ethertype IS 2048",
+                 "(h[0] == 34525)": "ethertype IS 34525", "(h[0] == 2054)": "ethertype IS 2054",
+                 "(h[1] != 0 and h[4] == 1)": "(af != 0 AND ip_proto IS 1)",
+                 "(h[1] != 0 and h[4] == 6)": "(af != 0 AND ip_proto IS 6)",
+                 "(h[1] != 0 and h[4] == 17)": "(af != 0 AND ip_proto IS 17)"}
+# Longitud de la dirección guardada -> Packet.af (para paquetes sin bytes)
+_BLOB_AF = {size: af for af, size in _ADDR_BYTES.items()}
+
+_WANTED = frozenset(range(8))
+
+
+def _addr_blob(af, value):
+    size = _ADDR_BYTES.get(af)
+    return value.to_bytes(size, "big") if size else b""
+
+
+def _row(pid, packet, file_id=None, offset=None):
+    """
+    Fila de la tabla packets para un core.packet.Packet. Las columnas de
+    filtro (ethertype, af, frame_len...) son las de decode_raw o
+    decode_layers, las que ven los filtros: un paquete ARP lleva las IP en
+    src/dst pero no es tráfico IP, y un paquete sin bytes no tiene
+    cabecera Ethernet (ethertype -1) y su frame.len es Packet.length.
+    """
+    raw = packet.raw
+    h = decode_raw(raw) if raw and packet.linktype == LINKTYPE_ETHERNET else None
+    if h is None:
+        h = decode_layers(packet.layers, packet.length, _WANTED)
+    return (pid, packet.ts_ns, packet.linktype, h[ETHERTYPE], h[AF],
+            _addr_blob(packet.af, packet.src), _addr_blob(packet.af, packet.dst),
+            None if h[PROTO] == -1 else h[PROTO], h[SPORT], h[DPORT], h[FLAGS],
+            packet.proto, packet.length, h[LENGTH], packet.summary, file_id, offset, len(raw),
+            None if file_id is not None else raw)
+
+
+# -------------------------------------------------------------------------
+# FILTROS -> SQL
+# -------------------------------------------------------------------------
+def _sql(node, params):
+    """
+    WHERE equivalente a un nodo del AST de core.display_filter, o None si
+    el nodo no se puede expresar con las columnas de la tabla (protocolos
+    de aplicación, listas de prefijos). Todas las condiciones devuelven
+    0/1, nunca NULL, para que NOT tenga el mismo sentido que en el filtro.
+    """
+    kind = node[0]
+    if kind in ("and", "or"):
+        parts = [_sql(n, params) for n in node[1]]
+        if None in parts:
+            return None
+        return "(" + f" {kind.upper()} ".join(parts) + ")"
+    if kind == "not":
+        inner = _sql(node[1], params)
+        return None if inner is None else f"(NOT {inner})"
+
+    name = node[1]
+    if kind == "field":
+        if name in PROTOCOLS:
+            return _PROTOCOL_SQL[PROTOCOLS[name][0]]
+        if name.startswith("tcp.flags."):
+            bit = TCP_FLAGS.get(name[len("tcp.flags."):])
+            return None if bit is None else \
+                f"(ip_proto IS 6 AND tcp_flags IS NOT NULL AND tcp_flags & {bit} != 0)"
+        if name in FIELDS:
+            idx, _, guard = FIELDS[name]
+            return _guarded(guard, [f"{_SQL_COLUMNS[idx[0]]} IS NOT NULL"])
+        return None
+    if name.startswith("tcp.flags.") and kind == "cmp":
+        flag = _sql(("field", name), params)
+        if flag is None or node[2] not in ("==", "!=") or node[3] not in ("0", "1"):
+            return None
+        return flag if (node[2] == "==") == (node[3] == "1") else f"(NOT {flag})"
+    if name not in FIELDS or kind not in ("cmp", "in"):
+        return None
+
+    idx, field_kind, guard = FIELDS[name]
+    values = [node[3]] if kind == "cmp" else node[2]
+    op = node[2] if kind == "cmp" else "=="
+    if field_kind != "int" and op == "!=":
+        # != sobre direcciones es !(==), como en core.display_filter
+        inner = _sql(("cmp", name, "==", node[3]), params)
+        return None if inner is None else f"(NOT {inner})"
+    if field_kind != "int" and op != "==":
+        return None
+    tests = []
+    for i in idx:
+        column = _SQL_COLUMNS[i]
+        alternatives = []
+        for value in values:
+            try:
+                alternatives.append(_compare(column, field_kind, op, value, params))
+            except ValueError:
+                return None     # lo rechaza también el compilador del filtro
+        tests.append("(" + " OR ".join(alternatives) + ")")
+    test = tests[0] if len(tests) == 1 else "(" + " OR ".join(tests) + ")"
+    return _guarded(guard, [f"{_SQL_COLUMNS[idx[0]]} IS NOT NULL", test])
+
+
+def _conjuncts(node):
+    """Términos de un && (anidado) del AST; el propio nodo si no es un &&."""
+    if node is None:
+        return []
+    if node[0] != "and":
+        return [node]
+    return [c for child in node[1] for c in _conjuncts(child)]
+
+
+def _guarded(guard, tests):
+    checks = ([_GUARDS[guard]] if guard else []) + tests
+    return "(" + " AND ".join(checks) + ")"
+
+
+def _compare(column, kind, op, value, params):
+    if kind == "int":
+        if ".." in value:
+            lo, hi = (int(v, 0) for v in value.split("..", 1))
+            params += [lo, hi]
+            return f"{column} BETWEEN ? AND ?"
+        params.append(int(value, 0))
+        return f"{column} {'=' if op == '==' else op} ?"
+    net = ipaddress.ip_network(value, strict=False)
+    if (net.version == 4) != (kind == "ipv4"):
+        raise ValueError(value)
+    size = 4 if net.version == 4 else 16
+    lo = int(net.network_address).to_bytes(size, "big")
+    if net.prefixlen == net.max_prefixlen:
+        params.append(lo)
+        return f"{column} = ?"
+    params += [lo, int(net.broadcast_address).to_bytes(size, "big")]
+    return f"{column} BETWEEN ? AND ?"
+
+
+class SessionDB:
+    """
+    Almacén de paquetes en una base SQLite (modo WAL), con la misma
+    interfaz de secuencia que core.retention.RetentionStore (db[id],
+    len(db), append/extend) para usarlo como store de gui.PacketList.
+
+    Cada paquete es una fila con las columnas de la lista y los campos de
+    filtro (direcciones, puertos, protocolo, flags), con índices en los
+    más usados. Las inserciones se agrupan en transacciones de
+    batch_size filas; la lectura va por páginas de PAGE_SIZE ids con una
+    caché LRU de MAX_PAGES páginas, así la memoria no crece con la sesión.
+
+    Los paquetes importados con import_pcap() guardan solo el offset de su
+    trama en el archivo original; los añadidos con append() (captura en
+    vivo) guardan también los bytes. Al reabrir la base la sesión sigue ahí.
+    """
+
+    def __init__(self, path, batch_size=DEFAULT_BATCH):
+        self.path = os.fspath(path)
+        self.batch_size = batch_size
+        self.conn = sqlite3.connect(self.path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(_SCHEMA)
+        self._stored = self.conn.execute("SELECT COALESCE(MAX(id) + 1, 0) FROM packets").fetchone()[0]
+        self._pending = []          # (fila, Packet) aún sin insertar
+        self._pages = OrderedDict()
+        self._files = {}            # file_id -> PcapFile abierto
+
+    # ------------------------------
+    #   Inserción
+    # ------------------------------
+    def __len__(self):
+        return self._stored + len(self._pending)
+
+    def append(self, packet, file_id=None, offset=None):
+        self._pending.append((_row(len(self), packet, file_id, offset), packet))
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def extend(self, packets):
+        for packet in packets:
+            self.append(packet)
+
+    def flush(self):
+        """Inserta lo pendiente en una sola transacción."""
+        if not self._pending:
+            return
+        with self.conn:
+            self.conn.executemany(_INSERT, [row for row, _ in self._pending])
+        # La página que contenía el final de lo guardado quedó incompleta
+        self._pages.pop(self._stored - self._stored % PAGE_SIZE, None)
+        self._stored += len(self._pending)
+        self._pending = []
+
+    def import_pcap(self, path, packet_filter=None):
+        """
+        Añade los paquetes de un pcap/pcapng guardando solo el offset de
+        cada trama (los bytes se releen del archivo). Devuelve cuántos
+        paquetes se añadieron.
+        """
+        path = os.path.abspath(path)
+        with self.conn:
+            self.conn.execute("INSERT OR IGNORE INTO files (path) VALUES (?)", (path,))
+        file_id = self.conn.execute("SELECT id FROM files WHERE path = ?", (path,)).fetchone()[0]
+        count = 0
+        with PcapFile(path) as pcap:
+            for rec in pcap:
+                if packet_filter is not None and \
+                        packet_filter.match_raw(rec.data, rec.linktype) is False:
+                    continue
+                packet = parse_packet_lazy(bytes(rec.data), rec.ts_ns, rec.linktype)
+                packet.length = rec.origlen
+                if packet_filter is not None and not packet_filter.match(packet):
+                    continue
+                self.append(packet, file_id, rec.offset)
+                count += 1
+        self.flush()
+        return count
+
+    # ------------------------------
+    #   Lectura por páginas
+    # ------------------------------
+    def __getitem__(self, pid):
+        if pid < 0:
+            pid += len(self)
+        if not 0 <= pid < len(self):
+            raise IndexError(pid)
+        if pid >= self._stored:
+            return self._pending[pid - self._stored][1]
+        start = pid - pid % PAGE_SIZE
+        page = self._pages.get(start)
+        if page is None:
+            page = self._pages[start] = self.page(start, PAGE_SIZE)
+            if len(self._pages) > MAX_PAGES:
+                self._pages.popitem(last=False)
+        else:
+            self._pages.move_to_end(start)
+        return page[pid - start]
+
+    def __iter__(self):
+        for pid in range(len(self)):
+            yield self[pid]
+
+    def page(self, start, count, where=None, params=()):
+        """
+        Paquetes de 'count' filas a partir de la fila 'start' (como
+        LIMIT/OFFSET). Sin 'where' se recorre por id, que es la clave
+        primaria; con 'where' se cuenta sobre las filas que lo cumplen.
+        """
+        self.flush()
+        if where is None:
+            rows = self.conn.execute(
+                f"SELECT {_COLUMNS} FROM packets WHERE id >= ? AND id < ? ORDER BY id",
+                (start, start + count))
+        else:
+            rows = self.conn.execute(
+                f"SELECT {_COLUMNS} FROM packets WHERE {where} ORDER BY id LIMIT ? OFFSET ?",
+                (*params, count, start))
+        return [self._packet(row) for row in rows]
+
+    def _packet(self, row):
+        (_, ts_ns, linktype, _, src, dst, proto, sport, dport, length, summary,
+         file_id, offset, caplen, raw) = row
+        if raw is None and file_id is not None:
+            raw = self._frame(file_id, offset, caplen)
+        if raw:
+            packet = parse_packet_lazy(raw, ts_ns, linktype)
+            packet.length = length
+            return packet
+        # Sin bytes (simulador o archivo ya no disponible): lo guardado
+        return Packet(b"", ts_ns, linktype, _BLOB_AF.get(len(src), AF_NONE),
+                      int.from_bytes(src, "big"),
+                      int.from_bytes(dst, "big"), proto, sport or 0, dport or 0, length,
+                      summary=summary, layers=[])
+
+    def _frame(self, file_id, offset, caplen):
+        pcap = self._files.get(file_id)
+        if pcap is None:
+            row = self.conn.execute("SELECT path FROM files WHERE id = ?", (file_id,)).fetchone()
+            try:
+                pcap = self._files[file_id] = PcapFile(row[0])
+            except (OSError, ValueError, TypeError):
+                return None
+        return bytes(pcap.frame(offset, caplen))
+
+    # ------------------------------
+    #   Filtros
+    # ------------------------------
+    def where(self, packet_filter):
+        """(WHERE, parámetros) equivalente al filtro, o None si no se puede en SQL."""
+        if packet_filter.ast is None or packet_filter.filters:
+            return None
+        params = []
+        sql = _sql(packet_filter.ast, params)
+        return None if sql is None else (sql, params)
+
+    def select(self, packet_filter):
+        """
+        ids (array('I'), en orden) de los paquetes que cumplen el filtro.
+        Si se puede, lo resuelve SQLite con sus índices; si no, las partes
+        traducibles de un && acotan los candidatos y el resto se comprueba
+        paquete a paquete con packet_filter.match.
+        """
+        self.flush()
+        if packet_filter.ast is None and not packet_filter.filters:
+            return array("I", range(len(self)))
+        exact = self.where(packet_filter)
+        if exact is not None:
+            sql, params = exact
+            return array("I", (r[0] for r in self.conn.execute(
+                f"SELECT id FROM packets WHERE {sql} ORDER BY id", params)))
+
+        parts = []
+        params = []
+        for node in _conjuncts(packet_filter.ast):
+            node_params = []
+            sql = _sql(node, node_params)
+            if sql is not None:
+                parts.append(sql)
+                params += node_params
+        if parts:
+            candidates = (r[0] for r in self.conn.execute(
+                f"SELECT id FROM packets WHERE {' AND '.join(parts)} ORDER BY id", params))
+        else:
+            candidates = range(len(self))
+        return array("I", (pid for pid in candidates if packet_filter.match(self[pid])))
+
+    # ------------------------------
+    #   Cierre
+    # ------------------------------
+    def close(self):
+        self.flush()
+        for pcap in self._files.values():
+            pcap.close()
+        self._files.clear()
+        self._pages.clear()
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
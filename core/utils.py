@@ -25,6 +25,12 @@ def timestamp():
     """Devuelve timestamp legible."""
     return datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
+def format_time(ts_ns):
+    """Hora local con microsegundos de un timestamp en ns (ahora si es 0)."""
+    if not ts_ns:
+        return datetime.datetime.now().strftime("%H:%M:%S")
+    return datetime.datetime.fromtimestamp(ts_ns / 1e9).strftime("%H:%M:%S.%f")
+
 def safe_decode(data):
     """
     Intenta decodificar bytes como texto sin crashear.
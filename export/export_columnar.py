@@ -0,0 +1,267 @@
+# export/export_columnar.py
+# Exportación columnar (Parquet / Arrow IPC con pyarrow, .npz con NumPy) y relectura a ColumnStore
+import os
+import zipfile
+
+from core.batch import decode_batch, needs_dissection
+from core.columns import COLUMN_NAMES, COLUMNS, ColumnStore, _numpy
+from core.field_columns import FieldColumns
+
+# Nombre de columna -> expresión de core.field_columns (solo se diseca la
+# trama si lleva protocolo de aplicación, ver core.batch.needs_dissection)
+DEFAULT_APP_FIELDS = {
+    "dns_qname": "dns.qname",
+    "http_method": "http.request.method",
+    "http_host": "http.host",
+    "http_status": "http.response.code",
+    "dhcp_type": "dhcp.type",
+}
+
+# Filas por row group (Parquet) / record batch (Arrow) / bloque (.npz)
+DEFAULT_ROW_GROUP = 65536
+
+FORMATS = {".parquet": "parquet", ".arrow": "arrow", ".feather": "arrow", ".npz": "npz"}
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:
+        return None
+    return pyarrow
+
+
+# -------------------------------------------------------------------------
+# BLOQUES DE COLUMNAS
+# -------------------------------------------------------------------------
+def _chunk_columns(packets, app, names):
+    """
+    Columnas de un bloque de paquetes: las de cabecera (core.columns.COLUMNS)
+    con decode_batch sobre las tramas concatenadas, y los campos de
+    aplicación como listas de str o None.
+    """
+    np = _numpy()
+    raws = [p.raw for p in packets]
+    lengths = np.fromiter(map(len, raws), dtype=np.int64, count=len(raws))
+    offsets = np.zeros(len(raws), dtype=np.int64)
+    np.cumsum(lengths[:-1], out=offsets[1:])
+    timestamps = np.fromiter((p.ts_ns for p in packets), dtype=np.int64, count=len(packets))
+    cols = decode_batch(b"".join(raws), offsets, lengths, timestamps)
+    cols["offset"] = np.full(len(packets), -1, dtype=np.int64)   # no vienen de un archivo
+
+    values = {name: [None] * len(packets) for name in names}
+    for i in np.flatnonzero(needs_dissection(cols)):
+        for name, value in zip(names, app(0, packets[i])):
+            if value is not None:
+                values[name][i] = str(value)
+    cols.update(values)
+    return cols
+
+
+def _chunks(packets, size):
+    chunk = []
+    for p in packets:
+        chunk.append(p)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+# -------------------------------------------------------------------------
+# ESCRITORES
+# -------------------------------------------------------------------------
+def _arrow_schema(pa, names):
+    fields = [pa.field(name, pa.binary(16) if kind == "S16" else pa.from_numpy_dtype(kind))
+              for name, kind in COLUMNS]
+    return pa.schema(fields + [pa.field(name, pa.string()) for name in names])
+
+
+def _arrow_batch(pa, schema, cols):
+    arrays = []
+    for field in schema:
+        values = cols[field.name]
+        if field.type == pa.binary(16):
+            data = _numpy().ascontiguousarray(values, dtype="S16")
+            arrays.append(pa.FixedSizeBinaryArray.from_buffers(
+                field.type, len(data), [None, pa.py_buffer(data.tobytes())]))
+        else:
+            arrays.append(pa.array(values, type=field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+class _ParquetSink:
+    def __init__(self, pa, path, names):
+        self.pa = pa
+        self.schema = _arrow_schema(pa, names)
+        self.writer = pa.parquet.ParquetWriter(path, self.schema, compression="zstd")
+
+    def write(self, cols):
+        batch = _arrow_batch(self.pa, self.schema, cols)
+        self.writer.write_table(self.pa.Table.from_batches([batch]))
+
+    def close(self):
+        self.writer.close()
+
+
+class _ArrowSink:
+    def __init__(self, pa, path, names):
+        self.pa = pa
+        self.schema = _arrow_schema(pa, names)
+        self.sink = pa.OSFile(os.fspath(path), "wb")
+        self.writer = pa.ipc.new_file(self.sink, self.schema)
+
+    def write(self, cols):
+        self.writer.write_batch(_arrow_batch(self.pa, self.schema, cols))
+
+    def close(self):
+        self.writer.close()
+        self.sink.close()
+
+
+class _NpzSink:
+    """
+    Un .npz con una entrada "<columna>/<bloque>" por bloque, escrita en
+    cuanto está lista (np.savez necesitaría todo en memoria). Los campos
+    de aplicación van como texto, con "" para los que faltan.
+    """
+
+    def __init__(self, path, names):
+        self.names = names
+        self.zip = zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED, compresslevel=1)
+        self.count = 0
+
+    def write(self, cols):
+        np = _numpy()
+        for name in COLUMN_NAMES + tuple(self.names):
+            values = cols[name]
+            if name in self.names:
+                values = np.array(["" if v is None else v for v in values], dtype=str)
+            with self.zip.open(f"{name}/{self.count:05d}.npy", "w", force_zip64=True) as f:
+                np.lib.format.write_array(f, np.asarray(values), allow_pickle=False)
+        self.count += 1
+
+    def close(self):
+        self.zip.close()
+
+
+def export_columnar(path, packets, app_fields=None, format=None, row_group=DEFAULT_ROW_GROUP):
+    """
+    Escribe cabeceras (las columnas de core.columns.COLUMNS) y campos de
+    aplicación (DEFAULT_APP_FIELDS, o un dict nombre -> expresión de
+    core.field_columns) por bloques de row_group paquetes: memoria acotada
+    aunque 'packets' sea un iterador de millones de paquetes.
+
+    format: "parquet", "arrow" (IPC) o "npz"; por defecto según la
+    extensión. Parquet y Arrow requieren pyarrow: si no está instalado se
+    escribe un .npz junto a la ruta pedida. Se relee con load_columnar().
+    """
+    try:
+        app_fields = dict(DEFAULT_APP_FIELDS if app_fields is None else app_fields)
+        names = list(app_fields)
+        app = FieldColumns(app_fields.values()).row
+        if format is None:
+            format = FORMATS.get(os.path.splitext(os.fspath(path))[1].lower(), "parquet")
+
+        pa = _pyarrow() if format != "npz" else None
+        if format == "npz" or pa is None:
+            if format != "npz":
+                path = os.path.splitext(os.fspath(path))[0] + ".npz"
+                print(f"pyarrow no está instalado: se exporta a {path}")
+            sink = _NpzSink(path, names)
+        elif format == "parquet":
+            sink = _ParquetSink(pa, path, names)
+        elif format == "arrow":
+            sink = _ArrowSink(pa, path, names)
+        else:
+            raise ValueError(f"Formato desconocido: {format}")
+
+        try:
+            for chunk in _chunks(packets, row_group):
+                sink.write(_chunk_columns(chunk, app, names))
+        finally:
+            sink.close()
+        return True
+    except Exception as e:
+        print("Error exportando columnas:", e)
+        return False
+
+
+# -------------------------------------------------------------------------
+# RELECTURA
+# -------------------------------------------------------------------------
+def _iter_arrow(pa, path, format):
+    """(columnas de cabecera, campos de aplicación) por row group / batch."""
+    if format == "parquet":
+        batches = pa.parquet.ParquetFile(path).iter_batches()
+    else:
+        reader = pa.ipc.open_file(pa.memory_map(os.fspath(path)))
+        batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+    np = _numpy()
+    for batch in batches:
+        cols = {}
+        app = {}
+        for name, array in zip(batch.schema.names, batch.columns):
+            if name in COLUMN_NAMES:
+                if pa.types.is_fixed_size_binary(array.type):
+                    cols[name] = np.frombuffer(array.buffers()[1], dtype="S16",
+                                               count=len(array), offset=array.offset * 16)
+                else:
+                    cols[name] = array.to_numpy(zero_copy_only=False)
+            else:
+                app[name] = array.to_numpy(zero_copy_only=False)
+        yield cols, app
+
+
+def _iter_npz(path):
+    np = _numpy()
+    with zipfile.ZipFile(path) as zf:
+        blocks = {}
+        for entry in zf.namelist():
+            name, block = entry.rsplit("/", 1)
+            blocks.setdefault(block, []).append((name, entry))
+        for block in sorted(blocks):
+            cols = {}
+            app = {}
+            for name, entry in blocks[block]:
+                with zf.open(entry) as f:
+                    values = np.lib.format.read_array(f, allow_pickle=False)
+                if name in COLUMN_NAMES:
+                    cols[name] = values
+                else:
+                    values = values.astype(object)
+                    values[values == ""] = None
+                    app[name] = values
+            yield cols, app
+
+
+def load_columnar(path, store=None):
+    """
+    Carga un archivo de export_columnar en un core.columns.ColumnStore
+    (bloque a bloque, sin pasar por filas Python). Los campos de
+    aplicación quedan como columnas extra (store["dns_qname"]...), arrays
+    de objetos con None donde el paquete no los tiene.
+    """
+    np = _numpy()
+    ext = os.path.splitext(os.fspath(path))[1].lower()
+    format = FORMATS.get(ext, "parquet")
+    if format == "npz":
+        blocks = _iter_npz(path)
+    else:
+        pa = _pyarrow()
+        if pa is None:
+            raise RuntimeError("pyarrow no está instalado. Instálalo con: pip install pyarrow")
+        blocks = _iter_arrow(pa, path, format)
+
+    store = store if store is not None else ColumnStore()
+    app = {}
+    for cols, extra in blocks:
+        store.append_columns(cols)
+        for name, values in extra.items():
+            app.setdefault(name, []).append(values)
+    for name, parts in app.items():
+        store.set_column(name, np.concatenate(parts))
+    return store
@@ -1,29 +1,116 @@
 # export/export_csv.py
+# Exportación a CSV / TSV en streaming con columnas por expresión
 import csv
+import io
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 
-def export_csv(path, packets):
+from core.dispatcher import parse_packet_lazy
+from core.field_columns import FieldColumns
+from export.output import detect_compression, open_output
+
+# (título, expresión): las columnas de la lista de paquetes
+DEFAULT_COLUMNS = (
+    ("#", "frame.number"),
+    ("Time", "frame.time_epoch"),
+    ("Source", "col.src"),
+    ("Destination", "col.dst"),
+    ("Protocol", "col.proto"),
+    ("Summary", "col.info"),
+)
+
+DEFAULT_CHUNK = 8192
+
+# Cada proceso worker compila las columnas una vez, al arrancar
+_worker = {}
+
+
+def _init_worker(expressions, delimiter):
+    _worker["row"] = FieldColumns(expressions).row
+    _worker["delimiter"] = delimiter
+
+
+def _format_chunk(first_number, packets, row=None, delimiter=None):
+    """Texto CSV de un bloque de paquetes (en el worker o en el propio proceso)."""
+    row = row or _worker["row"]
+    if isinstance(packets, tuple):
+        # Bloque enviado por columnas (ver _pack): se reconstruyen los Packet
+        packets = [parse_packet_lazy(raw, ts_ns, linktype)
+                   for raw, ts_ns, linktype in zip(*packets)]
+    buf = io.StringIO()
+    writer = csv.writer(buf, delimiter=delimiter or _worker["delimiter"], lineterminator="\n")
+    writer.writerows(row(n, p) for n, p in enumerate(packets, first_number))
+    return buf.getvalue()
+
+
+def _pack(chunk):
     """
-    Exporta los paquetes a CSV.
-    Usa solo columnas básicas para no complicarlo.
+    Para enviar a un worker: bytes, timestamps y linktypes (unas 7 veces
+    más barato de serializar que los Packet). Los paquetes sin bytes
+    (simulador) o con longitud distinta de la trama van enteros.
     """
-    try:
-        with open(path, "w", newline="", encoding="utf-8") as f:
-            writer = csv.writer(f)
-            writer.writerow(["#", "Time", "Source", "Destination", "Protocol", "Summary"])
+    if all(p.raw and p.length == len(p.raw) for p in chunk):
+        return ([p.raw for p in chunk], [p.ts_ns for p in chunk], [p.linktype for p in chunk])
+    return chunk
+
+
+def _chunks(packets, chunk_size):
+    chunk = []
+    number = 1
+    for p in packets:
+        chunk.append(p)
+        if len(chunk) >= chunk_size:
+            yield number, chunk
+            number += len(chunk)
+            chunk = []
+    if chunk:
+        yield number, chunk
 
-            for i, p in enumerate(packets, 1):
-                layers = p.get("layers", [])
-                l3 = next((l for l in layers if l["layer"] in ("IPv4", "IPv6")), None)
-                l4 = next((l for l in layers if l["layer"] in ("TCP", "UDP", "ICMP")), None)
 
-                src = l3["fields"].get("src", "") if l3 else ""
-                dst = l3["fields"].get("dst", "") if l3 else ""
-                proto = l4["layer"] if l4 else layers[-1]["layer"]
-                summary = p.get("summary", "")
-                timestamp = p.get("_pcap_ts", "")
+def export_csv(path, packets, columns=None, delimiter=None, compression="auto", workers=1,
+               chunk_size=DEFAULT_CHUNK):
+    """
+    Escribe los paquetes por bloques de chunk_size: memoria constante
+    aunque 'packets' sea un iterador de millones de paquetes.
+
+    - columns: expresiones de core.field_columns ("ip.src", "tcp.dport",
+      "dns.qname", "frame.len"...) o pares (título, expresión); la
+      cabecera usa el título o la propia expresión. Por defecto las
+      columnas de la lista de paquetes (DEFAULT_COLUMNS)
+    - delimiter: por defecto tabulador si la ruta acaba en .tsv, si no coma
+    - compression: "auto" (por la extensión .gz / .zst), None, "gzip", "zstd"
+    - workers > 1 formatea los bloques en procesos aparte (capturas grandes);
+      el orden de las filas se mantiene y hay como mucho 2 bloques en
+      vuelo por worker
+    """
+    try:
+        columns = [c if isinstance(c, tuple) else (c, c) for c in (columns or DEFAULT_COLUMNS)]
+        expressions = [expr for _, expr in columns]
+        row = FieldColumns(expressions).row     # valida las expresiones antes de abrir
+        if delimiter is None:
+            tsv = detect_compression(path)[0].lower().endswith(".tsv")
+            delimiter = "\t" if tsv else ","
 
-                writer.writerow([i, timestamp, src, dst, proto, summary])
+        with open_output(path, compression) as raw:
+            f = io.TextIOWrapper(raw, encoding="utf-8", newline="")
+            csv.writer(f, delimiter=delimiter, lineterminator="\n").writerow(
+                [title for title, _ in columns])
 
+            if workers <= 1:
+                for number, chunk in _chunks(packets, chunk_size):
+                    f.write(_format_chunk(number, chunk, row, delimiter))
+            else:
+                with ProcessPoolExecutor(workers, initializer=_init_worker,
+                                         initargs=(expressions, delimiter)) as pool:
+                    pending = deque()
+                    for number, chunk in _chunks(packets, chunk_size):
+                        pending.append(pool.submit(_format_chunk, number, _pack(chunk)))
+                        if len(pending) >= workers * 2:
+                            f.write(pending.popleft().result())
+                    while pending:
+                        f.write(pending.popleft().result())
+            f.flush()
+            f.detach()
         return True
     except Exception as e:
         print("Error exportando CSV:", e)
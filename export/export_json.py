@@ -1,14 +1,96 @@
 # export/export_json.py
+# Exportación a JSON por líneas (NDJSON) o array compacto, en streaming
+import base64
 import json
 
-def export_json(path, packets):
+from export.output import detect_compression, open_output
+
+try:
+    import orjson
+except ImportError:     # opcional: mismo resultado con json, más lento
+    orjson = None
+
+# Campos disponibles: nombre -> función (número de fila, paquete) -> valor
+FIELDS = {
+    "number": lambda i, p: i,
+    "time": lambda i, p: p.timestamp,
+    "ts_ns": lambda i, p: p.ts_ns,
+    "src": lambda i, p: p.src_str,
+    "dst": lambda i, p: p.dst_str,
+    "proto": lambda i, p: p.proto,
+    "sport": lambda i, p: p.sport,
+    "dport": lambda i, p: p.dport,
+    "length": lambda i, p: p.length,
+    "linktype": lambda i, p: p.linktype,
+    "summary": lambda i, p: p.summary,
+    # Diseca el paquete completo: bastante más lento que el resto
+    "layers": lambda i, p: p.layers,
+}
+
+DEFAULT_FIELDS = ("number", "time", "src", "dst", "proto", "length", "summary")
+
+RAW_ENCODINGS = {
+    "hex": bytes.hex,
+    "base64": lambda b: base64.b64encode(b).decode("ascii"),
+}
+
+# Líneas que se juntan antes de cada write()
+_CHUNK = 4096
+
+
+def _dumps():
+    if orjson is not None:
+        return orjson.dumps
+    encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+    return lambda obj: encoder.encode(obj).encode("utf-8")
+
+
+def export_json(path, packets, fields=None, raw=None, lines=None, compression="auto"):
     """
-    Exporta la lista completa de 'packets' (dicts ya parseados)
-    a un archivo JSON.
+    Escribe los paquetes de uno en uno, sin construir la lista ni el texto
+    completo: memoria constante y tiempo lineal.
+
+    - fields: nombres de FIELDS a incluir (por defecto DEFAULT_FIELDS)
+    - raw: None, "hex" o "base64" para añadir la trama en el campo "raw"
+    - lines: True -> un objeto por línea (NDJSON); False -> array JSON
+      compacto. Por defecto NDJSON salvo que la ruta acabe en .json
+    - compression: "auto" (por la extensión .gz / .zst), None, "gzip", "zstd"
+
+    Usa orjson si está instalado.
     """
     try:
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump(packets, f, indent=4)
+        names = tuple(fields or DEFAULT_FIELDS)
+        getters = [FIELDS[name] for name in names]
+        encode_raw = RAW_ENCODINGS[raw] if raw is not None else None
+        if lines is None:
+            lines = not detect_compression(path)[0].lower().endswith(".json")
+        dumps = _dumps()
+
+        with open_output(path, compression) as f:
+            if lines:
+                def write(chunk):
+                    f.write(b"\n".join(chunk) + b"\n")
+            else:
+                f.write(b"[\n")
+                sep = [b""]     # sin coma delante del primer bloque
+
+                def write(chunk):
+                    f.write(sep[0] + b",\n".join(chunk))
+                    sep[0] = b",\n"
+
+            chunk = []
+            for i, p in enumerate(packets, 1):
+                row = {name: get(i, p) for name, get in zip(names, getters)}
+                if encode_raw is not None:
+                    row["raw"] = encode_raw(p.raw)
+                chunk.append(dumps(row))
+                if len(chunk) >= _CHUNK:
+                    write(chunk)
+                    chunk.clear()
+            if chunk:
+                write(chunk)
+            if not lines:
+                f.write(b"\n]\n")
         return True
     except Exception as e:
         print("Error exportando JSON:", e)
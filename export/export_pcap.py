@@ -1,26 +1,45 @@
 # export/export_pcap.py
-from scapy.all import wrpcap, Raw
+# Exportación nativa a pcap / pcapng (sin scapy), en streaming
+from capture.pcap_writer import PcapngWriter, PcapWriter
 
-def export_pcap(path, packets):
+
+def export_pcap(path, packets, pcapng=None):
     """
-    Exporta los bytes crudos de cada paquete a un archivo PCAP.
-    Solo funciona si parsed["raw"] contiene bytes reales.
+    Escribe los bytes originales de cada paquete con su timestamp, su
+    longitud original y su linktype. 'packets' puede ser cualquier
+    iterable (también un generador): se escribe a medida que se recorre,
+    con memoria constante aunque sean millones de paquetes.
+
+    Formato: pcapng si pcapng=True o la ruta acaba en .pcapng, si no pcap
+    clásico (con el linktype del primer paquete; los de otro linktype se
+    omiten y se avisa). Los paquetes sin bytes (simulador) se omiten.
     """
+    if pcapng is None:
+        pcapng = str(path).lower().endswith(".pcapng")
+    writer = None
+    skipped = 0
     try:
-        raw_list = []
-
         for p in packets:
-            raw = p.get("raw", None)
-            if raw:
-                raw_list.append(Raw(raw))
+            raw = p.raw
+            if not raw:
+                continue
+            if writer is None:
+                writer = (PcapngWriter if pcapng else PcapWriter)(path, p.linktype)
+            elif not pcapng and p.linktype != writer.linktype:
+                skipped += 1
+                continue
+            writer.write(raw, p.ts_ns, p.length, p.linktype)
 
-        if raw_list:
-            wrpcap(path, raw_list)
-            return True
-        else:
+        if writer is None:
             print("No hay paquetes RAW para exportar.")
             return False
+        if skipped:
+            print(f"{skipped} paquetes con otro linktype omitidos (usar .pcapng para incluirlos).")
+        return True
 
     except Exception as e:
         print("Error exportando PCAP:", e)
         return False
+    finally:
+        if writer is not None:
+            writer.close()
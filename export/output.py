@@ -0,0 +1,45 @@
+# export/output.py
+# Archivos de salida de las exportaciones, con compresión al vuelo opcional
+import gzip
+import os
+
+# Extensión -> compresión que se elige con compression="auto"
+COMPRESSIONS = {".gz": "gzip", ".zst": "zstd"}
+
+GZIP_LEVEL = 6      # el 9 de gzip por defecto es varias veces más lento
+ZSTD_LEVEL = 3
+BUFFER_SIZE = 1024 * 1024
+
+
+def detect_compression(path):
+    """(ruta sin la extensión de compresión, compresión o None)."""
+    path = os.fspath(path)
+    root, ext = os.path.splitext(path)
+    compression = COMPRESSIONS.get(ext.lower())
+    return (root, compression) if compression else (path, None)
+
+
+def open_output(path, compression="auto", level=None):
+    """
+    Abre 'path' para escribir bytes. compression: "auto" (según la
+    extensión .gz / .zst), None, "gzip" o "zstd". La compresión se hace
+    por bloques a medida que se escribe, sin acumular la salida en memoria.
+    zstd requiere el paquete zstandard.
+    """
+    if compression == "auto":
+        compression = detect_compression(path)[1]
+    if compression is None:
+        return open(path, "wb", buffering=BUFFER_SIZE)
+    if compression == "gzip":
+        return gzip.open(path, "wb", compresslevel=GZIP_LEVEL if level is None else level)
+    if compression == "zstd":
+        try:
+            import zstandard
+        except ImportError as e:
+            raise RuntimeError(
+                "zstandard no está instalado. Instálalo con: pip install zstandard"
+            ) from e
+        raw = open(path, "wb", buffering=BUFFER_SIZE)
+        cctx = zstandard.ZstdCompressor(level=ZSTD_LEVEL if level is None else level)
+        return cctx.stream_writer(raw)
+    raise ValueError(f"Compresión desconocida: {compression}")
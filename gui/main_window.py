@@ -1,21 +1,40 @@
 # gui/main_window.py
 from PyQt6.QtWidgets import (
-    QMainWindow, QWidget, QHBoxLayout, QFileDialog, QMessageBox, QInputDialog
+    QMainWindow, QWidget, QHBoxLayout, QVBoxLayout, QFileDialog, QMessageBox, QInputDialog,
+    QLineEdit, QLabel, QProgressBar, QPushButton
 )
 from PyQt6.QtGui import QAction
 from PyQt6.QtCore import QTimer
+import os
+import re
+import sqlite3
 import threading
+import time
 
 from gui.packet_list import PacketList
 from gui.packet_details import PacketDetails
+from gui.pcap_loader import PcapLoader
 from capture.simulator import PacketSimulator
-from capture import pcap_reader
+from core.cidr import load_prefix_set
+from core.display_filter import FilterError
+from core.packet import AF_INET, Packet, addr_to_int
+from core.session_db import SessionDB
+from capture import afpacket
 from capture.live_capture import start_live_capture
+from capture.packet_queue import PacketQueue
+from capture.pipeline import CapturePipeline
 
+from export.export_columnar import export_columnar
 from export.export_csv import export_csv
 from export.export_json import export_json
 from export.export_pcap import export_pcap
 
+# Refresco de la lista durante la captura (~30 por segundo) y máximo de
+# paquetes por refresco, para que cada uno quepa en un fotograma
+DRAIN_INTERVAL_MS = 33
+DRAIN_MAX_BATCH = 5000
+
+
 class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
@@ -24,6 +43,15 @@ class MainWindow(QMainWindow):
         self.resize(1100, 650)
         # ------ REAL ------
         self.real_capture_active = False
+        # El hilo de captura solo encola; la GUI vacía la cola por lotes a
+        # ritmo de refresco de pantalla (nunca se toca Qt desde el hilo)
+        self.live_queue = PacketQueue()
+        self.pipeline = None
+        self.drain_timer = QTimer()
+        self.drain_timer.timeout.connect(self.drain_live_queue)
+
+        # ------ PCAP ------
+        self.pcap_loader = None
 
         # ------ SIMULADOR ------
         self.simulator = PacketSimulator()
@@ -42,12 +70,35 @@ class MainWindow(QMainWindow):
 
         self.packet_details = PacketDetails()
 
-        layout.addWidget(self.packet_list, 3)
+        # Barra de filtro (expresión estilo Wireshark) sobre la lista
+        self.filter_bar = QLineEdit()
+        self.filter_bar.setPlaceholderText("Filtro: ip.src == 10.0.0.0/8 && tcp.port == 443")
+        self.filter_bar.returnPressed.connect(self.apply_display_filter)
+
+        left = QVBoxLayout()
+        left.addWidget(self.filter_bar)
+        left.addWidget(self.packet_list)
+
+        layout.addLayout(left, 3)
         layout.addWidget(self.packet_details, 2)
 
         container.setLayout(layout)
         self.setCentralWidget(container)
 
+        # Contadores de la cola de captura
+        self.queue_label = QLabel()
+        self.statusBar().addPermanentWidget(self.queue_label)
+
+        # Progreso de la carga de PCAP (solo visible mientras carga)
+        self.load_progress = QProgressBar()
+        self.load_progress.setRange(0, 1000)
+        self.load_progress.setMaximumWidth(220)
+        self.load_cancel = QPushButton("Cancelar")
+        self.load_cancel.clicked.connect(self.cancel_pcap_load)
+        for widget in (self.load_progress, self.load_cancel):
+            widget.hide()
+            self.statusBar().addPermanentWidget(widget)
+
     # ==========================================================
     # MENÚ
     # ==========================================================
@@ -74,15 +125,19 @@ class MainWindow(QMainWindow):
         capture_menu.addAction(real_stop)
 
         # ---- MENÚ ARCHIVO ----
-        #file_menu = menu_bar.addMenu("Archivo")
+        file_menu = menu_bar.addMenu("Archivo")
 
         open_pcap = QAction("Abrir archivo PCAP…", self)
         open_pcap.triggered.connect(self.open_pcap)
-        #file_menu.addAction(open_pcap)
+        file_menu.addAction(open_pcap)
+
+        open_session = QAction("Abrir/crear sesión (SQLite)…", self)
+        open_session.triggered.connect(self.open_session)
+        file_menu.addAction(open_session)
 
         exit_action = QAction("Salir", self)
         exit_action.triggered.connect(self.close)
-        #file_menu.addAction(exit_action)
+        file_menu.addAction(exit_action)
 
         # ---- MENÚ VISTA ----
         #view_menu = menu_bar.addMenu("Vista")
@@ -105,6 +160,17 @@ class MainWindow(QMainWindow):
         export_pcap_action.triggered.connect(self.export_as_pcap)
         #export_menu.addAction(export_pcap_action)
 
+        export_columnar_action = QAction("Exportar columnas (Parquet / Arrow)", self)
+        export_columnar_action.triggered.connect(self.export_as_columnar)
+        #export_menu.addAction(export_columnar_action)
+
+        # ---- MENÚ FILTROS ----
+        filter_menu = menu_bar.addMenu("Filtros")
+
+        load_prefixes = QAction("Cargar lista de prefijos (CSV)…", self)
+        load_prefixes.triggered.connect(self.load_prefix_list)
+        filter_menu.addAction(load_prefixes)
+
     # ==========================================================
     # CAPTURA SIMULADA
     # ==========================================================
@@ -116,24 +182,20 @@ class MainWindow(QMainWindow):
     def generate_simulated_payload(self):
         pkt = self.simulator.generate_packet()
 
-        parsed = {
-            "timestamp": pkt["time"],
-            "src": pkt["src"],
-            "dst": pkt["dst"],
-            "proto": pkt["proto"],
-            "summary": pkt.get("info", ""),
-
-            # Para mostrar capas en PacketDetails
-            "layers": [
-                {"layer": "Simulated", "fields": pkt}
-            ],
-
+        parsed = Packet(
             # Simulador no usa bytes reales → raw vacío
-            "raw": b"",
-
+            b"",
+            time.time_ns(),
+            af=AF_INET,
+            src=addr_to_int(pkt["src"])[1],
+            dst=addr_to_int(pkt["dst"])[1],
+            proto=pkt["proto"],
             # Tamaño reportado por el simulador
-            "length": pkt["size"]
-        }
+            length=pkt["size"],
+            summary=pkt.get("info", ""),
+            # Para mostrar capas en PacketDetails
+            layers=[{"layer": "Simulated", "fields": pkt}],
+        )
 
         self.packet_list.add_parsed_packet(parsed)
 
@@ -162,21 +224,37 @@ class MainWindow(QMainWindow):
 
         # Activamos la bandera
         self.real_capture_active = True
+        self.live_queue.reset_stats()
+        self.drain_timer.start(DRAIN_INTERVAL_MS)
+
+        # Hilo de captura: solo encola la trama cruda (si la cola está llena
+        # se descarta); la disección va en los hilos del pipeline y el
+        # resultado llega a live_queue
+        pipeline = CapturePipeline()
+        pipeline.add_sink("gui", self.live_queue)
+        self.pipeline = pipeline.start()
 
-        def on_real_packet(parsed):
-            # Solo añadir si seguimos activos
+        def on_raw(raw, ts_ns, linktype, origlen):
             if self.real_capture_active:
-                self.packet_list.add_parsed_packet(parsed)
+                pipeline.put(raw, ts_ns, linktype)
 
         # Esta función lambda le dirá a scapy cuándo detenerse
         # Scapy se detendrá cuando 'stop_check' devuelva True
         stop_check = lambda: not self.real_capture_active
 
+        def run_capture():
+            try:
+                if afpacket.available():
+                    # Linux: cada bloque del anillo entra al pipeline de una vez
+                    afpacket.capture_afpacket(iface.strip(), pipeline.put_many, stop_check)
+                else:
+                    start_live_capture(iface.strip(), None, stop_check, on_raw=on_raw,
+                                       backend="scapy")
+            finally:
+                pipeline.stop()
+
         # Lanzar scapy sniff en thread
-        t = threading.Thread(
-            target=start_live_capture,
-            args=(iface.strip(), on_real_packet, stop_check)
-        )
+        t = threading.Thread(target=run_capture)
         t.daemon = True
         t.start()
 
@@ -186,6 +264,25 @@ class MainWindow(QMainWindow):
             f"Captura REAL iniciada en {iface}.\nPara detener, usa el menú Captura -> Detener captura REAL."
         )
 
+    def drain_live_queue(self):
+        """Temporizador de la GUI: pasa lo encolado a la lista en un solo lote."""
+        batch = self.live_queue.drain(DRAIN_MAX_BATCH)
+        if batch:
+            self.packet_list.add_parsed_packets(batch)
+        stats = self.live_queue.stats()
+        dropped = stats["dropped"]
+        if self.pipeline is not None:
+            parse = self.pipeline.parse.stats()
+            dropped += parse["dropped"] + parse["lost"]
+        self.queue_label.setText(
+            f"Cola: {stats['queued']:,}  Recibidos: {stats['received']:,}  "
+            f"Descartados: {dropped:,}  Lista: {len(self.packet_list.packets):,}"
+        )
+        # Tras detener la captura se sigue vaciando hasta que no quede nada
+        if not self.real_capture_active and not stats["queued"] and \
+                (self.pipeline is None or not self.pipeline.running):
+            self.drain_timer.stop()
+
     def stop_real_capture(self):
         if not self.real_capture_active:
             QMessageBox.information(self, "Aviso", "No hay ninguna captura real en curso.")
@@ -207,16 +304,81 @@ class MainWindow(QMainWindow):
         )
         if not fname:
             return
+        if self.pcap_loader is not None:
+            QMessageBox.warning(self, "Aviso", "Ya se está cargando un archivo.")
+            return
 
+        # La lectura va en un hilo aparte; los paquetes llegan por lotes y
+        # se muestran mientras se sigue leyendo
+        loader = PcapLoader(fname, parent=self)
+        loader.batch_ready.connect(self.pcap_load_batch)
+        loader.progress.connect(self.pcap_load_progress)
+        loader.failed.connect(lambda msg: QMessageBox.critical(self, "Error", msg))
+        loader.done.connect(self.pcap_load_done)
+        loader.finished.connect(self.pcap_load_finished)
+        self.pcap_loader = loader
+
+        self.load_progress.setValue(0)
+        self.load_progress.show()
+        self.load_cancel.show()
+        self.statusBar().showMessage(f"Cargando {os.path.basename(fname)}…")
+        loader.start()
+
+    def open_session(self):
+        """
+        Pasa la lista a una sesión SQLite (core.session_db): lo que se
+        capture o cargue se guarda en ella y se puede reabrir más tarde.
+        """
+        path, _ = QFileDialog.getSaveFileName(
+            self, "Sesión SQLite", "", "Sesión (*.db *.sqlite)",
+            options=QFileDialog.Option.DontConfirmOverwrite)
+        if not path:
+            return
+        if self.pcap_loader is not None or self.real_capture_active:
+            QMessageBox.warning(self, "Aviso", "Detén la captura o la carga antes de cambiar de sesión.")
+            return
         try:
-            def on_pkt(parsed):
-                self.packet_list.add_parsed_packet(parsed)
-
-            pcap_reader.read_pcap(fname, on_pkt)
-            QMessageBox.information(self, "PCAP", f"Lectura finalizada: {fname}")
-
-        except Exception as e:
-            QMessageBox.critical(self, "Error", str(e))
+            session = SessionDB(path)
+        except sqlite3.Error as e:
+            QMessageBox.critical(self, "Error", f"No se pudo abrir la sesión: {e}")
+            return
+        old = self.packet_list.packets
+        self.packet_list.set_store(session)
+        old.close()
+        self.filter_bar.clear()
+        self.statusBar().showMessage(f"Sesión {os.path.basename(path)}: {len(session):,} paquetes")
+
+    def closeEvent(self, event):
+        # No se puede destruir un QThread en marcha
+        if self.pcap_loader is not None:
+            self.pcap_loader.cancel()
+            self.pcap_loader.wait()
+        # Borra los segmentos temporales de la retención
+        self.packet_list.packets.close()
+        super().closeEvent(event)
+
+    def pcap_load_batch(self, batch):
+        self.packet_list.add_parsed_packets(batch)
+        # Hasta confirmar el lote el hilo de lectura no emite más
+        if self.pcap_loader is not None:
+            self.pcap_loader.batch_done()
+
+    def pcap_load_progress(self, read, total):
+        self.load_progress.setValue(read * 1000 // total if total else 1000)
+
+    def cancel_pcap_load(self):
+        if self.pcap_loader is not None:
+            self.pcap_loader.cancel()
+
+    def pcap_load_done(self, count, cancelled):
+        state = "cancelada" if cancelled else "finalizada"
+        self.statusBar().showMessage(f"Lectura {state}: {count:,} paquetes")
+
+    def pcap_load_finished(self):
+        self.load_progress.hide()
+        self.load_cancel.hide()
+        self.pcap_loader.deleteLater()
+        self.pcap_loader = None
 
     # ==========================================================
     # INTERFAZ
@@ -224,6 +386,34 @@ class MainWindow(QMainWindow):
     def show_stats(self):
         QMessageBox.information(self, "Estadísticas", "Por implementar.")
 
+    def apply_display_filter(self):
+        try:
+            shown = self.packet_list.apply_filter(self.filter_bar.text())
+        except FilterError as e:
+            self.filter_bar.setStyleSheet("background-color: #ffd6d6;")
+            self.statusBar().showMessage(f"Filtro no válido: {e}")
+            return
+        self.filter_bar.setStyleSheet("")
+        total = len(self.packet_list.packets)
+        self.statusBar().showMessage(f"Mostrando {shown} de {total} paquetes")
+
+    def load_prefix_list(self):
+        """
+        CSV "prefijo,etiqueta": se registra como @<nombre del fichero> para
+        los filtros (ip.addr in @nombre) y etiqueta las filas de la lista.
+        """
+        path, _ = QFileDialog.getOpenFileName(self, "Lista de prefijos", "", "CSV (*.csv *.txt)")
+        if not path:
+            return
+        name = re.sub(r"\W", "_", os.path.splitext(os.path.basename(path))[0]).lower()
+        try:
+            table = load_prefix_set(name, path)
+        except (OSError, ValueError) as e:
+            QMessageBox.critical(self, "Error", str(e))
+            return
+        self.packet_list.set_prefix_table(table)
+        self.statusBar().showMessage(f"Lista @{name} cargada: {len(table)} prefijos")
+
     def show_parsed_packet(self, parsed):
         self.packet_details.show_packet(parsed)
 
@@ -231,12 +421,13 @@ class MainWindow(QMainWindow):
     # EXPORTAR JSON
     # ==========================
     def export_as_json(self):
-        path, _ = QFileDialog.getSaveFileName(self, "Exportar JSON", "", "JSON (*.json)")
+        path, _ = QFileDialog.getSaveFileName(
+            self, "Exportar JSON", "",
+            "JSON (*.json);;NDJSON (*.ndjson *.jsonl);;NDJSON gzip (*.ndjson.gz)")
         if not path:
             return
 
-        packets = self.packet_list.get_all_packets()
-        ok = export_json(path, packets)
+        ok = export_json(path, self.packet_list.iter_packets())
 
         if ok:
             QMessageBox.information(self, "Exportación", "Exportado correctamente a JSON.")
@@ -248,12 +439,12 @@ class MainWindow(QMainWindow):
     # EXPORTAR CSV
     # ==========================
     def export_as_csv(self):
-        path, _ = QFileDialog.getSaveFileName(self, "Exportar CSV", "", "CSV (*.csv)")
+        path, _ = QFileDialog.getSaveFileName(self, "Exportar CSV", "",
+                                              "CSV (*.csv);;TSV (*.tsv);;CSV gzip (*.csv.gz)")
         if not path:
             return
 
-        packets = self.packet_list.get_all_packets()
-        ok = export_csv(path, packets)
+        ok = export_csv(path, self.packet_list.iter_packets())
 
         if ok:
             QMessageBox.information(self, "Exportación", "Exportado correctamente a CSV.")
@@ -265,14 +456,33 @@ class MainWindow(QMainWindow):
     # EXPORTAR PCAP
     # ==========================
     def export_as_pcap(self):
-        path, _ = QFileDialog.getSaveFileName(self, "Exportar PCAP", "", "PCAP (*.pcap)")
+        path, selected = QFileDialog.getSaveFileName(self, "Exportar PCAP", "",
+                                                      "PCAP (*.pcap);;PCAPNG (*.pcapng)")
         if not path:
             return
 
-        packets = self.packet_list.get_all_packets()
-        ok = export_pcap(path, packets)
+        ok = export_pcap(path, self.packet_list.iter_packets(),
+                         pcapng=path.lower().endswith(".pcapng") or selected.startswith("PCAPNG"))
 
         if ok:
             QMessageBox.information(self, "Exportación", "Exportado correctamente a PCAP.")
         else:
             QMessageBox.critical(self, "Error", "No se pudo exportar a PCAP.")
+
+
+    # ==========================
+    # EXPORTAR COLUMNAS
+    # ==========================
+    def export_as_columnar(self):
+        path, _ = QFileDialog.getSaveFileName(
+            self, "Exportar columnas", "",
+            "Parquet (*.parquet);;Arrow IPC (*.arrow);;NumPy (*.npz)")
+        if not path:
+            return
+
+        ok = export_columnar(path, self.packet_list.iter_packets())
+
+        if ok:
+            QMessageBox.information(self, "Exportación", "Exportado correctamente.")
+        else:
+            QMessageBox.critical(self, "Error", "No se pudo exportar las columnas.")
@@ -19,18 +19,21 @@ class PacketDetails(QWidget):
         layout.addWidget(self.table)
         self.setLayout(layout)
 
-    def show_packet(self, packet_dict):
+    def show_packet(self, packet):
         """
         Muestra los detalles del paquete desglosados por capas.
+        Las capas de un Packet se disecan aquí (y se cachean) si aún no lo estaban.
         """
         self.table.setRowCount(0)
 
+        layers = packet.get("layers") if isinstance(packet, dict) else packet.layers
+
         # Si no hay capas, no hacemos nada
-        if "layers" not in packet_dict:
+        if not layers:
             return
 
         # Recorremos cada capa (Ethernet -> IP -> TCP...)
-        for layer_data in packet_dict["layers"]:
+        for layer_data in layers:
             layer_name = layer_data.get("layer", "Unknown Layer")
             fields = layer_data.get("fields", {})
 
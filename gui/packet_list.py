@@ -1,74 +1,272 @@
 # gui/packet_list.py
-from PyQt6.QtWidgets import QTableWidget, QTableWidgetItem
-from PyQt6.QtCore import pyqtSignal, Qt
-
-class PacketList(QTableWidget):
-    packet_selected = pyqtSignal(dict)
-
-    def __init__(self):
-        super().__init__(0, 7)
-        self.setHorizontalHeaderLabels(
-            ["#", "Time", "Source", "Destination", "Protocol", "Length", "Summary"]
-        )
-        self.cellClicked.connect(self.row_clicked)
-
-    # En gui/packet_list.py
-
-    def add_parsed_packet(self, parsed):
-        row = self.rowCount()
-        self.insertRow(row)
-        num = row + 1
-
-        # 1. TIEMPO (Timestamp)
-        # Si no viene en el paquete, ponemos la hora actual del sistema aquí mismo
-        import datetime
-        ts = parsed.get("timestamp") or parsed.get("time") or parsed.get("_pcap_ts")
-        if not ts:
-            ts = datetime.datetime.now().strftime("%H:%M:%S")
-
-        # 2. FUENTE Y DESTINO
-        src = "Desconocido"
-        dst = "Desconocido"
-        
-        # Buscamos en todas las capas
-        for layer in parsed["layers"]:
-            f = layer.get("fields", {})
-            # Buscamos cualquier llave que parezca una IP o MAC
-            # Prioridad: Source > src > Sender IP > src_mac
-            s = f.get("Source") or f.get("src") or f.get("Sender IP") or f.get("Source IPv6")
-            d = f.get("Destination") or f.get("dst") or f.get("Target IP") or f.get("Destination IPv6")
-            
-            if s: src = s
-            if d: dst = d
-            
-        # Si seguimos en "Desconocido", intentamos Ethernet (MAC)
-        if src == "Desconocido" and len(parsed["layers"]) > 0:
-            eth = parsed["layers"][0]["fields"]
-            src = eth.get("src_mac", src)
-            dst = eth.get("dst_mac", dst)
-
-        # 3. PROTOCOLO
-        l4 = next((l for l in parsed["layers"] if l["layer"] in ("TCP","UDP","ICMP", "ICMPv6")), None)
-        proto = l4["layer"] if l4 else parsed["layers"][-1]["layer"]
-
-        # 4. LONGITUD
-        length = len(parsed.get("raw", b"")) or parsed["layers"][0]["fields"].get("size", 0)
-
-        # 5. RESUMEN
-        summary = parsed.get("summary", "")
-
-        # Insertar en la tabla
-        self.setItem(row, 0, QTableWidgetItem(str(num)))
-        self.setItem(row, 1, QTableWidgetItem(str(ts)))
-        self.setItem(row, 2, QTableWidgetItem(str(src)))
-        self.setItem(row, 3, QTableWidgetItem(str(dst)))
-        self.setItem(row, 4, QTableWidgetItem(str(proto)))
-        self.setItem(row, 5, QTableWidgetItem(str(length)))
-        self.setItem(row, 6, QTableWidgetItem(str(summary)))
-
-        self.item(row,0).setData(Qt.ItemDataRole.UserRole, parsed)
-
-    def row_clicked(self, row, col):
-        parsed = self.item(row,0).data(Qt.ItemDataRole.UserRole)
-        if parsed:
-            self.packet_selected.emit(parsed)
\ No newline at end of file
+from array import array
+
+from PyQt6.QtWidgets import QAbstractItemView, QHeaderView, QTableView
+from PyQt6.QtCore import QAbstractTableModel, QModelIndex, Qt, pyqtSignal
+
+from core.filters import PacketFilter
+from core.inverted_index import POSTINGS_OVERHEAD, InvertedIndex
+from core.packet import Packet
+from core.retention import PACKET_OVERHEAD, RetentionStore
+from core.session_db import SessionDB
+from core.utils import format_time
+
+HEADERS = ["#", "Time", "Source", "Destination", "Protocol", "Length", "Summary", "Subnet"]
+LABEL_COLUMN = 7
+
+_DISPLAY = Qt.ItemDataRole.DisplayRole
+_ALIGN = Qt.ItemDataRole.TextAlignmentRole
+_RIGHT = Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter
+
+
+class PacketTableModel(QAbstractTableModel):
+    """
+    Modelo virtual sobre la lista de paquetes capturados.
+
+    No hay objetos por celda: data() formatea la celda cuando la vista la
+    pide, y la vista solo pide las filas visibles. Con un filtro activo
+    'rows' es un array('I') con los ids de paquete que se muestran (fila
+    -> id); sin filtro la fila es directamente el id.
+    """
+
+    def __init__(self, packets=None, parent=None):
+        super().__init__(parent)
+        self.packets = packets if packets is not None else []
+        self.rows = None
+        self.prefix_table = None
+
+    # ------------------------------
+    #   Interfaz de QAbstractTableModel
+    # ------------------------------
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.packets) if self.rows is None else len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(HEADERS)
+
+    def headerData(self, section, orientation, role=_DISPLAY):
+        if role == _DISPLAY and orientation == Qt.Orientation.Horizontal:
+            return HEADERS[section]
+        return None
+
+    def data(self, index, role=_DISPLAY):
+        if role == _DISPLAY:
+            pid = self.packet_id(index.row())
+            return self.cell(pid, self.packets[pid], index.column())
+        if role == _ALIGN and index.column() in (0, 5):
+            return _RIGHT
+        return None
+
+    def cell(self, pid, packet, column):
+        """Texto de una celda. Las columnas salen del registro compacto: no se disecan las capas."""
+        if column == 0:
+            return str(pid + 1)
+        if column == 1:
+            return format_time(packet.ts_ns)
+        if column == 2:
+            return packet.src_str
+        if column == 3:
+            return packet.dst_str
+        if column == 4:
+            return packet.proto
+        if column == 5:
+            return str(packet.length)
+        if column == 6:
+            return packet.summary
+        if self.prefix_table is not None:
+            return self.prefix_label(packet)
+        return ""
+
+    # ------------------------------
+    #   API
+    # ------------------------------
+    def packet_id(self, row):
+        return row if self.rows is None else self.rows[row]
+
+    def packet_at(self, row):
+        return self.packets[self.packet_id(row)]
+
+    def append(self, packet, visible=True):
+        """Añade un paquete al final; si no es visible (filtro) no crea fila."""
+        self.extend([packet], None if visible else [False])
+
+    def extend(self, packets, visible=None):
+        """
+        Añade un lote de paquetes con una sola inserción de filas
+        (un beginInsertRows/endInsertRows para todo el lote).
+        visible: lista de booleanos paralela a packets (None = todos).
+        """
+        if not packets:
+            return
+        first_id = len(self.packets)
+        if self.rows is None and visible is None:
+            row = len(self.packets)
+            self.beginInsertRows(QModelIndex(), row, row + len(packets) - 1)
+            self.packets.extend(packets)
+            self.endInsertRows()
+            return
+
+        if self.rows is None:
+            # Aún no había filtro de filas: las actuales son todas visibles
+            self.rows = array("I", range(first_id))
+        if visible is None:
+            ids = range(first_id, first_id + len(packets))
+        else:
+            ids = [first_id + i for i, shown in enumerate(visible) if shown]
+        # Sin fila nueva no cambia rowCount: se puede añadir fuera del begin/end
+        self.packets.extend(packets)
+        if ids:
+            row = len(self.rows)
+            self.beginInsertRows(QModelIndex(), row, row + len(ids) - 1)
+            self.rows.extend(ids)
+            self.endInsertRows()
+
+    def set_rows(self, rows):
+        """Ids de los paquetes a mostrar (None = todos)."""
+        self.beginResetModel()
+        self.rows = None if rows is None else array("I", rows)
+        self.endResetModel()
+
+    def set_prefix_table(self, table):
+        self.prefix_table = table
+        if self.rowCount():
+            self.dataChanged.emit(self.index(0, LABEL_COLUMN),
+                                  self.index(self.rowCount() - 1, LABEL_COLUMN))
+
+    def prefix_label(self, packet):
+        """Texto "origen → destino" con las etiquetas que se encuentren."""
+        lookup = self.prefix_table.lookup
+        src = lookup(packet.af, packet.src)
+        dst = lookup(packet.af, packet.dst)
+        if src is not None and dst is not None:
+            return f"{src} → {dst}"
+        return src or dst or ""
+
+
+class PacketList(QTableView):
+    packet_selected = pyqtSignal(object)
+
+    LABEL_COLUMN = LABEL_COLUMN
+
+    def __init__(self, store=None):
+        super().__init__()
+        # Paquetes por id (con memoria acotada: lo antiguo pasa a disco) e
+        # índices para re-filtrar sin recorrerlos, recortados a la misma
+        # ventana y contados en su límite de memoria. Con una SessionDB los
+        # índices y los filtros los resuelve SQLite.
+        self.packets = store if store is not None else \
+            RetentionStore(packet_overhead=PACKET_OVERHEAD + POSTINGS_OVERHEAD)
+        self.index = None if isinstance(self.packets, SessionDB) else InvertedIndex()
+        self.display_filter = None
+
+        self.packet_model = PacketTableModel(self.packets, self)
+        self.setModel(self.packet_model)
+
+        # Filas de altura fija: la vista calcula la posición de cualquier
+        # fila sin medirlas, así el scroll no depende del número de filas
+        rows = self.verticalHeader()
+        rows.setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+        rows.setDefaultSectionSize(self.fontMetrics().height() + 6)
+        rows.hide()
+        self.horizontalHeader().setStretchLastSection(True)
+        self.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
+        self.setWordWrap(False)
+
+        # Etiquetas de subred/propietario (core.cidr.PrefixTable); la
+        # columna solo se muestra cuando hay una tabla cargada
+        self.prefix_table = None
+        self.setColumnHidden(self.LABEL_COLUMN, True)
+
+        self.selectionModel().currentRowChanged.connect(self.row_changed)
+
+    def add_parsed_packet(self, packet):
+        """
+        Añade una fila. 'packet' es un core.packet.Packet; los dicts con la
+        forma clásica se convierten con Packet.from_dict.
+        """
+        self.add_parsed_packets([packet])
+
+    def add_parsed_packets(self, packets):
+        """
+        Añade un lote de paquetes (p. ej. lo acumulado en la cola de
+        captura desde el último refresco) con una sola inserción de filas.
+        """
+        packets = [Packet.from_dict(p) if isinstance(p, dict) else p for p in packets]
+        if self.index is not None:
+            add = self.index.add
+            for packet in packets:
+                add(packet)
+        visible = None
+        if self.display_filter is not None:
+            visible = list(map(self.display_filter.match, packets))
+        self.packet_model.extend(packets, visible)
+        self._trim_index()
+
+    def _trim_index(self):
+        # El índice acompaña a la ventana en memoria del RetentionStore: de
+        # lo ya volcado a disco solo guarda resúmenes (InvertedIndex.trim)
+        if self.index is not None and isinstance(self.packets, RetentionStore):
+            self.index.trim(self.packets.first_in_memory)
+
+    def apply_filter(self, text):
+        """
+        Muestra solo las filas que cumplen la expresión (vacía = todas).
+        Se resuelve con los índices invertidos; lanza FilterError si la
+        expresión no es válida. Devuelve el número de filas visibles.
+        """
+        text = text.strip()
+        if not text:
+            self.display_filter = None
+            self.packet_model.set_rows(None)
+        else:
+            packet_filter = PacketFilter(text)
+            if self.index is None:
+                rows = self.packets.select(packet_filter)
+            else:
+                rows = self.index.query(packet_filter, self.packets)
+            self.packet_model.set_rows(rows)
+            self.display_filter = packet_filter
+        return self.packet_model.rowCount()
+
+    def set_store(self, store):
+        """
+        Cambia el almacén de paquetes (por ejemplo por una sesión
+        core.session_db.SessionDB ya abierta). Quita el filtro activo;
+        cerrar el almacén anterior queda a cargo de quien llama.
+        """
+        self.packet_model.beginResetModel()
+        self.packets = self.packet_model.packets = store
+        self.packet_model.rows = None
+        self.display_filter = None
+        if isinstance(store, SessionDB):
+            self.index = None
+        else:
+            self.index = InvertedIndex()
+            for packet in store:
+                self.index.add(packet)
+                self._trim_index()
+        self.packet_model.endResetModel()
+
+    def set_prefix_table(self, table):
+        """Muestra en la columna Subnet la etiqueta de origen/destino (None la oculta)."""
+        self.prefix_table = table
+        self.packet_model.set_prefix_table(table)
+        self.setColumnHidden(self.LABEL_COLUMN, table is None)
+
+    def prefix_label(self, packet):
+        return self.packet_model.prefix_label(packet)
+
+    def get_all_packets(self):
+        """Devuelve los Packet de todas las filas, en orden."""
+        return list(self.packets)
+
+    def iter_packets(self):
+        """Recorre los Packet en orden sin construir una lista (exportaciones)."""
+        return iter(self.packets)
+
+    def row_changed(self, current, previous):
+        if current.isValid():
+            self.packet_selected.emit(self.packet_model.packet_at(current.row()))
@@ -0,0 +1,79 @@
+# gui/pcap_loader.py
+# Carga de capturas en un hilo aparte: la ventana sigue respondiendo
+from PyQt6.QtCore import QSemaphore, QThread, pyqtSignal
+
+from capture.pcap_reader import iter_pcap_batches
+
+# Lotes emitidos que la GUI aún no ha procesado: con este número el hilo
+# espera, así la cola de eventos de Qt nunca guarda más de MAX_PENDING lotes
+MAX_PENDING = 2
+# Cada cuánto se mira la cancelación mientras se espera a la GUI (ms)
+_WAIT_MS = 100
+
+
+class PcapLoader(QThread):
+    """
+    Lee un pcap/pcapng con capture.pcap_reader.iter_pcap_batches fuera del
+    hilo de la GUI y entrega los paquetes por lotes mediante señales (Qt
+    las encola hacia el hilo de la ventana).
+
+    Control de flujo: quien recibe batch_ready debe llamar a batch_done()
+    al terminar con cada lote. Con MAX_PENDING lotes sin confirmar el hilo
+    deja de leer, para que un archivo de varios GB no acabe entero en la
+    cola de eventos si la GUI va más lenta que la lectura.
+
+    Señales:
+        batch_ready(list)        lote de core.packet.Packet
+        progress(leídos, total)  bytes del archivo procesados
+        failed(str)              error al abrir o leer el archivo
+        done(paquetes, cancelado) siempre al final (cancelado también tras failed)
+    """
+
+    batch_ready = pyqtSignal(list)
+    # Enteros de Python: los archivos de varios GB no caben en un int de C
+    progress = pyqtSignal(object, object)
+    failed = pyqtSignal(str)
+    done = pyqtSignal(int, bool)
+
+    def __init__(self, path, packet_filter=None, parent=None):
+        super().__init__(parent)
+        self.path = path
+        self.packet_filter = packet_filter
+        # Bandera propia: QThread.start() borra requestInterruption()
+        self.cancelled = False
+        self._pending = QSemaphore(MAX_PENDING)
+
+    def cancel(self):
+        """Pide que se detenga; se atiende en el siguiente lote (~0,1 s)."""
+        self.cancelled = True
+
+    def batch_done(self):
+        """Confirma que un lote de batch_ready ya se ha procesado."""
+        self._pending.release()
+
+    def _wait_slot(self):
+        """Espera a que la GUI confirme un lote; False si se cancela antes."""
+        while not self._pending.tryAcquire(1, _WAIT_MS):
+            if self.cancelled:
+                return False
+        return True
+
+    def run(self):
+        count = 0
+        batches = iter_pcap_batches(self.path, self.packet_filter)
+        try:
+            for batch, read, total in batches:
+                if self.cancelled:
+                    break
+                if batch:
+                    if not self._wait_slot():
+                        break
+                    count += len(batch)
+                    self.batch_ready.emit(batch)
+                self.progress.emit(read, total)
+        except (OSError, ValueError) as e:
+            self.failed.emit(str(e))
+            self.cancelled = True
+        finally:
+            batches.close()
+        self.done.emit(count, self.cancelled)
@@ -1,5 +1,27 @@
 # tests/test_capture.py
+import os
+import socket
+import struct
+import sys
+import threading
+import time
+
+import pytest
+
+from capture import afpacket
+from capture.disk_capture import DiskWriter
+from capture.live_capture import start_live_capture
+from capture.packet_queue import BLOCK, DROP_OLD, PacketQueue
+from capture.pcap_file import PcapFile
+from capture.pcap_index import PcapIndex, capinfos, index_path
+from capture.pcap_reader import iter_pcap_batches, read_pcap, read_pcap_range
+from capture.pcap_writer import RotatingPcapWriter
+from capture.pipeline import CapturePipeline
 from capture.simulator import PacketSimulator
+from core.dispatcher import parse_packet_lazy
+from core.filters import PacketFilter
+from core.parallel import parallel_parse
+from export.export_pcap import export_pcap
 
 def test_simulator_generates_packets():
     sim = PacketSimulator()
@@ -7,3 +29,362 @@ def test_simulator_generates_packets():
     assert "src" in pkt
     assert "dst" in pkt
     assert "proto" in pkt
+
+# -------------------------------------------------------------------------
+# Lector nativo pcap / pcapng
+# -------------------------------------------------------------------------
+
+# Ethernet + IPv4 (10.0.0.1 -> 10.0.0.2) + TCP 1234 -> 443 [SYN]
+FRAME = (
+    b"\xaa\xbb\xcc\xdd\xee\xff\x11\x22\x33\x44\x55\x66\x08\x00"
+    + struct.pack("!BBHHHBBH4s4s", 0x45, 0, 40, 1, 0, 64, 6, 0,
+                  bytes([10, 0, 0, 1]), bytes([10, 0, 0, 2]))
+    + struct.pack("!HHLLHHHH", 1234, 443, 1, 0, 0x5002, 1024, 0, 0)
+)
+
+def _pcap_bytes(endian, magic, frames):
+    out = struct.pack(endian + "IHHiIII", magic, 2, 4, 0, 0, 65535, 1)
+    for sec, frac, data in frames:
+        out += struct.pack(endian + "IIII", sec, frac, len(data), len(data)) + data
+    return out
+
+def _pcapng_block(block_type, body):
+    body += b"\x00" * (-len(body) % 4)
+    total = len(body) + 12
+    return struct.pack("<II", block_type, total) + body + struct.pack("<I", total)
+
+def test_pcap_file_classic_both_endians(tmp_path):
+    for endian, magic, frac, ts_ns in (
+        ("<", 0xA1B2C3D4, 250000, 1_700_000_000_250_000_000),
+        (">", 0xA1B23C4D, 7, 1_700_000_000_000_000_007),
+    ):
+        path = tmp_path / f"cap{endian == '<'}.pcap"
+        path.write_bytes(_pcap_bytes(endian, magic, [(1_700_000_000, frac, FRAME)] * 2))
+        with PcapFile(path) as pcap:
+            recs = list(pcap)
+            assert [r.ts_ns for r in recs] == [ts_ns, ts_ns]
+            assert isinstance(recs[0].data, memoryview)
+            assert bytes(recs[1].data) == FRAME
+            assert recs[0].linktype == 1
+            del recs
+
+def test_pcap_file_pcapng_epb_spb(tmp_path):
+    shb = _pcapng_block(0x0A0D0D0A, struct.pack("<IHHq", 0x1A2B3C4D, 1, 0, -1))
+    idb = _pcapng_block(1, struct.pack("<HHI", 1, 0, 0)
+                        + struct.pack("<HHB3x", 9, 1, 9) + struct.pack("<HH", 0, 0))
+    ts = 1_700_000_000_123_456_789
+    epb = _pcapng_block(6, struct.pack("<IIIII", 0, ts >> 32, ts & 0xFFFFFFFF,
+                                       len(FRAME), len(FRAME)) + FRAME)
+    spb = _pcapng_block(3, struct.pack("<I", len(FRAME)) + FRAME)
+    path = tmp_path / "cap.pcapng"
+    path.write_bytes(shb + idb + epb + spb)
+
+    with PcapFile(path) as pcap:
+        recs = list(pcap)
+        assert pcap.format == "pcapng"
+        assert [r.ts_ns for r in recs] == [ts, 0]
+        assert all(bytes(r.data) == FRAME for r in recs)
+        del recs
+
+def test_read_pcap_parses_views(tmp_path):
+    path = tmp_path / "cap.pcap"
+    path.write_bytes(_pcap_bytes("<", 0xA1B2C3D4, [(1, 0, FRAME)]))
+    packets = []
+    read_pcap(path, packets.append)
+    assert packets[0].summary == "1234 -> 443 [TCP] [SYN]"
+    assert packets[0].raw == FRAME
+    assert packets[0].timestamp == 1.0
+
+# -------------------------------------------------------------------------
+# Índice sidecar
+# -------------------------------------------------------------------------
+
+def test_pcap_index_random_access(tmp_path):
+    path = tmp_path / "cap.pcap"
+    path.write_bytes(_pcap_bytes("<", 0xA1B2C3D4, [(10 + i, 0, FRAME) for i in range(5)]))
+
+    idx = PcapIndex.open(path)
+    assert len(idx) == 5
+    assert (tmp_path / "cap.pcap.idx").exists() and index_path(path).endswith(".idx")
+    assert idx.find_time(12_000_000_000) == 2
+    assert idx.find_time(99_000_000_000) == 5
+
+    loaded = PcapIndex.load(path)
+    assert list(loaded.offsets) == list(idx.offsets)
+
+    info = capinfos(path)
+    assert info["packets"] == 5
+    assert info["bytes"] == 5 * len(FRAME)
+    assert info["duration"] == 4.0
+    assert info["linktypes"] == [1]
+
+    got = []
+    assert read_pcap_range(path, 3, 10, got.append) == 2
+    assert got[0].ts_ns == 13_000_000_000
+
+# -------------------------------------------------------------------------
+# Disección paralela
+# -------------------------------------------------------------------------
+
+def test_parallel_parse_keeps_order(tmp_path):
+    path = tmp_path / "cap.pcap"
+    path.write_bytes(_pcap_bytes("<", 0xA1B2C3D4, [(i, 0, FRAME) for i in range(7)]))
+    expected = []
+    read_pcap(path, expected.append)
+
+    for workers in (1, 2):
+        got = []
+        assert parallel_parse(path, got.append, workers=workers, chunk_size=2) == 7
+        assert all(p.materialized for p in got)
+        assert [(p.layers, p.summary, p.ts_ns) for p in got] == \
+               [(p.layers, p.summary, p.ts_ns) for p in expected]
+
+def test_parallel_worker_cache_reopens_rewritten_file(tmp_path):
+    from core import parallel
+    path = str(tmp_path / "cap.pcap")
+    with open(path, "wb") as f:
+        f.write(_pcap_bytes("<", 0xA1B2C3D4, [(1, 0, FRAME)]))
+    first = parallel._worker_file(path)
+    assert parallel._worker_file(path) is first
+    with open(path, "wb") as f:
+        f.write(_pcap_bytes("<", 0xA1B2C3D4, [(2, 0, FRAME), (3, 0, FRAME)]))
+    second = parallel._worker_file(path)
+    assert second is not first and [r.ts_ns for r in second] == [2 * 10**9, 3 * 10**9]
+    parallel._close_worker_files()
+    assert not parallel._worker_pcap
+
+
+# -------------------------------------------------------------------------
+# Cola hilo de captura -> GUI
+# -------------------------------------------------------------------------
+
+def test_packet_queue_bounded_and_batched():
+    q = PacketQueue(maxsize=1000)
+    threads = [threading.Thread(target=lambda: [q.put(i) for i in range(600)]) for _ in range(2)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    stats = q.stats()
+    assert stats["received"] == 1000 and stats["dropped"] == 200
+    assert stats["queued"] == stats["high_water"] == 1000
+    assert len(q.drain(10)) == 10
+    assert len(q.drain()) == 990 and len(q) == 0
+    assert q.put("x") and q.drain() == ["x"]
+
+def test_iter_pcap_batches_progress(tmp_path):
+    from benchmarks.common import make_frames, write_pcap
+    path = tmp_path / "big.pcap"
+    write_pcap(path, make_frames(3000))
+
+    batches = list(iter_pcap_batches(path, first_batch=100, max_batch=1000))
+    sizes = [len(b) for b, _, _ in batches]
+    assert sizes[0] == 100 and max(sizes) <= 1000 and sum(sizes) == 3000
+    progress = [read for _, read, _ in batches]
+    assert progress == sorted(progress) and progress[-1] == batches[-1][2] == path.stat().st_size
+
+
+# -------------------------------------------------------------------------
+# Captura a disco en anillo
+# -------------------------------------------------------------------------
+
+def test_rotating_writer_size_duration_and_ring(tmp_path):
+    by_size = RotatingPcapWriter(tmp_path / "size", max_bytes=1000, max_files=3)
+    for i in range(100):
+        by_size.write(FRAME, i)
+    by_size.close()
+    assert len(by_size.files) == 3 and by_size.rotations > 3
+    assert sorted(p.name for p in (tmp_path / "size").iterdir()) == \
+        sorted(os.path.basename(p) for p in by_size.files)
+
+    by_time = RotatingPcapWriter(tmp_path / "time", max_seconds=10)
+    for sec in range(35):
+        by_time.write(FRAME, sec * 1_000_000_000)
+    by_time.close()
+    counts = [sum(1 for _ in PcapFile(p)) for p in by_time.files]
+    assert counts == [10, 10, 10, 5]
+
+def test_disk_writer_drains_queue(tmp_path):
+    writer = RotatingPcapWriter(tmp_path, max_bytes=10_000)
+    disk = DiskWriter(writer, queue_size=100_000).start()
+    for i in range(2000):
+        assert disk.put(FRAME, i)
+    disk.stop()
+    stats = disk.stats()
+    assert stats["written"] == 2000 and stats["dropped"] == 0 and stats["queued"] == 0
+    assert stats["bytes"] == 2000 * len(FRAME)
+    assert sum(sum(1 for _ in PcapFile(p)) for p in writer.files) == 2000
+
+    # Interfaz IP en crudo (tun): el linktype y la longitud original llegan al archivo
+    writer = RotatingPcapWriter(tmp_path / "raw", linktype=101)
+    disk = DiskWriter(writer).start()
+    disk.put(FRAME[14:], 5, 101, 1500)
+    disk.stop()
+    (record,) = PcapFile(writer.files[0])
+    assert record.linktype == 101 and record.origlen == 1500 and bytes(record.data) == FRAME[14:]
+
+
+# -------------------------------------------------------------------------
+# Exportación nativa pcap / pcapng
+# -------------------------------------------------------------------------
+
+def test_export_pcap_streams_and_keeps_metadata(tmp_path):
+    ts = 1_700_000_000_123_456_789
+    def packets():
+        for i in range(1000):
+            yield parse_packet_lazy(FRAME, ts + i, 1)
+        yield parse_packet_lazy(b"\x45" + FRAME[15:], ts, 101)     # IP en crudo
+
+    assert export_pcap(tmp_path / "out.pcap", packets())
+    records = list(PcapFile(tmp_path / "out.pcap"))
+    assert len(records) == 1000 and {r.linktype for r in records} == {1}
+    assert [r.ts_ns for r in records[:3]] == [ts, ts + 1, ts + 2]
+
+    assert export_pcap(tmp_path / "out.pcapng", packets())
+    records = list(PcapFile(tmp_path / "out.pcapng"))
+    assert len(records) == 1001 and records[-1].linktype == 101
+    assert records[999].ts_ns == ts + 999 and bytes(records[0].data) == FRAME
+    assert not export_pcap(tmp_path / "empty.pcap", iter(()))
+
+
+# -------------------------------------------------------------------------
+# Pipeline por etapas con colas acotadas
+# -------------------------------------------------------------------------
+
+def test_packet_queue_policies():
+    q = PacketQueue(maxsize=3, policy=DROP_OLD)
+    assert q.put_many(range(5)) == 5
+    assert q.drain() == [2, 3, 4] and q.stats()["dropped"] == 2
+
+    q = PacketQueue(maxsize=2, policy=BLOCK)
+    q.put_many([0, 1])
+    t = threading.Thread(target=q.put, args=(2,))
+    t.start()
+    time.sleep(0.05)
+    assert t.is_alive() and q.drain() == [0, 1]
+    t.join(1)
+    assert q.drain() == [2] and q.stats()["dropped"] == 0
+    q.close()
+    assert not q.put(3)
+
+def test_pipeline_order_backpressure_and_drops():
+    frames = [FRAME[:34] + struct.pack("!H", i) + FRAME[36:] for i in range(5000)]
+    received, slow = [], []
+
+    def slow_sink(batch):
+        time.sleep(0.01)
+        slow.extend(batch)
+
+    pipeline = CapturePipeline(parse_workers=2, batch_size=64)
+    pipeline.add_sink("all", received.extend, policy=BLOCK, batch_size=64)
+    pipeline.add_sink("slow", slow_sink, queue_size=100, batch_size=10)
+    pipeline.start()
+    for i, raw in enumerate(frames):
+        pipeline.put(raw, i)
+    pipeline.stop()
+
+    stats = pipeline.stats()
+    assert [p.ts_ns for p in received] == list(range(5000))
+    assert stats["parse"]["processed"] == 5000 and stats["all"]["dropped"] == 0
+    assert stats["slow"]["dropped"] > 0
+    assert len(slow) == stats["slow"]["received"] == 5000 - stats["slow"]["dropped"]
+    assert not pipeline.running
+
+def test_pipeline_counts_failed_batches(capsys):
+    def broken_sink(batch):
+        if batch[0].ts_ns % 2:
+            raise ValueError("sink roto")
+
+    pipeline = CapturePipeline(batch_size=1)
+    stage = pipeline.add_sink("broken", broken_sink, batch_size=1, policy=BLOCK)
+    pipeline.start()
+    for i in range(10):
+        pipeline.put(FRAME, i)
+    pipeline.stop()
+    stats = pipeline.stats()["broken"]
+    assert stats["errors"] == 5 and stats["lost"] == 5 and stats["processed"] == 10
+    err = capsys.readouterr().out
+    assert err.count("ValueError: sink roto") == 1 and "'broken'" in err and stage.lost == 5
+
+def test_pipeline_filters_and_feeds_queue():
+    queue = PacketQueue()
+    pipeline = CapturePipeline(PacketFilter("tcp.dport == 443"))
+    pipeline.add_sink("gui", queue)
+    pipeline.start()
+    pipeline.put(FRAME, 1)
+    pipeline.put(FRAME[:36] + struct.pack("!H", 80) + FRAME[38:], 2)
+    pipeline.stop()
+    assert [p.ts_ns for p in queue.drain()] == [1]
+    assert pipeline.stats()["filtered"] == 1 and "filter" not in pipeline.stats()
+
+    pipeline = CapturePipeline(PacketFilter(ip="10.0.0.1", proto="tcp"))
+    assert pipeline.packet_filter.needs_dissection == ("filter" in [s.name for s in pipeline.stages])
+
+
+# -------------------------------------------------------------------------
+# Captura nativa AF_PACKET (Linux, requiere root / CAP_NET_RAW)
+# -------------------------------------------------------------------------
+
+def _open_loopback(**options):
+    if not sys.platform.startswith("linux"):
+        pytest.skip("AF_PACKET solo existe en Linux")
+    try:
+        return afpacket.AfPacketSocket("lo", block_size=1 << 16, block_count=4, timeout_ms=10,
+                                       **options)
+    except PermissionError:
+        pytest.skip("se necesita root o CAP_NET_RAW")
+
+def _send_udp(payloads, delay=0.0):
+    rx = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    rx.bind(("127.0.0.1", 0))
+    def _send():
+        time.sleep(delay)
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as tx:
+            for data in payloads:
+                tx.sendto(data, rx.getsockname())
+        rx.close()
+    t = threading.Thread(target=_send)
+    t.start()
+    return rx.getsockname()[1], t
+
+def test_afpacket_ring_reads_loopback_blocks():
+    with _open_loopback(promisc=False) as sock:
+        payloads = [b"ring-%04d" % i for i in range(300)]
+        port, t = _send_udp(payloads)
+        t.join()
+        start = time.time_ns()
+        seen, deadline = [], time.monotonic() + 2
+        for frames in sock.blocks(lambda: time.monotonic() > deadline or len(seen) >= 300):
+            for data, ts_ns, origlen in frames:
+                if struct.unpack_from("!H", data, 36)[0] == port:
+                    seen.append((bytes(data[42:]), ts_ns, origlen, len(data)))
+        stats = sock.stats()
+    # Una sola copia por trama (la de salida de loopback se descarta) y en orden
+    assert [s[0] for s in seen] == payloads
+    assert all(abs(ts - start) < 10**10 and origlen == caplen for _, ts, origlen, caplen in seen)
+    assert stats["blocks"] >= 1 and stats["packets"] >= 300 and sock.linktype == 1
+
+def test_afpacket_feeds_pipeline_and_live_capture():
+    _open_loopback().close()
+    port, t = _send_udp([b"pipe-%04d" % i for i in range(200)], delay=0.2)
+    pipeline = CapturePipeline(batch_size=64)
+    queue = PacketQueue()
+    pipeline.add_sink("out", queue)
+    deadline = time.monotonic() + 2
+    stats = afpacket.capture_afpacket(
+        "lo", pipeline.start().put_many, lambda: time.monotonic() > deadline or len(queue) >= 200,
+        packet_filter=PacketFilter(f"udp.dstport == {port}"), block_size=1 << 16,
+        block_count=4, timeout_ms=10)
+    pipeline.stop()
+    t.join()
+    packets = queue.drain()
+    assert len(packets) == 200 and stats["drops"] == 0
+    assert all(p.dport == port and p.proto == "UDP" for p in packets)
+
+    port, t = _send_udp([b"live-%04d" % i for i in range(50)], delay=0.2)
+    got = []
+    start_live_capture("lo", got.append, lambda: time.monotonic() > deadline + 2 or len(got) >= 50,
+                       packet_filter=PacketFilter(f"udp.dstport == {port}"), backend="afpacket")
+    t.join()
+    assert len(got) == 50 and isinstance(got[0].raw, bytes)
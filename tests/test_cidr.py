@@ -0,0 +1,58 @@
+# tests/test_cidr.py
+import ipaddress
+import random
+
+from benchmarks.common import tcp_frame
+from core.cidr import PrefixTable, RadixTrie, register_prefix_set
+from core.dispatcher import parse_packet_lazy
+from core.filters import PacketFilter
+from core.inverted_index import InvertedIndex
+from core.packet import AF_INET6
+
+def test_longest_prefix_match_random():
+    rng = random.Random(7)
+    trie = RadixTrie(16)
+    prefixes = {}
+    for i in range(200):
+        length = rng.randint(0, 16)
+        key = rng.getrandbits(16) >> (16 - length) << (16 - length)
+        trie.insert(key, length, i)
+        prefixes[(key, length)] = i
+    assert len(trie) == len(prefixes)
+    for addr in range(1 << 16):
+        best = max(((l, v) for (k, l), v in prefixes.items() if addr >> (16 - l) == k >> (16 - l)),
+                   default=None)
+        assert trie.longest_match(addr) == best
+
+    starts, values = trie.flatten()
+    assert starts[0] == 0 and starts == sorted(set(starts))
+
+def test_prefix_table_csv_and_watchlist(tmp_path):
+    path = tmp_path / "sites.csv"
+    path.write_text("prefix,label\n# comentario\n10.0.0.0/8,corp\n10.1.0.0/16,lab\n"
+                    "192.0.2.7\n2001:db8::/32,v6\n")
+    table = PrefixTable.from_csv(path)
+    assert len(table) == 4
+    assert table.label("10.1.2.3") == "lab"
+    assert table.label("10.2.0.1") == "corp"
+    assert table.label("192.0.2.7") == "192.0.2.7/32"
+    assert table.label("2001:db8::1") == "v6" and "2001:db9::1" not in table
+    assert table.lookup(AF_INET6, int(ipaddress.ip_address("::1"))) is None
+
+    # Los prefijos añadidos después se ven en las búsquedas
+    table.add("172.16.0.0/12", "dmz")
+    assert table.label("172.20.0.1") == "dmz"
+
+    register_prefix_set("sites", table)
+
+    pkts = [parse_packet_lazy(tcp_frame(src, dst, 1234, 80)) for src, dst in
+            (([10, 1, 0, 1], [8, 8, 8, 8]), ([8, 8, 8, 8], [172, 16, 0, 9]),
+             ([8, 8, 4, 4], [1, 1, 1, 1]))]
+    idx = InvertedIndex()
+    for p in pkts:
+        idx.add(p)
+    for text, expected in (("ip.addr in @sites", [0, 1]), ("ip.src in @SITES", [0]),
+                           ("!ip.dst in @sites && tcp", [0, 2])):
+        f = PacketFilter(text)
+        assert [i for i, p in enumerate(pkts) if f.match(p)] == expected, text
+        assert list(idx.query(f, pkts)) == expected, text
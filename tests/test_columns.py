@@ -0,0 +1,72 @@
+# tests/test_columns.py
+import struct
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from benchmarks.common import ETH_HDR, HTTP_GET, make_frames, tcp_frame, udp_frame, write_pcap
+from capture.pcap_file import PcapFile
+from core.batch import ingest_pcap
+from core.columns import COLUMN_NAMES, ColumnStore, from_pcap
+
+def test_column_store_from_pcap(tmp_path):
+    frames = [tcp_frame([10, 0, 0, 1], [10, 0, 0, 2], 1000 + i, 443, flags=0x02) for i in range(5)]
+    frames.append(udp_frame([10, 0, 0, 3], [8, 8, 8, 8], 5353, 53, b"x" * 10))
+    path = tmp_path / "cap.pcap"
+    write_pcap(path, frames)
+
+    store = from_pcap(path, chunk_size=4)
+    assert len(store) == 6
+    assert store["src"][0] == 0x0A000001
+    assert list(store["dport"]) == [443] * 5 + [53]
+    assert store["tcp_flags"][0] == 0x02 and store["ttl"][5] == 64
+    assert store.where(store["proto"] == 17).tolist() == [5]
+    assert store.sort_index("sport", descending=True)[0] == 5
+    # Orden estable también descendente: los empates (dport 443) en orden de llegada
+    assert store.sort_index("dport", descending=True).tolist() == [0, 1, 2, 3, 4, 5]
+    assert store.sort_index(["proto", "dport"], descending=True).tolist() == [5, 0, 1, 2, 3, 4]
+
+    stats = store.stats()
+    assert stats["protocols"][6]["packets"] == 5
+    assert stats["bytes"] == sum(len(f) for f in frames)
+
+    with PcapFile(path) as pcap:
+        assert bytes(store.frame(pcap, 2)) == frames[2]
+
+def _vlan(frame, vid=100):
+    """Inserta una etiqueta 802.1Q tras las MAC de una trama Ethernet."""
+    return frame[:12] + struct.pack("!HH", 0x8100, vid) + frame[12:]
+
+def _ipv6_frame(proto, src, dst, l4):
+    hdr = struct.pack("!IHBB16s16s", 6 << 28, len(l4), proto, 64, src, dst)
+    return ETH_HDR + b"\x86\xdd" + hdr + l4
+
+def test_batch_decode_matches_per_row(tmp_path):
+    src6 = bytes(range(0x20, 0x30))
+    dst6 = b"\xfe\x80" + bytes(13) + b"\x01"
+    tcp6 = _ipv6_frame(6, src6, dst6, struct.pack("!HHLLHHHH", 40000, 443, 1, 2, (5 << 12) | 0x12,
+                                                  1024, 0, 0))
+    udp6 = _ipv6_frame(17, dst6, src6, struct.pack("!HHHH", 5353, 53, 8, 0))
+    extra = [tcp6, udp6, _vlan(tcp6), _vlan(udp6),
+             _vlan(udp_frame([10, 0, 0, 5], [10, 0, 0, 6], 6000, 53)),
+             _vlan(tcp_frame([10, 0, 0, 7], [10, 0, 0, 8], 1234, 443, flags=0x02)),
+             _vlan(tcp6)[:40]]
+    frames = make_frames(300) + extra + [tcp_frame([10, 0, 0, 1], [10, 0, 0, 2], 1234, 80, HTTP_GET)[:30]]
+    path = tmp_path / "cap.pcap"
+    write_pcap(path, frames)
+
+    dissected = []
+    batch = ingest_pcap(path, on_packet=lambda row, pkt: dissected.append((row, pkt)), batch_size=64)
+    rows = from_pcap(path)
+    for name in COLUMN_NAMES:
+        assert (batch[name] == rows[name]).all(), name
+    # IPv6 y VLAN: direcciones de 16 bytes y cabeceras desplazadas 4 bytes
+    assert batch["src6"][300] == src6 and batch["dst6"][301] == src6
+    assert batch["ethertype"][302:304].tolist() == [0x86DD, 0x86DD]
+    assert batch["dport"][300:306].tolist() == [443, 53, 443, 53, 53, 443]
+    assert batch["src"][304] == 0x0A000005 and batch["tcp_flags"][305] == 0x02
+
+    # Solo DNS/HTTP pasan por los parsers, y con su fila correcta
+    assert dissected and all(rows["dport"][row] in (53, 80) for row, _ in dissected)
+    assert all(pkt.materialized for _, pkt in dissected)
@@ -0,0 +1,90 @@
+# tests/test_export.py
+import base64
+import csv
+import gzip
+import json
+
+import pytest
+
+from benchmarks.common import DNS_QUERY, HTTP_GET, make_frames, tcp_frame, udp_frame
+from core.columns import COLUMN_NAMES
+from core.dispatcher import parse_packet_lazy
+from core.display_filter import FilterError
+from core.field_columns import FieldColumns
+from core.packet import Packet
+from export.export_columnar import export_columnar, load_columnar
+from export.export_csv import export_csv
+from export.export_json import export_json
+
+def _packets(n):
+    return (parse_packet_lazy(f, i * 1000) for i, f in enumerate(make_frames(n)))
+
+def test_export_json_ndjson_gzip_with_raw(tmp_path):
+    path = tmp_path / "out.ndjson.gz"
+    assert export_json(path, _packets(5000), fields=["number", "ts_ns", "src", "length"],
+                       raw="base64")
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        rows = [json.loads(line) for line in f]
+    frames = make_frames(5000)
+    assert len(rows) == 5000 and list(rows[0]) == ["number", "ts_ns", "src", "length", "raw"]
+    assert rows[4321]["number"] == 4322 and rows[4321]["ts_ns"] == 4321000
+    assert base64.b64decode(rows[4321]["raw"]) == frames[4321]
+
+def test_export_json_array_and_bad_field(tmp_path):
+    assert export_json(tmp_path / "out.json", _packets(5000), raw="hex")
+    rows = json.loads((tmp_path / "out.json").read_text(encoding="utf-8"))
+    assert len(rows) == 5000 and bytes.fromhex(rows[-1]["raw"]) == make_frames(5000)[-1]
+    assert export_json(tmp_path / "empty.json", iter(()))
+    assert json.loads((tmp_path / "empty.json").read_text()) == []
+    assert not export_json(tmp_path / "bad.ndjson", _packets(3), fields=["nope"])
+
+def test_field_columns_header_and_layer_fields():
+    dns = parse_packet_lazy(udp_frame([10, 0, 0, 1], [10, 0, 0, 2], 5353, 53, DNS_QUERY))
+    cols = FieldColumns(["frame.number", "ip.src", "ip.addr", "udp.dport", "tcp.dport",
+                         "dns.qname", "frame.len"])
+    assert cols.row(7, dns) == (7, "10.0.0.1", "10.0.0.1,10.0.0.2", 53, None, "example.com",
+                                dns.length)
+    assert not FieldColumns(["ip.src", "col.info"]).needs_layers
+    with pytest.raises(FilterError):
+        FieldColumns(["no valida"])
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_export_csv_columns_tsv_gzip(tmp_path, workers):
+    path = tmp_path / "out.tsv.gz"
+    assert export_csv(path, _packets(3000), [("No.", "frame.number"), "ip.src", "tcp.dport"],
+                      workers=workers, chunk_size=500)
+    with gzip.open(path, "rt", encoding="utf-8", newline="") as f:
+        rows = list(csv.reader(f, delimiter="\t"))
+    assert rows[0] == ["No.", "ip.src", "tcp.dport"] and len(rows) == 3001
+    assert [r[0] for r in rows[1:]] == [str(i) for i in range(1, 3001)]
+    expected = [p.src_str for p in _packets(3000)]
+    assert [r[1] for r in rows[1:]] == expected
+
+@pytest.mark.parametrize("ext", ["parquet", "arrow", "npz"])
+def test_export_columnar_round_trip(tmp_path, ext):
+    np = pytest.importorskip("numpy")
+    if ext != "npz":
+        pytest.importorskip("pyarrow")
+    frames = make_frames(3000) + [tcp_frame([10, 0, 0, 1], [10, 0, 0, 2], 1234, 80, HTTP_GET)]
+    packets = [parse_packet_lazy(f, i * 1000) for i, f in enumerate(frames)]
+    path = tmp_path / f"out.{ext}"
+    assert export_columnar(path, iter(packets), row_group=1000)
+
+    store = load_columnar(path)
+    assert len(store) == 3001
+    assert (store["ts_ns"] == np.arange(3001) * 1000).all()
+    assert store["dport"][-1] == 80 and store["http_host"][-1] == "example.com"
+    assert store["http_method"][-1] == "GET" and store["http_status"][-1] is None
+    dns = [i for i, p in enumerate(packets) if p.dport == 53 and p.proto == "UDP"]
+    assert dns and all(store["dns_qname"][i] == "example.com" for i in dns)
+    assert set(store.extra_columns) >= {"dns_qname", "dhcp_type"}
+    assert set(COLUMN_NAMES) <= set(store.table().dtype.names)
+
+def test_export_columnar_rawless_packets(tmp_path):
+    pytest.importorskip("numpy")
+    # Paquetes del simulador: sin bytes, un bloque entero vacío
+    packets = [Packet(b"", i, proto="SIM", summary="simulado") for i in range(3)]
+    assert export_columnar(tmp_path / "sim.npz", packets)
+    store = load_columnar(tmp_path / "sim.npz")
+    assert len(store) == 3 and list(store["ts_ns"]) == [0, 1, 2]
+    assert not store["dport"].any()
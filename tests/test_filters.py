@@ -1,7 +1,156 @@
 # tests/test_filters.py
+import struct
+
+import pytest
+
+from core.dispatcher import parse_packet, parse_packet_lazy
+from core.display_filter import DisplayFilter, FilterError
 from core.filters import PacketFilter
+from core.inverted_index import InvertedIndex
 
 def test_filter_src_ip():
     f = PacketFilter(src_ip="192.168.1.10")
     pkt = {"layers":[{"layer":"IPv4","fields":{"src":"192.168.1.10"}}]}
     assert f.match(pkt) is True
+
+# -------------------------------------------------------------------------
+# Filtros sobre bytes crudos (antes de disecar)
+# -------------------------------------------------------------------------
+
+DNS_QUERY = b"\x12\x34\x01\x00\x00\x01\x00\x00\x00\x00\x00\x00\x03www\x00\x00\x01\x00\x01"
+
+def _frame(proto, sport, dport, src=(10, 0, 0, 1), flags=0x5002, data=b""):
+    if proto == 6:
+        l4 = struct.pack("!HHLLHHHH", sport, dport, 1, 0, flags, 1024, 0, 0) + data
+    else:
+        l4 = struct.pack("!HHHH", sport, dport, 8 + len(data), 0) + data
+    ip = struct.pack("!BBHHHBBH4s4s", 0x45, 0, 20 + len(l4), 1, 0, 64, proto, 0,
+                     bytes(src), bytes([10, 0, 0, 2]))
+    return b"\xaa\xbb\xcc\xdd\xee\xff\x11\x22\x33\x44\x55\x66\x08\x00" + ip + l4
+
+def test_filter_raw_matches_dissection():
+    frames = [_frame(6, 1234, 443), _frame(17, 5353, 53, data=DNS_QUERY), _frame(6, 80, 4000, src=(192, 168, 1, 10)),
+              _frame(6, 1234, 443)[:40], b"\x00" * 10]
+    filters = [PacketFilter(src_ip="192.168.1.0/24"), PacketFilter(port=53, proto="udp"),
+               PacketFilter(tcp_flags="SYN"), PacketFilter(proto="dns"), PacketFilter(proto="ethernet")]
+    for f in filters:
+        for raw in frames:
+            verdict = f.match_raw(raw)
+            assert verdict is None or verdict == f.match_layers(parse_packet(raw))
+
+    # Los campos a offset fijo se deciden sin disecar; DNS necesita las capas
+    assert PacketFilter(port=53).match_raw(frames[0]) is False
+    assert PacketFilter(port=443).match_raw(frames[0]) is True
+    assert PacketFilter(proto="dns").match_raw(frames[1]) is None
+    assert PacketFilter(proto="dns").match(parse_packet(frames[1])) is True
+    # El nombre de capa antiguo "ethernet" es el protocolo "eth"
+    assert PacketFilter(proto="ethernet").match_raw(frames[0]) is True
+    assert not PacketFilter(proto="ethernet").needs_dissection
+
+def test_read_pcap_filter_skips_rejected(tmp_path, monkeypatch):
+    import capture.pcap_reader as reader
+    frames = [_frame(6, 1234, 443), _frame(17, 5353, 53), _frame(6, 1234, 80)]
+    data = struct.pack("<IHHiIII", 0xA1B2C3D4, 2, 4, 0, 0, 65535, 1)
+    for raw in frames:
+        data += struct.pack("<IIII", 1, 0, len(raw), len(raw)) + raw
+    path = tmp_path / "f.pcap"
+    path.write_bytes(data)
+
+    parsed = []
+    real = reader._parse_frame
+    monkeypatch.setattr(reader, "_parse_frame", lambda *a: parsed.append(a) or real(*a))
+    out = []
+    reader.read_pcap(str(path), out.append, PacketFilter(proto="tcp", dst_port=80))
+    assert len(out) == 1 and out[0].dport == 80
+    assert len(parsed) == 1
+
+# -------------------------------------------------------------------------
+# Lenguaje de filtros
+# -------------------------------------------------------------------------
+
+def test_display_filter_expressions():
+    web = _frame(6, 40000, 443, src=(10, 1, 2, 3))
+    dns = _frame(17, 5353, 53, data=DNS_QUERY)
+    cases = {
+        "ip.src == 10.0.0.0/8 && tcp.dport in {80,443} && !arp": (True, False),
+        "tcp.port in {1000..50000} and not udp": (True, False),
+        "udp.dstport == 53 || ip.addr == 10.1.2.3": (True, True),
+        "dns": (False, True),
+        "!(tcp.flags.syn == 1) && frame.len > 40": (False, True),
+    }
+    for text, expected in cases.items():
+        f = PacketFilter(text)
+        got = tuple(f.match(parse_packet(raw)) for raw in (web, dns))
+        assert got == expected, text
+        # Lo que se decide en crudo coincide con la evaluación sobre capas
+        for raw in (web, dns):
+            verdict = f.match_raw(raw)
+            assert verdict is None or verdict == f.match_layers(parse_packet(raw))
+
+def test_display_filter_compiles_once():
+    f = DisplayFilter("tcp.dport in {80} && tcp && tcp")
+    # Plegado: un conjunto de un elemento es un ==, sin duplicados ni 'in'
+    assert "== 80" in f.source and " in _c" not in f.source
+    assert f.source.count("'tcp' in h[8]") == 1
+    assert not f.needs_dissection
+    assert DisplayFilter("http || tcp").needs_dissection
+
+    for bad in ("ip.src ==", "foo.bar == 1", "ip.src == 10.0.0.999", "(tcp", "tcp.port > x"):
+        with pytest.raises(FilterError):
+            DisplayFilter(bad)
+
+
+# -------------------------------------------------------------------------
+# Índices invertidos
+# -------------------------------------------------------------------------
+
+def test_inverted_index_query_matches_scan():
+    frames = [
+        _frame(6, 40000, 443, src=(10, 1, 2, 3)),
+        _frame(17, 5353, 53, data=DNS_QUERY),
+        _frame(6, 443, 40000, src=(192, 168, 1, 7)),
+        _frame(6, 40000, 443, src=(10, 1, 2, 3))[:20],   # truncada: no indexable
+        _frame(17, 1000, 2000, src=(10, 9, 9, 9)),
+        _frame(6, 40000, 443, src=(10, 1, 2, 3), flags=0x5010),
+    ]
+    pkts = [parse_packet_lazy(raw) for raw in frames]
+    idx = InvertedIndex()
+    for p in pkts:
+        idx.add(p)
+    assert list(idx.unindexed) == [3]
+
+    for text in ("ip.src == 10.0.0.0/8", "tcp.port == 443 && !ip.src == 192.168.1.7",
+                 "dns", "udp or tcp.flags.syn == 1", "frame.len > 50 && udp",
+                 "!(tcp.dport in {443, 53})"):
+        f = PacketFilter(text)
+        assert list(idx.query(f, pkts)) == [i for i, p in enumerate(pkts) if f.match(p)], text
+
+    # Paquetes del mismo flujo (el truncado no está indexado)
+    assert list(idx.flow_ids(idx.flow_of(pkts[0]))) == [0, 5]
+    assert list(idx.flow_ids(idx.flow_of(pkts[4]))) == [4]
+
+def test_inverted_index_trim_keeps_results(monkeypatch, tmp_path):
+    import core.inverted_index as inverted_index
+    from benchmarks.common import make_frames
+    from core.retention import RetentionStore
+
+    monkeypatch.setattr(inverted_index, "SUMMARY_CHUNK", 500)
+    frames = make_frames(3000)
+    frames[700] = frames[700][:20]      # no indexable, dentro de un tramo recortado
+    store = RetentionStore(max_packets=800, spill_dir=tmp_path / "spill")
+    idx = InvertedIndex()
+    for raw in frames:
+        packet = parse_packet_lazy(raw)
+        store.append(packet)
+        idx.add(packet)
+        idx.trim(store.first_in_memory)
+
+    assert idx.first >= 2000 and len(idx.summaries) >= 3
+    assert all(ids[0] >= idx.first for table in idx.tables.values() for ids in table.values())
+    packets = [parse_packet_lazy(raw) for raw in frames]
+    for text in ("tcp", "!udp", "udp.port == 53", "ip.addr == 10.0.0.1", "ip.src != 10.0.0.1",
+                 "tcp.dport in {80, 443} && !dns", "ip.src == 10.0.0.0/8", "eth", "dns",
+                 "tcp.sport == 1"):
+        f = PacketFilter(text)
+        assert list(idx.query(f, store)) == [i for i, p in enumerate(packets) if f.match(p)], text
+    store.close()
@@ -0,0 +1,123 @@
+# tests/test_packet_list.py
+import os
+
+import pytest
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+QtWidgets = pytest.importorskip("PyQt6.QtWidgets")
+
+from benchmarks.common import DNS_QUERY, tcp_frame, udp_frame
+from core.dispatcher import parse_packet_lazy
+from core.session_db import SessionDB
+from gui.packet_list import PacketList
+
+@pytest.fixture(scope="module")
+def app():
+    return QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+def test_packet_list_virtual_model(app):
+    view = PacketList()
+    frames = [tcp_frame([10, 0, 0, 1], [10, 0, 0, 2], 1000 + i, 443) for i in range(3)]
+    frames.append(udp_frame([10, 0, 0, 3], [8, 8, 8, 8], 5353, 53, DNS_QUERY))
+    for raw in frames:
+        view.add_parsed_packet(parse_packet_lazy(raw))
+
+    model = view.packet_model
+    assert model.rowCount() == 4 and model.columnCount() == 8
+    assert model.data(model.index(3, 2)) == "10.0.0.3"
+    assert model.data(model.index(3, 5)) == str(len(frames[3]))
+
+    # Con filtro: las filas son los ids que pasan, numerados como en la captura
+    assert view.apply_filter("udp") == 1
+    assert model.data(model.index(0, 0)) == "4"
+    view.add_parsed_packet(parse_packet_lazy(frames[0]))
+    view.add_parsed_packet(parse_packet_lazy(frames[3]))
+    assert model.rowCount() == 2 and model.packet_at(1) is view.packets[5]
+
+    assert view.apply_filter("") == 6
+    assert len(view.get_all_packets()) == 6
+
+def test_packet_list_batch_single_insert(app):
+    view = PacketList()
+    inserts = []
+    view.packet_model.rowsInserted.connect(lambda parent, first, last: inserts.append((first, last)))
+    batch = [parse_packet_lazy(tcp_frame([10, 0, 0, 1], [10, 0, 0, 2], 1000 + i, 80 + i % 2))
+             for i in range(100)]
+
+    view.add_parsed_packets(batch)
+    assert inserts == [(0, 99)]
+
+    view.apply_filter("tcp.dport == 81")
+    view.add_parsed_packets(batch[:10])
+    assert inserts[-1] == (50, 54) and view.packet_model.rowCount() == 55
+    assert view.packet_model.packet_id(54) == 109
+
+def test_pcap_loader_streams_batches(app, tmp_path, monkeypatch):
+    import functools
+    from benchmarks.common import make_frames, write_pcap
+    from gui import pcap_loader
+    from gui.pcap_loader import MAX_PENDING, PcapLoader
+    path = tmp_path / "cap.pcap"
+    write_pcap(path, make_frames(2000))
+
+    view = PacketList()
+    loader = PcapLoader(str(path))
+
+    def on_batch(batch):
+        view.add_parsed_packets(batch)
+        loader.batch_done()
+
+    loader.batch_ready.connect(on_batch)
+    result = []
+    loader.done.connect(lambda count, cancelled: result.append((count, cancelled)))
+    loader.start()
+    # El hilo espera a que se confirme cada lote: hay que ir procesando señales
+    while not loader.wait(10):
+        app.processEvents()
+    app.processEvents()
+    assert result == [(2000, False)] and view.packet_model.rowCount() == 2000
+
+    # Sin confirmar nada se detiene tras MAX_PENDING lotes (y se puede cancelar)
+    monkeypatch.setattr(pcap_loader, "iter_pcap_batches",
+                        functools.partial(pcap_loader.iter_pcap_batches, max_batch=100))
+    loader = PcapLoader(str(path))
+    batches = []
+    loader.batch_ready.connect(batches.append)
+    loader.start()
+    assert not loader.wait(300)
+    loader.cancel()
+    assert loader.wait(2000)
+    app.processEvents()
+    assert len(batches) == MAX_PENDING
+
+    loader = PcapLoader(str(path))
+    loader.cancel()
+    loader.done.connect(lambda count, cancelled: result.append((count, cancelled)))
+    loader.start()
+    loader.wait()
+    app.processEvents()
+    assert result[-1] == (0, True)
+
+    # Un error también termina con done, para que la ventana limpie su estado
+    loader = PcapLoader(str(tmp_path / "no-existe.pcap"))
+    errors = []
+    loader.failed.connect(errors.append)
+    loader.done.connect(lambda count, cancelled: errors.append((count, cancelled)))
+    loader.start()
+    loader.wait()
+    app.processEvents()
+    assert len(errors) == 2 and errors[-1] == (0, True)
+
+def test_packet_list_pages_from_session_db(app, tmp_path):
+    view = PacketList()
+    session = SessionDB(tmp_path / "s.db", batch_size=2)
+    view.set_store(session)
+    frames = [tcp_frame([10, 0, 0, 1], [10, 0, 0, 2], 1000 + i, 443) for i in range(3)]
+    frames.append(udp_frame([10, 0, 0, 3], [8, 8, 8, 8], 5353, 53, DNS_QUERY))
+    view.add_parsed_packets([parse_packet_lazy(raw) for raw in frames])
+
+    model = view.packet_model
+    assert view.index is None and model.rowCount() == 4
+    assert model.data(model.index(3, 2)) == "10.0.0.3"
+    assert view.apply_filter("udp") == 1 and model.packet_id(0) == 3
+    session.close()
@@ -1,7 +1,85 @@
 # tests/test_parsers.py
+import struct
+
+from core.dispatcher import (APP_UDP_PORTS, _parse_fast, _parse_general, parse_packet,
+                             parse_packet_lazy)
 from core.packet import Ethernet
+from core.registry import REGISTRY
 
 def test_ethernet_parse():
     raw = b"\xaa\xbb\xcc\xdd\xee\xff\x11\x22\x33\x44\x55\x66\x08\x00"
     eth = Ethernet(raw)
     assert eth.ethertype == 0x0800
+
+# -------------------------------------------------------------------------
+# Camino rápido del dispatcher
+# -------------------------------------------------------------------------
+
+ETH_IPV4 = b"\xaa\xbb\xcc\xdd\xee\xff\x11\x22\x33\x44\x55\x66\x08\x00"
+
+def _ipv4_frame(proto, l4, ver_ihl=0x45):
+    opts = b"\x01" * ((ver_ihl & 0x0F) * 4 - 20)
+    ip = struct.pack("!BBHHHBBH4s4s", ver_ihl, 0, 20 + len(opts) + len(l4), 7, 0x4000, 64,
+                     proto, 0xBEEF, bytes([10, 0, 0, 1]), bytes([10, 0, 0, 2]))
+    return ETH_IPV4 + ip + opts + l4
+
+def test_fast_path_matches_general_path():
+    tcp = struct.pack("!HHLLHHHH", 40000, 443, 1, 2, 0x5012, 1024, 0xABCD, 0) + b"data"
+    udp = struct.pack("!HHHH", 40000, 5004, 12, 0x1234) + b"abcd"
+    for frame in (_ipv4_frame(6, tcp), _ipv4_frame(17, udp), memoryview(_ipv4_frame(6, tcp))):
+        fast = _parse_fast(frame)
+        assert fast is not None
+        assert fast == _parse_general(frame)
+
+    # Casos no comunes: opciones IPv4, puertos de aplicación, truncado
+    dns = struct.pack("!HHHH", 40000, 53, 8, 0)
+    for frame in (_ipv4_frame(6, tcp, ver_ihl=0x46), _ipv4_frame(17, dns), _ipv4_frame(6, tcp[:10])):
+        assert _parse_fast(frame) is None
+        assert parse_packet(frame) == _parse_general(frame)
+
+# -------------------------------------------------------------------------
+# Disección perezosa
+# -------------------------------------------------------------------------
+
+def test_lazy_packet_materializes_on_demand():
+    tcp = struct.pack("!HHLLHHHH", 40000, 443, 1, 2, 0x5002, 1024, 0, 0)
+    frame = _ipv4_frame(6, tcp)
+    pkt = parse_packet_lazy(frame)
+
+    assert (pkt.src_str, pkt.dst_str, pkt.proto, pkt.length) == ("10.0.0.1", "10.0.0.2", "TCP", len(frame))
+    assert (pkt.src, pkt.sport, pkt.dport) == (0x0A000001, 40000, 443)
+    assert pkt.summary == "40000 -> 443 [TCP] [SYN]"
+    assert not pkt.materialized
+
+    assert pkt.layers == parse_packet(frame)["layers"]
+    assert pkt.materialized
+    assert pkt.to_dict()["summary"] == parse_packet(frame)["summary"]
+
+    # Puerto de aplicación: el resumen necesita disección completa
+    http = struct.pack("!HHLLHHHH", 40000, 80, 1, 2, 0x5018, 1024, 0, 0) + b"GET / HTTP/1.1\r\n\r\n"
+    pkt = parse_packet_lazy(_ipv4_frame(6, http))
+    assert pkt.proto == "TCP" and not pkt.materialized
+    assert pkt.summary == "HTTP GET /"
+
+# -------------------------------------------------------------------------
+# Registro de protocolos
+# -------------------------------------------------------------------------
+
+class _Echo:
+    def __init__(self, data):
+        self.data = data
+
+    def to_dict(self):
+        return {"Text": self.data.decode()}
+
+def test_registry_custom_udp_parser():
+    REGISTRY.register_port("udp", 7777, "ECHO", _Echo, lambda d: f"ECHO {d['Text']}")
+    try:
+        assert 7777 in APP_UDP_PORTS
+        udp = struct.pack("!HHHH", 40000, 7777, 12, 0) + b"hola"
+        out = parse_packet(_ipv4_frame(17, udp))
+        assert out["layers"][-1] == {"layer": "ECHO", "fields": {"Text": "hola"}}
+        assert out["summary"] == "ECHO hola"
+    finally:
+        del REGISTRY.udp_ports[7777]
+        APP_UDP_PORTS.discard(7777)
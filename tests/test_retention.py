@@ -0,0 +1,61 @@
+# tests/test_retention.py
+from benchmarks.common import make_frames
+from capture.pcap_file import PcapFile
+from capture.pcap_writer import PcapWriter
+from core.dispatcher import parse_packet_lazy
+from core.packet import Packet
+from core.retention import RetentionStore
+
+def test_pcap_writer_round_trip(tmp_path):
+    frames = make_frames(20)
+    path = tmp_path / "out.pcap"
+    with PcapWriter(path) as w:
+        offsets = [w.write(f, 1_700_000_000_123_456_789 + i) for i, f in enumerate(frames)]
+    with PcapFile(path) as pcap:
+        recs = list(pcap)
+    assert [bytes(r.data) for r in recs] == frames
+    assert [r.offset for r in recs] == offsets
+    assert recs[3].ts_ns == 1_700_000_000_123_456_792
+
+def test_retention_spills_and_rereads(tmp_path):
+    frames = make_frames(3000)
+    store = RetentionStore(max_packets=200, spill_dir=tmp_path / "spill", segment_bytes=50_000)
+    for i, f in enumerate(frames):
+        store.append(parse_packet_lazy(f, i * 1000))
+
+    stats = store.stats()
+    assert len(store) == 3000 and stats["in_memory"] == 200 and stats["spilled"] == 2800
+    assert stats["segments"] > 2
+    for pid in (0, 1, 1500, 2799, 2800, 2999, -1):
+        assert store[pid].raw == frames[pid] and store[pid].ts_ns == (pid % 3000) * 1000
+    assert [p.raw for p in store] == frames
+
+    # Límite de memoria por bytes y de disco por segmentos
+    small = RetentionStore(max_packets=10**6, max_bytes=20_000, spill_dir=tmp_path / "s2",
+                           segment_bytes=20_000, max_segments=2)
+    small.extend(parse_packet_lazy(f) for f in frames)
+    assert small.stats()["memory_bytes"] <= 20_000
+    assert small.first_available > 0 and small[0].raw == b""
+    assert small[len(small) - 1].raw == frames[-1]
+    store.close()
+    small.close()
+
+def test_retention_keeps_length_and_drops_layers(tmp_path):
+    frames = make_frames(50)
+    store = RetentionStore(max_packets=10, spill_dir=tmp_path / "spill")
+    truncated = parse_packet_lazy(frames[0][:40], 1)
+    truncated.length = 1500
+    store.append(truncated)
+    store.append(Packet(ts_ns=2, proto="SIM", length=500, summary="simulado"))
+    dns = [parse_packet_lazy(f) for f in frames if f[36:38] == b"\x00\x35"][0]
+    assert dns.layers[-1]["layer"] == "DNS"
+    store.append(dns)
+    # Las capas disecadas no cuentan para max_bytes: se sueltan y se rehacen
+    assert not dns.materialized and dns.layers[-1]["layer"] == "DNS"
+    store.extend(parse_packet_lazy(f) for f in frames)
+
+    assert store.spilled > 3
+    assert store[0].raw == frames[0][:40] and store[0].length == 1500
+    assert store[1].ts_ns == 2 and store[1].length == 500 and store[1].summary == ""
+    assert store[2].raw == dns.raw and store[2].length == len(dns.raw)
+    store.close()
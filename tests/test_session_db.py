@@ -0,0 +1,61 @@
+# tests/test_session_db.py
+import struct
+
+from benchmarks.common import make_frames, tcp_frame, write_pcap
+from core.dispatcher import parse_packet_lazy
+from core.filters import PacketFilter
+from core.packet import Packet
+from core.session_db import SessionDB
+
+EXPRESSIONS = (
+    "tcp", "udp.port == 53", "!tcp.port == 443", "ip.addr != 10.0.0.1",
+    "ip.src == 10.0.0.0/8 && tcp.dport in {80,443}", "frame.len > 100", "arp || ipv6",
+    "dns", "dns && tcp.dport == 80", "tcp.flags.syn == 1",
+    # Negaciones: las tramas ARP (sin IP ni ip_proto) deben seguir cumpliéndolas
+    "!tcp", "!udp", "!icmp", "!(ip.addr == 10.0.0.1)", "!(ip.src == 10.0.0.0/8)", "arp",
+    # Tramas cortas y paquetes sin bytes: sin Ethernet y frame.len = Packet.length
+    "eth", "!eth", "frame.len >= 500",
+)
+
+def _arp_frame(sender, target):
+    """Petición ARP Ethernet/IPv4 (Packet.src/dst son las IP de emisor y destino)."""
+    return (b"\xff" * 6 + b"\x02\x00\x00\x00\x00\x01" + b"\x08\x06"
+            + struct.pack("!HHBBH6s4s6s4s", 1, 0x0800, 6, 4, 1, b"\x02\0\0\0\0\x01",
+                          bytes(sender), b"\0" * 6, bytes(target)))
+
+def test_session_db_import_append_filter_and_reopen(tmp_path):
+    frames = make_frames(3000)
+    frames[100:100] = [_arp_frame([10, 0, 0, 1], [10, 0, 0, 2 + i]) for i in range(3)]
+    write_pcap(tmp_path / "cap.pcap", frames)
+    extra = [parse_packet_lazy(tcp_frame([10, 0, 0, 9], [10, 0, 0, 1], 4000, 80, flags=0x02), 7)]
+    extra.append(parse_packet_lazy(b"\x00" * 10, 9))
+    extra.append(Packet(ts_ns=8, proto="SIM", length=500, summary="simulado"))
+
+    with SessionDB(tmp_path / "s.db", batch_size=1000) as db:
+        assert db.import_pcap(tmp_path / "cap.pcap") == 3003
+        db.extend(extra)
+        assert len(db) == 3006 and db[-1].summary == "simulado"    # aún sin insertar
+        assert db[1234].raw == frames[1234] and db[3003].ts_ns == 7
+
+        packets = [parse_packet_lazy(f) for f in frames] + extra
+        for text in EXPRESSIONS:
+            f = PacketFilter(text)
+            expected = [i for i, p in enumerate(packets) if f.match(p)]
+            assert list(db.select(f)) == expected, text
+        assert db.where(PacketFilter("udp.port == 53")) is not None
+        assert db.where(PacketFilter("dns")) is None
+        assert [p.raw for p in db.page(10, 5)] == frames[10:15]
+
+    with SessionDB(tmp_path / "s.db") as db:
+        assert len(db) == 3006
+        assert db[3002].raw == frames[3002] and db[3005].summary == "simulado"
+
+def test_session_db_page_refreshed_after_flush(tmp_path):
+    frames = make_frames(300)
+    with SessionDB(tmp_path / "s.db", batch_size=1000) as db:
+        db.extend(parse_packet_lazy(f, i) for i, f in enumerate(frames[:100]))
+        db.flush()
+        assert db[10].raw == frames[10]     # página 0 con solo 100 filas
+        db.extend(parse_packet_lazy(f, i) for i, f in enumerate(frames[100:], 100))
+        db.flush()
+        assert db[150].raw == frames[150] and db[299].ts_ns == 299